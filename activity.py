@@ -0,0 +1,124 @@
+import threading  # to guard the buffers across request threads
+import time  # to know when the buffers were loaded
+from collections import deque  # bounded ring buffer
+from datetime import datetime
+
+from sqlalchemy import select
+
+from models import Artist, ShowCard, Venue, db
+
+# ----------------------------------------------------------------------------#
+# Recent activity.
+# ----------------------------------------------------------------------------#
+
+
+class ActivityFeed:
+    """Recently listed venues/artists and the next upcoming shows.
+
+    Both lists live in memory: load() seeds them from the database and the
+    create, edit and delete handlers keep them current, so rendering the
+    feed costs no queries. Every worker process has its own feed and only
+    sees its own writes; reloading after `refresh_after` seconds bounds
+    how long another worker's writes stay missing.
+    """
+
+    def __init__(self, size=10, spare=40, refresh_after=300):
+        self.size = size
+        # upcoming shows kept beyond `size`, to replace the ones that start
+        self.spare = spare
+        self.refresh_after = refresh_after
+        self._listed = deque(maxlen=size)  # newest first
+        self._upcoming = []  # sorted by start_time
+        self._complete = False  # _upcoming holds every upcoming show
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        limit = self.size + self.spare
+        listed = []
+        for kind, model in (('venue', Venue), ('artist', Artist)):
+            listed.extend(
+                {"type": kind, "id": row.id, "name": row.name,
+                 "image_link": row.image_link, "listed_at": row.created_at}
+                for row in db.session.execute(
+                    select(model.id, model.name, model.image_link,
+                           model.created_at).
+                    where(model.deleted_at.is_(None)).
+                    order_by(model.id.desc()).limit(self.size)))
+        # by listing time, not updated_at: edits and bookings touch() rows
+        listed.sort(key=lambda entry: entry['listed_at'], reverse=True)
+        upcoming = self.upcoming_cards()
+        with self._lock:
+            self._listed = deque(listed[:self.size], maxlen=self.size)
+            self._upcoming = upcoming
+            self._complete = len(upcoming) < limit
+            self._loaded_at = time.monotonic()
+
+    def snapshot(self):
+        # (listed, upcoming), reloading only when stale or run dry
+        with self._lock:
+            now = datetime.now()
+            self._upcoming = [show for show in self._upcoming
+                              if show['start_time'] > now]
+            stale = self._loaded_at is None or \
+                time.monotonic() - self._loaded_at > self.refresh_after or \
+                (len(self._upcoming) < self.size and not self._complete)
+        if stale:
+            self.load()
+        with self._lock:
+            return list(self._listed), self._upcoming[:self.size]
+
+    def listed(self, kind, entity_id, name, image_link):
+        with self._lock:
+            self._listed.appendleft({
+                "type": kind, "id": entity_id, "name": name,
+                "image_link": image_link, "listed_at": datetime.utcnow()})
+
+    def upcoming_cards(self, *criteria):
+        return [dict(row._mapping) for row in db.session.execute(
+            select(ShowCard.show_id, ShowCard.start_time,
+                   ShowCard.venue_id, ShowCard.venue_name,
+                   ShowCard.artist_id, ShowCard.artist_name,
+                   ShowCard.artist_image_link).
+            where(ShowCard.start_time > datetime.now(), *criteria).
+            order_by(ShowCard.start_time, ShowCard.show_id).
+            limit(self.size + self.spare))]
+
+    def booked(self, *criteria):
+        # adds the cards of newly booked shows matching criteria
+        shows = self.upcoming_cards(*criteria)
+        with self._lock:
+            known = {show['show_id'] for show in self._upcoming}
+            self._upcoming.extend(show for show in shows
+                                  if show['show_id'] not in known)
+            self._upcoming.sort(key=lambda show: (show['start_time'],
+                                                  show['show_id']))
+            if len(self._upcoming) > self.size + self.spare:
+                del self._upcoming[self.size + self.spare:]
+                self._complete = False
+
+    def renamed(self, kind, entity_id, name, image_link=None):
+        with self._lock:
+            for entry in self._listed:
+                if entry['type'] == kind and entry['id'] == entity_id:
+                    entry['name'] = name
+                    if image_link is not None:
+                        entry['image_link'] = image_link
+            for show in self._upcoming:
+                if show[kind + '_id'] == entity_id:
+                    show[kind + '_name'] = name
+                    if kind == 'artist' and image_link is not None:
+                        show['artist_image_link'] = image_link
+
+    def removed(self, kind, entity_id):
+        with self._lock:
+            self._listed = deque(
+                (entry for entry in self._listed
+                 if entry['type'] != kind or entry['id'] != entity_id),
+                maxlen=self.size)
+            self._upcoming = [show for show in self._upcoming
+                              if show[kind + '_id'] != entity_id]
+            self._complete = False
+
+
+feed = ActivityFeed()  # shared by the app
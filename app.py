@@ -4,10 +4,8 @@
 # ----------------------------------------------------------------------------#
 
 import json  # to handle JSON objects
-import logging  # to log errors
-import sys  # to handle errors
 from datetime import datetime  # to work with datetime objects
-from logging import FileHandler, Formatter  # to log errors
+from itertools import groupby  # to group venues by area
 
 import babel  # to format dates
 import dateutil.parser  # to parse datetime strings
@@ -16,19 +14,69 @@ from flask import (Flask,  # to create and configure the app
                    abort,  # to handle errors
                    flash,  # to display messages
                    jsonify,  # to handle JSON objects
+                   make_response,  # to add headers to rendered pages
                    redirect,  # to redirect users
                    render_template,  # to render templates
                    request,  # to handle requests
+                   stream_with_context,  # to stream the calendar feeds
                    url_for)  # to generate URLs
 from flask_migrate import Migrate  # to run migrations
 from flask_moment import Moment  # to format dates
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf import FlaskForm as Form  # to create forms
 from flask_wtf.csrf import CSRFProtect   # to protect against CSRF attacks
-
+from sqlalchemy import insert  # to insert batches in one statement
+from sqlalchemy import select
+from sqlalchemy.orm import lazyload  # to skip the joined shows
+from werkzeug.datastructures import MultiDict  # to validate batch rows
+
+from activity import feed  # home page activity feed
+from calendars import calendar_lines, upcoming_rows  # .ics feeds
+from changes import cli as events_cli  # `flask events prune`
+from changes import (as_event,  # change feed for /events
+                     changes_after,
+                     event_stream,
+                     latest_cursor,
+                     record,
+                     record_new_shows,
+                     record_shows)
+from compression import init_compression  # gzip/brotli responses
+from conditional import (is_not_modified,  # ETag/Last-Modified
+                         not_modified,
+                         page_validators,
+                         with_validators)
 from config import SQLALCHEMY_DATABASE_URI
+from enums import Genre, State
+from facets import browse, facet_counts, invalidate_facets  # faceted browse
 from forms import *
-from models import Artist, Show, Venue, db
+from fragment_cache import FragmentCacheExtension  # {% cache %} blocks
+from images import cli as images_cli  # `flask images variants`
+from images import init_images
+from images import store as image_store  # uploaded images and variants
+from listings import (artist_items,  # compact rows for lists/searches
+                      cached_search,
+                      invalidate_searches,
+                      show_items,
+                      venue_items)
+from logging_setup import configure_logging  # queued JSON logging
+from matchmaking import cli as matches_cli  # `flask matches rebuild`
+from matchmaking import entity_matches
+from metrics import exposition, init_metrics  # /metrics
+from models import (Artist, Show, ShowCard, Venue, db, touch,
+                    update_versioned)
+from partitions import archived_shows  # ?history=archived
+from partitions import cli as shows_cli  # `flask shows partition/archive`
+from recommendations import cli as recommendations_cli
+from recommendations import refresh_similar_artists, similar_artists
+from ratelimit import limiter  # 429 for clients searching too fast
+from read_models import (delete_show_cards,  # to maintain the /shows page
+                         insert_show_cards,
+                         update_artist_cards,
+                         update_venue_cards)
+from rollups import add_shows, remove_shows, stats  # /stats rollups
+from rollups import cli as stats_cli
+from search_index import names  # to answer autocomplete lookups
+from snapshot import snapshot_command  # `flask snapshot`
 
 # ----------------------------------------------------------------------------#
 # App Config.
@@ -39,9 +87,22 @@ app = Flask(__name__)
 app.config.from_object('config')
 
 moment = Moment(app)
+app.jinja_env.add_extension(FragmentCacheExtension)
+init_compression(app)
+init_metrics(app)  # its after_request runs before compression
+init_images(app)  # /media/ and the `variant` template filter
 db.init_app(app)  # to connect to a local postgresql database
 
 migrate = Migrate(app, db)  # to run migrations
+# request ids always; the queued JSON error log outside of debug mode
+configure_logging(app, log_to_file=not app.debug)
+app.cli.add_command(matches_cli)
+app.cli.add_command(recommendations_cli)
+app.cli.add_command(stats_cli)
+app.cli.add_command(shows_cli)
+app.cli.add_command(events_cli)
+app.cli.add_command(snapshot_command)
+app.cli.add_command(images_cli)
 
 # ----------------------------------------------------------------------------#
 # Filters.
@@ -49,7 +110,8 @@ migrate = Migrate(app, db)  # to run migrations
 
 
 def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
+    date = value if isinstance(value, datetime) \
+        else dateutil.parser.parse(value)
     if format == 'full':
         format = "EEEE MMMM, d, y 'at' h:mma"
     elif format == 'medium':
@@ -59,18 +121,56 @@ def format_datetime(value, format='medium'):
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+# ----------------------------------------------------------------------------#
+# Startup.
+# ----------------------------------------------------------------------------#
+
+
+def reload_names():
+    # only ids and names are read, the shows relationship is not loaded
+    rows = [('venue', venue.id, venue.name) for venue in
+            db.session.query(Venue.id, Venue.name).
+            filter(Venue.deleted_at.is_(None))]
+    rows += [('artist', artist.id, artist.name) for artist in
+             db.session.query(Artist.id, Artist.name).
+             filter(Artist.deleted_at.is_(None))]
+    names.load(rows)
+
+
+@app.before_first_request
+def load_name_index():
+    reload_names()
+    feed.load()
+
 # ----------------------------------------------------------------------------#
 # Controllers.
 # ----------------------------------------------------------------------------#
 
 
+def render_home():
+    # the feed is served from memory, see activity.py
+    listed, upcoming = feed.snapshot()
+    return render_template('pages/home.html', listed=listed,
+                           upcoming=upcoming)
+
+
 @app.route('/')
 def index():
-    recent_artists = Artist.query.order_by(Artist.id.desc()).limit(10).all()
-    recent_venues = Venue.query.order_by(Venue.id.desc()).limit(10).all()
-    return render_template('pages/home.html',
-                           recent_artists=recent_artists,
-                           recent_venues=recent_venues)
+    return render_home()
+
+
+@app.route('/autocomplete')
+def autocomplete():
+    # typeahead for the search boxes, served from the in-memory name index
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    kind = request.args.get('type')  # 'venue', 'artist' or both
+    if names.stale():
+        reload_names()  # picks up other workers' writes
+    results = names.search(query, limit=limit, kind=kind)
+    for result in results:
+        result['url'] = '/' + result['type'] + 's/' + str(result['id'])
+    return jsonify({"query": query, "results": results})
 
 
 #  Venues
@@ -81,28 +181,16 @@ def venues():
     # TODO: replace with real venues data.
     #       num_upcoming_shows should be aggregated
     # based on number of upcoming shows per venue.
-    data = []
-    areas = db.session.query(Venue.city, Venue.state).distinct().all()
-    for area in areas:
-        venues = Venue.query.filter_by(
-            city=area.city).filter_by(state=area.state).all()
-        venue_data = []
-        for venue in venues:
-            venue_data.append({
-                "id": venue.id,
-                "name": venue.name,
-                "num_upcoming_shows": len(venue.shows)
-            })
-        data.append({
-            "city": area.city,
-            "state": area.state,
-            "venues": venue_data
-        })
+    # one query for every area, see listings.py
+    data = [{"city": city, "state": state, "venues": list(venues)}
+            for (city, state), venues in groupby(
+                venue_items(), key=lambda venue: (venue.city, venue.state))]
 
     return render_template('pages/venues.html', areas=data)
 
 
 @app.route('/venues/search', methods=['POST'])
+@limiter.limit('search')
 def search_venues():
     # TODO: implement search on artists
     # with partial string search. Ensure it is case-insensitive.
@@ -110,7 +198,9 @@ def search_venues():
     # search for "Music" should
     # return "The Musical Hop" and "Park Square Live Music & Coffee"
     search_term = request.form.get('search_term')
-    venues = Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).all()
+    # ids and names only, cached until the next venue or artist write
+    venues = cached_search(Venue, search_term,
+                           app.config['SEARCH_CACHE_TTL'])
     response = {
         "count": len(venues),
         "data": venues
@@ -125,22 +215,38 @@ def search_venues():
 def show_venue(venue_id):
     # shows the venue page with the given venue_id
     # TODO: replace with real venue data from the venues table, using venue_id
-    venue = Venue.query.get(venue_id)
+    validators = page_validators(Venue, venue_id)
+    if validators is None:
+        abort(404)
+    archived = request.args.get('history') == 'archived'
+    if not archived and is_not_modified(*validators):
+        return not_modified(*validators)
+    # the venue's own shows are read below, not joined in here
+    venue = Venue.query.options(lazyload(Venue.shows)).get(venue_id)
+    if venue is None or venue.deleted_at is not None:
+        abort(404)
     # The code joins tables from existing models
     # to select Artists by Venues where they previously performed,
     # successfully filling out
     # the Venues page with a “Past Performances” section.
-    past_shows = db.session.query(Artist, Show).join(Show).join(Venue).filter(
-        Show.venue_id == venue_id).filter(Show.artist_id == Artist.id). \
-        filter(Show.start_time < datetime.now()).all()
-    upcoming_shows = db.session.query(Artist, Show).join(Show).join(Venue). \
+    # one query for both lists, split on the current time; plain columns,
+    # so no ORM object is built per show
+    now = datetime.now()
+    shows = db.session.query(
+        Show.id.label('show_id'), Show.start_time,
+        Artist.id.label('artist_id'), Artist.version.label('artist_version'),
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link')). \
+        join(Artist, Artist.id == Show.artist_id). \
         filter(Show.venue_id == venue_id). \
-        filter(Show.artist_id == Artist.id).filter(
-            Show.start_time > datetime.now()).all()
+        filter(Artist.deleted_at.is_(None)). \
+        order_by(Show.start_time).all()
+    past_shows = [show for show in shows if show.start_time < now]
+    upcoming_shows = [show for show in shows if show.start_time > now]
     data = {
         "id": venue.id,
         "name": venue.name,
-        "genres": venue.genres,
+        "genres": json.loads(venue.genres),
         "address": venue.address,
         "city": venue.city,
         "state": venue.state,
@@ -151,22 +257,38 @@ def show_venue(venue_id):
         "seeking_description": venue.seeking_description,
         "image_link": venue.image_link,
         "past_shows": [{
-            "artist_id": show.Artist.id,
-            "artist_name": show.Artist.name,
-            "artist_image_link": show.Artist.image_link,
-            "start_time": str(show.Show.start_time)
+            "show_id": show.show_id,
+            "artist_id": show.artist_id,
+            "artist_version": show.artist_version,
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
+            "start_time": str(show.start_time)
         } for show in past_shows],
         "upcoming_shows": [{
-            "artist_id": show.Artist.id,
-            "artist_name": show.Artist.name,
-            "artist_image_link": show.Artist.image_link,
-            "start_time": str(show.Show.start_time)
+            "show_id": show.show_id,
+            "artist_id": show.artist_id,
+            "artist_version": show.artist_version,
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
+            "start_time": str(show.start_time)
         } for show in upcoming_shows],
         "past_shows_count": len(past_shows),
         "upcoming_shows_count": len(upcoming_shows),
     }
-
-    return render_template('pages/show_venue.html', venue=data)
+    if archived:
+        # shows moved out of the database by `flask shows archive`
+        data['archived_shows'] = [{
+            "artist_id": show['artist_id'],
+            "artist_name": show['artist_name'],
+            "artist_image_link": show['artist_image_link'],
+            "start_time": str(show['start_time'])
+        } for show in archived_shows('venue', venue_id)]
+
+    response = make_response(render_template('pages/show_venue.html',
+                                             venue=data))
+    if archived:
+        return response
+    return with_validators(response, *validators)
 
 #  Create Venue
 #  ----------------------------------------------------------------
@@ -184,34 +306,45 @@ def create_venue_submission():
     # TODO: insert form data as a new Venue record in the db, instead
     # TODO: modify data to be the data object returned from db insertion
     # csrf=False to avoid csrf token error
-    form = VenueForm(request.form, meta={'csrf': False})
+    form = VenueForm(meta={'csrf': False})
     if form.validate():
         try:
+            if form.image_file.data:  # an uploaded image replaces the link
+                form.image_link.data = image_store.save(
+                    form.image_file.data)
             venue = Venue(
                 name=form.name.data,
                 city=form.city.data,
                 state=form.state.data,
                 address=form.address.data,
                 phone=form.phone.data,
-                genres=form.genres.data,
+                genres=json.dumps(form.genres.data),
+                genre_mask=Genre.mask(form.genres.data),
                 facebook_link=form.facebook_link.data,
                 image_link=form.image_link.data,
-                website=form.website.data,
+                website=form.website_link.data,
                 seeking_talent=form.seeking_talent.data,
                 seeking_description=form.seeking_description.data
             )
             db.session.add(venue)
+            db.session.flush()  # to get the venue id for the change log
+            record('venue', venue.id, 'created')
             db.session.commit()
+            names.add('venue', venue.id, venue.name)
+            feed.listed('venue', venue.id, venue.name, venue.image_link)
+            invalidate_facets()
+            invalidate_searches()
             # on successful db insert, flash success
             flash('Venue ' + request.form['name'] +
                   ' was successfully listed!')
-            return render_template('pages/home.html')
+            return render_home()
         except Exception:
             db.session.rollback()
-            print(sys.exc_info())
+            app.logger.exception('Venue %s could not be listed',
+                                 request.form.get('name'))
             flash('An error occurred. Venue ' +
                   request.form['name'] + ' could not be listed.')
-            return render_template('pages/home.html')
+            return render_home()
         finally:
             db.session.close()
     else:
@@ -220,35 +353,247 @@ def create_venue_submission():
             for error in errors:
                 message.append(field + ' ' + error)
         flash('Errors ' + str(message))
-        return render_template('pages/home.html')
-
-
-@app.route('/venues/<venue_id>', methods=['DELETE'])
-def delete_venue(venue_id):
-    # TODO: Complete this endpoint for taking a venue_id, and using
-    # SQLAlchemy ORM to delete a record.
-    # Handle cases where the session commit could fail.
+        return render_home()
+
+
+def touch_counterparts(kind, entity_id):
+    # the pages of the venues an artist played (or of the artists a venue
+    # booked) show its name and image, so their ETags have to change too
+    other = Artist if kind == 'venue' else Venue
+    other_column = getattr(Show, ('artist' if kind == 'venue' else 'venue') +
+                           '_id')
+    touch(other, other.id.in_(select(other_column).where(
+        getattr(Show, kind + '_id') == entity_id)))
+
+
+def delete_listing(kind, entity_id, soft):
+    # Removes a venue or artist without loading it or its shows. A hard
+    # delete removes the dependent shows with one bulk DELETE (the foreign
+    # keys also cascade on Postgres); a soft delete only stamps deleted_at,
+    # which the listing queries and their partial indexes skip. Either way
+    # the shows leave the rollups, their cards and the counterparts' pages.
+    # Returns False, having written nothing, when there was no row to
+    # remove (or, for a soft delete, no live one).
+    model = Venue if kind == 'venue' else Artist
+    show_column = getattr(Show, kind + '_id')
+    card_column = getattr(ShowCard, kind + '_id')
+    row = db.session.query(model.deleted_at). \
+        filter(model.id == entity_id).first()
+    if row is None or (soft and row.deleted_at is not None):
+        return False
+    touch_counterparts(kind, entity_id)
+    # counts only shows between live venues and artists, so the shows of
+    # a soft-deleted row are not subtracted again when it is hard deleted
+    remove_shows(show_column == entity_id)
+    if soft:
+        model.query.filter(model.id == entity_id). \
+            update({model.deleted_at: datetime.now()},
+                   synchronize_session=False)
+    else:
+        record_shows('deleted', show_column == entity_id)
+        Show.query.filter(show_column == entity_id). \
+            delete(synchronize_session=False)
+        model.query.filter(model.id == entity_id). \
+            delete(synchronize_session=False)
+    delete_show_cards(card_column == entity_id)
+    record(kind, entity_id, 'deleted')
+    db.session.commit()
+    names.remove(kind, entity_id)
+    feed.removed(kind, entity_id)
+    invalidate_facets()
+    invalidate_searches()
+    return True
+
+
+def delete_listing_response(kind, entity_id):
+    # ?soft=true keeps the row (and its show history) but hides it
+    soft = request.values.get('soft', '').lower() in ('1', 'true', 'yes')
     error = False
+    removed = False
     try:
-        venue = Venue.query.get(venue_id)
-        db.session.delete(venue)
-        db.session.commit()
+        removed = delete_listing(kind, entity_id, soft)
     except Exception:
         db.session.rollback()
         error = True
-        print(sys.exc_info())
+        app.logger.exception('Could not delete %s %s', kind, entity_id)
     finally:
         db.session.close()
     if error:
         abort(500)
-    else:
-        return jsonify({'success': True})
+    if not removed:
+        abort(404)
+    if request.method == 'POST':
+        # the delete button on the detail page posts a plain form
+        flash(kind.capitalize() + ' was successfully deleted!')
+        return redirect(url_for('index'))
+    return jsonify({'success': True})
+
+
+@app.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+    return delete_listing_response('venue', venue_id)
+
+
+@app.route('/venues/<int:venue_id>/delete', methods=['POST'])
+def delete_venue_submission(venue_id):
+    return delete_listing_response('venue', venue_id)
 
-    # BONUS CHALLENGE:
-    # Implement a button to delete a Venue on a Venue Page, have it so that
-    # clicking that button delete it from the db
-    # then redirect the user to the homepage
-    return None
+
+@app.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+    return delete_listing_response('artist', artist_id)
+
+
+@app.route('/artists/<int:artist_id>/delete', methods=['POST'])
+def delete_artist_submission(artist_id):
+    return delete_listing_response('artist', artist_id)
+
+#  Browse
+#  ----------------------------------------------------------------
+
+
+def browse_listing(kind):
+    # /venues/browse and /artists/browse: filter by state, genre (any of
+    # the selected, or all of them with ?match=all) and the seeking flag,
+    # with a count next to every facet
+    state = request.args.get('state')
+    if state not in dict(State.choices()):
+        state = None
+    genres = [genre for genre in request.args.getlist('genre')
+              if genre in dict(Genre.choices())]
+    match = 'all' if request.args.get('match') == 'all' else 'any'
+    seeking = {'true': True, 'false': False}.get(
+        request.args.get('seeking', '').lower())
+    page = max(request.args.get('page', 1, type=int), 1)
+
+    counts = facet_counts(kind, state, genres, seeking, match)
+    results = browse(kind, state, genres, seeking, match,
+                     limit=100, offset=(page - 1) * 100)
+
+    if request.args.get('format') == 'json':
+        return jsonify({
+            "filters": {"state": state, "genre": genres, "match": match,
+                        "seeking": seeking},
+            "facets": {
+                "total": counts['total'],
+                "state": counts['state'],
+                "genre": counts['genre'],
+                "seeking": {str(value).lower(): count for value, count
+                            in counts['seeking'].items()},
+            },
+            "data": [{"id": row.id, "name": row.name, "city": row.city,
+                      "state": row.state} for row in results],
+        })
+
+    def link(**changes):
+        args = {"state": state, "genre": genres,
+                "match": None if match == 'any' else match,
+                "seeking": None if seeking is None else str(seeking).lower()}
+        args.update(changes)
+        return url_for(request.endpoint,
+                       **{key: value for key, value in args.items()
+                          if value not in (None, [])})
+
+    facets = {
+        "state": [{"value": value, "count": count,
+                   "selected": value == state,
+                   "url": link(state=None if value == state else value)}
+                  for value, count in sorted(counts['state'].items())],
+        "genre": [{"value": label, "count": counts['genre'].get(name, 0),
+                   "selected": name in genres,
+                   "url": link(genre=[genre for genre in genres
+                                      if genre != name]
+                               if name in genres else genres + [name])}
+                  for name, label in Genre.choices()
+                  if counts['genre'].get(name)],
+        "seeking": [{"value": 'Yes' if value else 'No', "count": count,
+                     "selected": value == seeking,
+                     "url": link(seeking=None if value == seeking
+                                 else str(value).lower())}
+                    for value, count in sorted(counts['seeking'].items(),
+                                               reverse=True)],
+    }
+    return render_template('pages/browse.html', kind=kind,
+                           total=counts['total'], facets=facets,
+                           results=results, page=page)
+
+
+@app.route('/venues/browse')
+def browse_venues():
+    return browse_listing('venue')
+
+
+@app.route('/artists/browse')
+def browse_artists():
+    return browse_listing('artist')
+
+#  Matches
+#  ----------------------------------------------------------------
+
+
+def matches_page(kind, entity_id):
+    # served from the precomputed Match table, see matchmaking.py
+    model = Venue if kind == 'venue' else Artist
+    entity = db.session.query(model.id, model.name). \
+        filter(model.id == entity_id, model.deleted_at.is_(None)).first()
+    if entity is None:
+        abort(404)
+    matches = entity_matches(kind, entity_id)
+    if request.args.get('format') == 'json':
+        return jsonify({"id": entity.id, "name": entity.name, "matches": [{
+            "rank": match.rank,
+            "score": match.score,
+            "id": match.id,
+            "name": match.name,
+            "city": match.city,
+            "state": match.state,
+        } for match in matches]})
+    return render_template('pages/matches.html', kind=kind,
+                           entity=entity, matches=matches)
+
+
+@app.route('/venues/<int:venue_id>/matches')
+def venue_matches(venue_id):
+    return matches_page('venue', venue_id)
+
+
+@app.route('/artists/<int:artist_id>/matches')
+def artist_matches(artist_id):
+    return matches_page('artist', artist_id)
+
+#  Calendars
+#  ----------------------------------------------------------------
+
+
+def calendar_feed(kind, entity_id):
+    # calendar apps poll these feeds; a repeat poll is answered with 304
+    # from the row's version and updated_at (stamped on every show write)
+    # without reading the Show table
+    model = Venue if kind == 'venue' else Artist
+    validators = page_validators(model, entity_id, 'ics')
+    if validators is None:
+        abort(404)
+    if is_not_modified(*validators):
+        return not_modified(*validators)
+    name = db.session.execute(
+        select(model.name).where(model.id == entity_id)).scalar()
+    events = calendar_lines(name, upcoming_rows(kind, entity_id),
+                            request.url_root)
+    response = Response(stream_with_context(events),
+                        mimetype='text/calendar')
+    response.headers['Content-Disposition'] = \
+        f'inline; filename="{kind}-{entity_id}.ics"'
+    return with_validators(response, *validators)
+
+
+@app.route('/venues/<int:venue_id>/calendar.ics')
+def venue_calendar(venue_id):
+    return calendar_feed('venue', venue_id)
+
+
+@app.route('/artists/<int:artist_id>/calendar.ics')
+def artist_calendar(artist_id):
+    return calendar_feed('artist', artist_id)
 
 #  ----------------------------------------------------------------
 #  Artists
@@ -258,11 +603,12 @@ def delete_venue(venue_id):
 @app.route('/artists')
 def artists():
     # TODO: replace with real data returned from querying the database
-    data = Artist.query.order_by('id').all()
+    data = artist_items()  # ids, names and versions only
     return render_template('pages/artists.html', artists=data)
 
 
 @app.route('/artists/search', methods=['POST'])
+@limiter.limit('search')
 def search_artists():
     # TODO: implement search on artists with partial string search. .
     # Ensure it is case-insensitive.
@@ -271,7 +617,9 @@ def search_artists():
     # search for "band" should return "The Wild Sax Band".
 
     search_term = request.form.get('search_term')
-    artist = Artist.query.filter(Artist.name.ilike(f'%{search_term}%')).all()
+    # ids and names only, cached until the next venue or artist write
+    artist = cached_search(Artist, search_term,
+                           app.config['SEARCH_CACHE_TTL'])
     response = {
         "count": len(artist),
         "data": artist
@@ -290,13 +638,30 @@ def show_artist(artist_id):
     # The code joins tables from existing models
     # to successfully fill out the Artists page
     # with a “Venues Performed” section.
-    artist = Artist.query.get(artist_id)
-    past_shows = db.session.query(Show).join(Venue).filter(
-        Show.artist_id == artist_id).\
-        filter(Show.start_time < datetime.now()).all()
-    upcoming_shows = db.session.query(Show).join(Venue).\
-        filter(Show.artist_id == artist_id).\
-        filter(Show.start_time > datetime.now()).all()
+    validators = page_validators(Artist, artist_id)
+    if validators is None:
+        abort(404)
+    archived = request.args.get('history') == 'archived'
+    if not archived and is_not_modified(*validators):
+        return not_modified(*validators)
+    # the artist's own shows are read below, not joined in here
+    artist = Artist.query.options(lazyload(Artist.shows)).get(artist_id)
+    if artist is None or artist.deleted_at is not None:
+        abort(404)
+    # one query for both lists, with each show's venue, split on the
+    # current time; plain columns, so no ORM object is built per show
+    now = datetime.now()
+    shows = db.session.query(
+        Show.id.label('show_id'), Show.start_time,
+        Venue.id.label('venue_id'), Venue.version.label('venue_version'),
+        Venue.name.label('venue_name'),
+        Venue.image_link.label('venue_image_link')). \
+        join(Venue, Venue.id == Show.venue_id). \
+        filter(Show.artist_id == artist_id). \
+        filter(Venue.deleted_at.is_(None)). \
+        order_by(Show.start_time).all()
+    past_shows = [show for show in shows if show.start_time < now]
+    upcoming_shows = [show for show in shows if show.start_time > now]
 
     data = {
         "id": artist.id,
@@ -311,22 +676,43 @@ def show_artist(artist_id):
         "seeking_description": artist.seeking_description,
         "image_link": artist.image_link,
         "past_shows": [{
+            "show_id": show.show_id,
             "venue_id": show.venue_id,
-            "venue_name": show.venue.name,
-            "venue_image_link": show.venue.image_link,
+            "venue_version": show.venue_version,
+            "venue_name": show.venue_name,
+            "venue_image_link": show.venue_image_link,
             "start_time": str(show.start_time)
         } for show in past_shows],
         "upcoming_shows": [{
+            "show_id": show.show_id,
             "venue_id": show.venue_id,
-            "venue_name": show.venue.name,
-            "venue_image_link": show.venue.image_link,
+            "venue_version": show.venue_version,
+            "venue_name": show.venue_name,
+            "venue_image_link": show.venue_image_link,
             "start_time": str(show.start_time)
         } for show in upcoming_shows],
         "past_shows_count": len(past_shows),
         "upcoming_shows_count": len(upcoming_shows),
+        "similar_artists": [{
+            "artist_id": similar.id,
+            "artist_name": similar.name,
+            "artist_image_link": similar.image_link,
+        } for similar in similar_artists(artist_id)],
     }
-
-    return render_template('pages/show_artist.html', artist=data)
+    if archived:
+        # shows moved out of the database by `flask shows archive`
+        data['archived_shows'] = [{
+            "venue_id": show['venue_id'],
+            "venue_name": show['venue_name'],
+            "venue_image_link": show['venue_image_link'],
+            "start_time": str(show['start_time'])
+        } for show in archived_shows('artist', artist_id)]
+
+    response = make_response(render_template('pages/show_artist.html',
+                                             artist=data))
+    if archived:
+        return response
+    return with_validators(response, *validators)
 
 #  ----------------------------------------------------------------
 #  Update
@@ -335,8 +721,12 @@ def show_artist(artist_id):
 
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
-    artist = Artist.query.filter_by(id=artist_id).first()
-    form = ArtistForm()
+    # columns only: the artist's shows are not loaded to fill the form
+    artist = db.session.query(*Artist.__table__.columns). \
+        filter(Artist.id == artist_id, Artist.deleted_at.is_(None)).first()
+    if artist is None:
+        abort(404)
+    form = EditArtistForm()
 
     # TODO: populate form with fields from artist with ID <artist_id>
     form.name.data = artist.name
@@ -344,9 +734,12 @@ def edit_artist(artist_id):
     form.state.data = artist.state
     form.phone.data = artist.phone
     form.facebook_link.data = artist.facebook_link
-    form.website.data = artist.website
+    form.website_link.data = artist.website
     form.image_link.data = artist.image_link
     form.genres.data = json.loads(artist.genres)
+    form.seeking_venue.data = artist.seeking_venue
+    form.seeking_description.data = artist.seeking_description
+    form.version.data = artist.version
 
     return render_template('forms/edit_artist.html',
                            form=form, artist=artist)
@@ -356,26 +749,56 @@ def edit_artist(artist_id):
 def edit_artist_submission(artist_id):
     # TODO: take values from the form submitted, and update existing
     # artist record with ID <artist_id> using the new attributes
-    form = ArtistForm(request.form)
+    form = EditArtistForm()
     if form.validate():
         try:
-            artist = Artist.query.get(artist_id)
-            artist.name = form.name.data
-            artist.city = form.city.data
-            artist.state = form.state.data
-            artist.phone = form.phone.data
-            artist.facebook_link = form.facebook_link.data
-            artist.website = form.website.data
-            artist.image_link = form.image_link.data
-            artist.genres = json.dumps(form.genres.data)
+            if form.image_file.data:  # an uploaded image replaces the link
+                form.image_link.data = image_store.save(
+                    form.image_file.data)
+            # one UPDATE ... WHERE id = ? AND version = ?, nothing is loaded
+            version = update_versioned(Artist, artist_id,
+                                       form.version.data, {
+                                           "name": form.name.data,
+                                           "city": form.city.data,
+                                           "state": form.state.data,
+                                           "phone": form.phone.data,
+                                           "facebook_link":
+                                               form.facebook_link.data,
+                                           "website": form.website_link.data,
+                                           "image_link": form.image_link.data,
+                                           "genres":
+                                               json.dumps(form.genres.data),
+                                           "genre_mask":
+                                               Genre.mask(form.genres.data),
+                                           "seeking_venue":
+                                               form.seeking_venue.data,
+                                           "seeking_description":
+                                               form.seeking_description.data,
+                                       })
+            if version is None:
+                db.session.rollback()
+                flash('Artist ' + request.form['name'] +
+                      ' was changed or removed by someone else. '
+                      'Please review it and try again.')
+                return redirect(url_for('edit_artist',
+                                        artist_id=artist_id))
+            update_artist_cards(artist_id, form.name.data,
+                                form.image_link.data)
+            touch_counterparts('artist', artist_id)
+            record('artist', artist_id, 'updated')
             db.session.commit()
+            names.add('artist', artist_id, form.name.data)
+            feed.renamed('artist', artist_id, form.name.data,
+                         form.image_link.data)
+            invalidate_facets()
+            invalidate_searches()
             flash('Artist ' + request.form['name'] +
                   ' was successfully updated!')
             return redirect(url_for('show_artist',
                                     artist_id=artist_id))
         except Exception:
             db.session.rollback()
-            print(sys.exc_info())
+            app.logger.exception('Artist %s could not be updated', artist_id)
             flash('An error occurred. Artist ' +
                   request.form['name'] + ' could not be updated.')
             return redirect(url_for('edit_artist',
@@ -394,18 +817,25 @@ def edit_artist_submission(artist_id):
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
-    form = VenueForm()
+    form = EditVenueForm()
     # TODO: populate form with values from venue with ID <venue_id>
-    venue = Venue.query.filter_by(id=venue_id).first()
+    # columns only: the venue's shows are not loaded to fill the form
+    venue = db.session.query(*Venue.__table__.columns). \
+        filter(Venue.id == venue_id, Venue.deleted_at.is_(None)).first()
+    if venue is None:
+        abort(404)
     form.name.data = venue.name
     form.city.data = venue.city
     form.state.data = venue.state
     form.address.data = venue.address
     form.phone.data = venue.phone
     form.facebook_link.data = venue.facebook_link
-    form.website.data = venue.website
+    form.website_link.data = venue.website
     form.image_link.data = venue.image_link
     form.genres.data = json.loads(venue.genres)
+    form.seeking_talent.data = venue.seeking_talent
+    form.seeking_description.data = venue.seeking_description
+    form.version.data = venue.version
 
     return render_template('forms/edit_venue.html',
                            form=form, venue=venue)
@@ -415,27 +845,56 @@ def edit_venue(venue_id):
 def edit_venue_submission(venue_id):
     # TODO: take values from the form submitted, and update existing
     # venue record with ID <venue_id> using the new attributes
-    form = VenueForm(request.form)
+    form = EditVenueForm()
     if form.validate():
         try:
-            venue = Venue.query.get(venue_id)
-            venue.name = form.name.data
-            venue.city = form.city.data
-            venue.state = form.state.data
-            venue.address = form.address.data
-            venue.phone = form.phone.data
-            venue.facebook_link = form.facebook_link.data
-            venue.website = form.website.data
-            venue.image_link = form.image_link.data
-            venue.genres = json.dumps(form.genres.data)
+            if form.image_file.data:  # an uploaded image replaces the link
+                form.image_link.data = image_store.save(
+                    form.image_file.data)
+            # one UPDATE ... WHERE id = ? AND version = ?, nothing is loaded
+            version = update_versioned(Venue, venue_id,
+                                       form.version.data, {
+                                           "name": form.name.data,
+                                           "city": form.city.data,
+                                           "state": form.state.data,
+                                           "address": form.address.data,
+                                           "phone": form.phone.data,
+                                           "facebook_link":
+                                               form.facebook_link.data,
+                                           "website": form.website_link.data,
+                                           "image_link": form.image_link.data,
+                                           "genres":
+                                               json.dumps(form.genres.data),
+                                           "genre_mask":
+                                               Genre.mask(form.genres.data),
+                                           "seeking_talent":
+                                               form.seeking_talent.data,
+                                           "seeking_description":
+                                               form.seeking_description.data,
+                                       })
+            if version is None:
+                db.session.rollback()
+                flash('Venue ' + request.form['name'] +
+                      ' was changed or removed by someone else. '
+                      'Please review it and try again.')
+                return redirect(url_for('edit_venue',
+                                        venue_id=venue_id))
+            update_venue_cards(venue_id, form.name.data)
+            touch_counterparts('venue', venue_id)
+            record('venue', venue_id, 'updated')
             db.session.commit()
+            names.add('venue', venue_id, form.name.data)
+            feed.renamed('venue', venue_id, form.name.data,
+                         form.image_link.data)
+            invalidate_facets()
+            invalidate_searches()
             flash('Venue ' + request.form['name'] +
                   ' was successfully updated!')
             return redirect(url_for('show_venue',
                                     venue_id=venue_id))
         except Exception:
             db.session.rollback()
-            print(sys.exc_info())
+            app.logger.exception('Venue %s could not be updated', venue_id)
             flash('An error occurred. Venue ' +
                   request.form['name'] + ' could not be updated.')
             return redirect(url_for('edit_venue',
@@ -469,31 +928,42 @@ def create_artist_submission():
     # TODO: insert form data as a new Venue record in the db, instead
     # TODO: modify data to be the data object returned from db insertion
     # meta={'csrf': False} to disable csrf token
-    form = ArtistForm(request.form, meta={'csrf': False})
+    form = ArtistForm(meta={'csrf': False})
     if form.validate():
         try:
+            if form.image_file.data:  # an uploaded image replaces the link
+                form.image_link.data = image_store.save(
+                    form.image_file.data)
             artist = Artist(name=form.name.data,
                             city=form.city.data,
                             state=form.state.data,
                             phone=form.phone.data,
                             facebook_link=form.facebook_link.data,
-                            website=form.website.data,
+                            website=form.website_link.data,
                             image_link=form.image_link.data,
                             genres=json.dumps(form.genres.data),
+                            genre_mask=Genre.mask(form.genres.data),
                             seeking_venue=form.seeking_venue.data,
                             seeking_description=form.seeking_description.data)
             db.session.add(artist)
+            db.session.flush()  # to get the artist id for the change log
+            record('artist', artist.id, 'created')
             db.session.commit()
+            names.add('artist', artist.id, artist.name)
+            feed.listed('artist', artist.id, artist.name, artist.image_link)
+            invalidate_facets()
+            invalidate_searches()
             # on successful db insert, flash success
             flash('Artist ' + request.form['name'] +
                   ' was successfully listed!')
-            return render_template('pages/home.html')
+            return render_home()
         except Exception:
             db.session.rollback()
-            print(sys.exc_info())
+            app.logger.exception('Artist %s could not be listed',
+                                 request.form.get('name'))
             flash('An error occurred. Artist ' +
                   request.form['name'] + ' could not be listed.')
-            return render_template('pages/home.html')
+            return render_home()
         finally:
             db.session.close()
     else:
@@ -502,7 +972,7 @@ def create_artist_submission():
             for error in errors:
                 message.append(field + ' ' + error)
         flash('Errors ' + str(message))
-        return render_template('pages/home.html')
+        return render_home()
 
 #  ----------------------------------------------------------------
 #  Shows
@@ -512,23 +982,25 @@ def create_artist_submission():
 @app.route('/shows')
 def shows():
     # displays list of shows at /shows
-    # TODO: replace with real venues data.
-    shows = Show.query.all()
-    data = []
-    for attribute in shows:
-        item = ({
-            "venue_id": attribute.Venue.id,
-            "venue_name": attribute.Venue.name,
-            "artist_id": attribute.Artist.id,
-            "artist_name": attribute.Artist.name,
-            "artist_image_link": attribute.Artist.image_link,
-            "start_time": attribute.Show.date.strftime("%Y-%m-%d %H:%M:%S")
-        })
-        data.append(item)
+    # reads the flat ShowCard rows, no joins against Venue or Artist
+    data = show_items()
 
     return render_template('pages/shows.html', shows=data)
 
 
+def refresh_recommendations(artist_ids):
+    # runs after the shows are committed; a failure only leaves the
+    # similar artist lists stale until `flask recommendations rebuild`
+    try:
+        for artist_id in sorted(artist_ids):
+            refresh_similar_artists(artist_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        app.logger.exception('Could not refresh similar artists for %s',
+                             sorted(artist_ids))
+
+
 @app.route('/shows/create')
 def create_shows():
     # renders form. do not touch.
@@ -543,18 +1015,42 @@ def create_show_submission():
     # TODO: insert form data as a new Show record in the db, instead
     form = ShowForm(request.form, meta={'csrf': False})
     if form.validate():
+        # soft-deleted artists and venues can't be booked, as in a batch
+        missing = []
+        if db.session.query(Artist.id).filter(
+                Artist.id == form.artist_id.data,
+                Artist.deleted_at.is_(None)).first() is None:
+            missing.append('artist_id Artist does not exist')
+        if db.session.query(Venue.id).filter(
+                Venue.id == form.venue_id.data,
+                Venue.deleted_at.is_(None)).first() is None:
+            missing.append('venue_id Venue does not exist')
+        if missing:
+            flash('Errors ' + str(missing))
+            return redirect(url_for('create_shows'))
         try:
             show = Show(artist_id=form.artist_id.data,
                         venue_id=form.venue_id.data,
-                        date=form.start_time.data)
+                        start_time=form.start_time.data)
             db.session.add(show)
+            db.session.flush()  # to get the show id for its card
+            record_new_shows(Show.id == show.id)
+            insert_show_cards(Show.id == show.id)
+            add_shows([{"artist_id": int(show.artist_id),
+                        "venue_id": int(show.venue_id),
+                        "start_time": show.start_time}])
+            touch(Venue, Venue.id == show.venue_id)
+            touch(Artist, Artist.id == show.artist_id)
+            show_id = show.id
             db.session.commit()
+            feed.booked(ShowCard.show_id == show_id)
+            refresh_recommendations([int(form.artist_id.data)])
             # on successful db insert, flash success
             flash('Show was successfully listed!')
-            return render_template('pages/home.html')
+            return render_home()
         except Exception:
             db.session.rollback()
-            print(sys.exc_info())
+            app.logger.exception('Show could not be listed')
             flash('An error occurred. Show could not be listed.')
             return redirect(url_for('create_shows'))
         finally:
@@ -575,6 +1071,197 @@ def create_show_submission():
     # return render_template('pages/home.html')
 
 
+def batch_show_rows():
+    # rows of {artist_id, venue_id, start_time} from a JSON body
+    # ({"artist_id": 1, "shows": [{"venue_id": 2, "start_time": ...}]})
+    # or from a form with repeated venue_id/start_time fields; None for a
+    # JSON body of any other shape
+    if request.is_json:
+        payload = request.get_json(silent=True) or {}
+        if isinstance(payload, list):
+            payload = {"shows": payload}
+        if not isinstance(payload, dict) or \
+                not isinstance(payload.get('shows') or [], list):
+            return None
+        rows = []
+        for row in payload.get('shows') or []:
+            if not isinstance(row, dict):
+                row = {}
+            rows.append({
+                "artist_id": row.get('artist_id', payload.get('artist_id')),
+                "venue_id": row.get('venue_id'),
+                "start_time": row.get('start_time'),
+            })
+    else:
+        artist_ids = request.form.getlist('artist_id')
+        venue_ids = request.form.getlist('venue_id')
+        start_times = request.form.getlist('start_time')
+        rows = []
+        for index, venue_id in enumerate(venue_ids):
+            start_time = start_times[index] if index < len(start_times) \
+                else ''
+            if not venue_id and not start_time:
+                continue  # blank row left in the form
+            artist_id = artist_ids[index] if len(artist_ids) > 1 \
+                else (artist_ids or [''])[0]
+            rows.append({
+                "artist_id": artist_id,
+                "venue_id": venue_id,
+                "start_time": start_time,
+            })
+    return [{key: '' if value is None else str(value)
+             for key, value in row.items()} for row in rows]
+
+
+def insert_shows(values):
+    # one multi-row INSERT; the ids of its rows come from RETURNING, or on
+    # SQLite (no RETURNING in SQLAlchemy 1.4) from the last rowid, since
+    # the rows of one INSERT are numbered consecutively there
+    statement = insert(Show).values(values)
+    if db.engine.dialect.full_returning:
+        return db.session.execute(statement.returning(Show.id)). \
+            scalars().all()
+    last = db.session.execute(statement).lastrowid
+    return list(range(last - len(values) + 1, last + 1))
+
+
+@app.route('/shows/batch', methods=['GET'])
+def create_shows_batch_form():
+    return render_template('forms/new_show_batch.html')
+
+
+@app.route('/shows/batch', methods=['POST'])
+def create_shows_batch():
+    # books a whole tour at once: every row is validated first, artists and
+    # venues are checked with one IN query each, and the shows are inserted
+    # with a single multi-row INSERT in one transaction. Nothing is written
+    # unless every row is valid.
+    rows = batch_show_rows()
+    if rows is None:
+        return jsonify({"success": False, "errors": [{
+            "row": None, "errors": {"shows": [
+                'Expected an object with a list of shows']}}]}), 400
+    errors = []
+    values = []
+    for index, row in enumerate(rows):
+        form = ShowForm(MultiDict(row), meta={'csrf': False})
+        if form.validate():
+            values.append({"artist_id": int(form.artist_id.data),
+                           "venue_id": int(form.venue_id.data),
+                           "start_time": form.start_time.data})
+        else:
+            errors.append({"row": index, "errors": form.errors})
+    if not rows:
+        errors.append({"row": None, "errors": {"shows": ['No shows given']}})
+
+    if not errors:
+        artist_ids = {value['artist_id'] for value in values}
+        venue_ids = {value['venue_id'] for value in values}
+        found_artists = {artist_id for artist_id, in db.session.query(
+            Artist.id).filter(Artist.id.in_(artist_ids)).
+            filter(Artist.deleted_at.is_(None))}
+        found_venues = {venue_id for venue_id, in db.session.query(
+            Venue.id).filter(Venue.id.in_(venue_ids)).
+            filter(Venue.deleted_at.is_(None))}
+        for index, value in enumerate(values):
+            row_errors = {}
+            if value['artist_id'] not in found_artists:
+                row_errors['artist_id'] = ['Artist does not exist']
+            if value['venue_id'] not in found_venues:
+                row_errors['venue_id'] = ['Venue does not exist']
+            if row_errors:
+                errors.append({"row": index, "errors": row_errors})
+
+    if not errors:
+        try:
+            show_ids = insert_shows(values)
+            record_new_shows(Show.id.in_(show_ids))
+            insert_show_cards(Show.id.in_(show_ids))
+            add_shows(values)
+            touch(Venue, Venue.id.in_(venue_ids))
+            touch(Artist, Artist.id.in_(artist_ids))
+            db.session.commit()
+            feed.booked(ShowCard.show_id.in_(show_ids))
+            refresh_recommendations(artist_ids)
+        except Exception:
+            db.session.rollback()
+            app.logger.exception('Batch of %d shows could not be listed',
+                                 len(values))
+            errors.append({"row": None,
+                           "errors": {"shows": ['Shows could not be listed']}})
+        finally:
+            db.session.close()
+
+    if request.is_json:
+        if errors:
+            return jsonify({"success": False, "errors": errors}), 400
+        return jsonify({"success": True, "created": len(values)}), 201
+    if errors:
+        message = []
+        for error in errors:
+            for field, field_errors in error['errors'].items():
+                prefix = '' if error['row'] is None \
+                    else 'row ' + str(error['row']) + ' '
+                for field_error in field_errors:
+                    message.append(prefix + field + ' ' + field_error)
+        flash('Errors ' + str(message))
+        return redirect(url_for('create_shows_batch_form'))
+    flash(str(len(values)) + ' shows were successfully listed!')
+    return render_home()
+
+
+#  Events
+#  ----------------------------------------------------------------
+
+@app.route('/events')
+def events():
+    # EventSource clients get a stream of the changes after Last-Event-ID
+    # (or ?since=, or from now on); other clients get one JSON page of
+    # the changes after ?since= plus the cursor to ask for next
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', type=int)
+    if request.accept_mimetypes.best == 'text/event-stream':
+        if since is None:
+            since = latest_cursor()
+        db.session.close()
+        response = Response(stream_with_context(
+            event_stream(since, app.config)),
+            mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'  # for nginx
+        return response
+
+    limit = min(max(request.args.get('limit', 500, type=int), 1), 1000)
+    entries = changes_after(since or 0, limit)
+    return jsonify({
+        "events": [as_event(entry) for entry in entries],
+        "cursor": entries[-1].id if entries else since or 0,
+        "more": len(entries) == limit,
+    })
+
+#  Stats
+#  ----------------------------------------------------------------
+
+@app.route('/stats')
+def show_stats():
+    # trend dashboards for bookers, served from the ShowRollup table only
+    months = min(max(request.args.get('months', 12, type=int), 1), 60)
+    data = stats(months)
+    if request.args.get('format') == 'json':
+        return jsonify(data)
+    return render_template('pages/stats.html', stats=data, months=months)
+
+#  Metrics
+#  ----------------------------------------------------------------
+
+@app.route('/metrics')
+def show_metrics():
+    # Prometheus text format, summed over all worker processes
+    return Response(exposition(app),
+                    mimetype='text/plain; version=0.0.4')
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -585,16 +1272,6 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
-
 # ----------------------------------------------------------------------------#
 # Launch.
 # ----------------------------------------------------------------------------#
@@ -0,0 +1,86 @@
+"""CPU cost versus bytes saved of the response compression.
+
+Renders a venue page, an artist page and the /shows and /venues listings
+from a seeded in-memory SQLite database, then compresses each body at
+several gzip and brotli levels.
+
+    python benchmarks/compression.py [--shows 200]
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from compression import brotli  # noqa: E402
+from models import Artist, Show, Venue, db  # noqa: E402
+from read_models import insert_show_cards  # noqa: E402
+
+PAGES = ['/venues/1', '/artists/1', '/shows', '/venues']
+
+
+def seed(shows):
+    venues = [Venue(name=f'Venue {index}', city='San Francisco', state='CA',
+                    address=f'{index} Main St', phone='123-456-7890',
+                    genres='["Jazz", "Blues"]', genre_mask=0,
+                    image_link='https://example.com/venue.png')
+              for index in range(20)]
+    artists = [Artist(name=f'Artist {index}', city='San Francisco',
+                      state='CA', phone='123-456-7890', genres='["Jazz"]',
+                      genre_mask=0,
+                      image_link='https://example.com/artist.png')
+               for index in range(20)]
+    db.session.add_all(venues + artists)
+    db.session.flush()
+    start = datetime.now() - timedelta(days=shows // 2)
+    db.session.add_all(Show(venue_id=venues[index % 2 * 7].id,
+                            artist_id=artists[index % 3 * 5].id,
+                            start_time=start + timedelta(days=index))
+                       for index in range(shows))
+    db.session.flush()
+    insert_show_cards()
+    db.session.commit()
+
+
+def timed(compress, data, repeat=20):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        output = compress(data)
+    return len(output), (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shows', type=int, default=200)
+    args = parser.parse_args()
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    codecs = [(f'gzip-{level}',
+               lambda data, level=level: gzip.compress(data, level))
+              for level in (1, 6, 9)]
+    if brotli is not None:
+        codecs += [(f'br-{quality}',
+                    lambda data, quality=quality: brotli.compress(
+                        data, quality=quality))
+                   for quality in (1, 4, 11)]
+
+    with app.app_context():
+        db.create_all()
+        seed(args.shows)
+        client = app.test_client()
+        print(f'{"page":<12}{"codec":<9}{"bytes":>9}{"saved":>8}{"ms":>8}')
+        for page in PAGES:
+            data = client.get(page).get_data()
+            print(f'{page:<12}{"none":<9}{len(data):>9}{"":>8}{"":>8}')
+            for name, compress in codecs:
+                size, ms = timed(compress, data)
+                print(f'{"":<12}{name:<9}{size:>9}'
+                      f'{1 - size / len(data):>8.0%}{ms:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
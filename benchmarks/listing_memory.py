@@ -0,0 +1,118 @@
+"""Memory of the /artists listing as ORM instances versus namedtuple rows.
+
+Every variant runs in a fresh process that seeds an in-memory SQLite
+database with --rows artists (one show each, so the joined shows
+relationship has something to load) and then loads the listing:
+
+    orm   Artist.query...all(), the listing before listings.py
+    rows  listings.artist_items()
+
+and reports the bytes retained per row (tracemalloc) and the peak RSS of
+the process (getrusage) over the RSS before the load.
+
+    python benchmarks/listing_memory.py [--rows 100000]
+"""
+import argparse
+import gc
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import app  # noqa: E402
+from listings import artist_items  # noqa: E402
+from models import Artist, Show, Venue, db  # noqa: E402
+
+VARIANTS = {
+    'orm': lambda: Artist.query.filter(Artist.deleted_at.is_(None)).
+    order_by('id').all(),
+    'rows': artist_items,
+}
+
+
+def seed(rows, batch=5000):
+    # in batches, so seeding does not set the peak RSS
+    db.session.add(Venue(name='Venue', city='San Francisco', state='CA',
+                         genres='["Jazz"]', genre_mask=0))
+    for start in range(0, rows, batch):
+        stop = min(start + batch, rows)
+        db.session.execute(insert(Artist), [
+            {"name": f'Artist {index}', "city": 'San Francisco',
+             "state": 'CA', "phone": '123-456-7890', "genres": '["Jazz"]',
+             "genre_mask": 0, "image_link": 'https://example.com/artist.png'}
+            for index in range(start, stop)])
+        db.session.execute(insert(Show), [
+            {"venue_id": 1, "artist_id": index + 1,
+             "start_time": datetime(2030, 1, 1)}
+            for index in range(start, stop)])
+    db.session.commit()
+    db.session.remove()
+
+
+def current_rss():
+    # resident pages from /proc, in KiB like ru_maxrss on Linux
+    with open('/proc/self/statm') as file:
+        return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def measure(rows, variant, trace):
+    # runs in a child process, so every variant starts from the same RSS
+    with app.app_context():
+        db.create_all()
+        seed(rows)
+        gc.collect()
+        load = VARIANTS[variant]
+        if trace:
+            tracemalloc.start()
+            listing = load()
+            retained = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            print(len(listing), retained)
+            return
+        before = current_rss()
+        started = time.perf_counter()
+        listing = load()
+        seconds = time.perf_counter() - started
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(len(listing), before, peak, seconds)
+
+
+def child(rows, variant, trace=False):
+    output = subprocess.run(
+        [sys.executable, __file__, '--rows', str(rows), '--variant',
+         variant] + (['--trace'] if trace else []),
+        check=True, capture_output=True, text=True).stdout
+    return [float(value) for value in output.split()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--variant', help=argparse.SUPPRESS)
+    parser.add_argument('--trace', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        measure(args.rows, args.variant, args.trace)
+        return
+
+    print(f'{"variant":<9}{"rows":>9}{"bytes/row":>11}'
+          f'{"RSS before":>12}{"peak RSS":>10}{"growth":>9}{"load s":>8}')
+    for variant in VARIANTS:
+        rows, retained = child(args.rows, variant, trace=True)
+        rows, before, peak, seconds = child(args.rows, variant)
+        print(f'{variant:<9}{int(rows):>9}{retained / rows:>11.0f}'
+              f'{before / 1024:>10.0f}MB{peak / 1024:>8.0f}MB'
+              f'{(peak - before) / 1024:>7.0f}MB{seconds:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import threading  # to guard the entries across request threads
+import time  # for expiry
+from collections import OrderedDict  # LRU order
+
+# ----------------------------------------------------------------------------#
+# Cache.
+# ----------------------------------------------------------------------------#
+
+
+class Cache:
+    """Bounded in-process LRU cache with per-entry TTL.
+
+    Entries live in namespaces. invalidate(namespace) bumps the namespace's
+    generation, which makes every older entry unreachable at once; they are
+    evicted by the LRU bound as new entries come in. Each worker process
+    has its own cache, so the TTL bounds how long another worker can serve
+    a value after a write it did not see.
+    """
+
+    def __init__(self, max_entries=2048, default_ttl=300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def _key(self, namespace, key):
+        return (namespace, self._generations.get(namespace, 0), key)
+
+    def get(self, namespace, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            full_key = self._key(namespace, key)
+            entry = self._entries.get(full_key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[full_key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(full_key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, namespace, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl or self.default_ttl)
+        with self._lock:
+            full_key = self._key(namespace, key)
+            self._entries[full_key] = (expires_at, value)
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def cached(self, namespace, key, compute, ttl=None):
+        # compute() runs outside the lock; concurrent misses may both run it
+        missing = object()
+        value = self.get(namespace, key, missing)
+        if value is missing:
+            value = compute()
+            self.set(namespace, key, value, ttl)
+        return value
+
+    def invalidate(self, *namespaces):
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] = \
+                    self._generations.get(namespace, 0) + 1
+
+
+cache = Cache()  # shared by the app
@@ -0,0 +1,81 @@
+from datetime import datetime
+
+from sqlalchemy import select
+
+from models import Artist, Show, Venue, db
+
+# ----------------------------------------------------------------------------#
+# iCalendar feeds.
+# ----------------------------------------------------------------------------#
+
+# RFC 5545 feeds of a venue's or an artist's upcoming shows. Times are
+# written as floating local times, the way start_time is stored, and every
+# show is given two hours.
+
+PRODID = '-//Fyyur//Shows//EN'
+
+
+def escape_text(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;'). \
+        replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def fold(line):
+    # content lines are limited to 75 octets, continued with CRLF + space
+    data = line.encode()
+    chunks = []
+    while len(data) > 75:
+        cut = 75 if not chunks else 74
+        # never split a UTF-8 sequence
+        while data[cut] & 0xC0 == 0x80:
+            cut -= 1
+        chunks.append(data[:cut])
+        data = data[cut:]
+    chunks.append(data)
+    return b'\r\n '.join(chunks).decode() + '\r\n'
+
+
+def ical_time(value):
+    return value.strftime('%Y%m%dT%H%M%S')
+
+
+def upcoming_rows(kind, entity_id):
+    # one query on the (venue_id, start_time) / (artist_id, start_time)
+    # index, streamed from the cursor
+    column = getattr(Show, kind + '_id')
+    return db.session.execute(
+        select(Show.id, Show.start_time, Venue.id.label('venue_id'),
+               Venue.name.label('venue_name'), Venue.address, Venue.city,
+               Venue.state, Artist.id.label('artist_id'),
+               Artist.name.label('artist_name')).
+        join(Venue, Venue.id == Show.venue_id).
+        join(Artist, Artist.id == Show.artist_id).
+        where(column == entity_id, Show.start_time >= datetime.now(),
+              Venue.deleted_at.is_(None), Artist.deleted_at.is_(None)).
+        order_by(Show.start_time, Show.id).
+        execution_options(stream_results=True))
+
+
+def calendar_lines(title, rows, base_url):
+    yield fold('BEGIN:VCALENDAR')
+    yield fold('VERSION:2.0')
+    yield fold('PRODID:' + PRODID)
+    yield fold('CALSCALE:GREGORIAN')
+    yield fold('X-WR-CALNAME:' + escape_text(title))
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    for row in rows:
+        location = ', '.join(part for part in (row.address, row.city,
+                                               row.state) if part)
+        yield ''.join([
+            fold('BEGIN:VEVENT'),
+            fold(f'UID:show-{row.id}@fyyur'),
+            fold('DTSTAMP:' + stamp),
+            fold('DTSTART:' + ical_time(row.start_time)),
+            fold('DURATION:PT2H'),
+            fold('SUMMARY:' + escape_text(
+                f'{row.artist_name} at {row.venue_name}')),
+            fold('LOCATION:' + escape_text(location)),
+            fold(f'URL:{base_url}venues/{row.venue_id}'),
+            fold('END:VEVENT'),
+        ])
+    yield fold('END:VCALENDAR')
@@ -0,0 +1,108 @@
+import json
+import time  # to pace the stream
+from datetime import datetime, timedelta
+
+import click  # for the command line output
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, literal, select
+
+from models import ChangeLog, Show, ShowCard, db
+
+# ----------------------------------------------------------------------------#
+# Change feed.
+# ----------------------------------------------------------------------------#
+
+# Every create, edit and delete handler appends to ChangeLog inside its own
+# transaction, so an entry exists exactly when its change committed.
+# /events replays the entries after a cursor (the last ChangeLog id a
+# client has seen) as server-sent events, or as a JSON page for ?since=.
+
+
+def record(kind, entity_id, action):
+    db.session.execute(insert(ChangeLog).values(
+        kind=kind, entity_id=entity_id, action=action,
+        changed_at=datetime.utcnow()))
+
+
+def record_shows(action, *criteria):
+    # one INSERT ... SELECT for the matching shows
+    source = select(literal('show'), Show.id, literal(action),
+                    Show.venue_id, Show.artist_id,
+                    literal(datetime.utcnow())).where(*criteria)
+    db.session.execute(insert(ChangeLog).from_select(
+        ['kind', 'entity_id', 'action', 'venue_id', 'artist_id',
+         'changed_at'], source))
+
+
+def record_new_shows(*criteria):
+    # call before read_models.insert_show_cards(): the shows matching
+    # criteria that have no card yet are the ones just inserted
+    record_shows('created', *criteria,
+                 ~select(ShowCard.show_id).
+                 where(ShowCard.show_id == Show.id).exists())
+
+
+def as_event(entry):
+    event = {"cursor": entry.id, "type": entry.kind + '.' + entry.action,
+             "id": entry.entity_id,
+             "changed_at": entry.changed_at.isoformat() + 'Z'}
+    if entry.kind == 'show':
+        event['venue_id'] = entry.venue_id
+        event['artist_id'] = entry.artist_id
+    else:
+        event['url'] = '/' + entry.kind + 's/' + str(entry.entity_id)
+    return event
+
+
+def changes_after(cursor, limit):
+    return db.session.execute(
+        select(ChangeLog).where(ChangeLog.id > cursor).
+        order_by(ChangeLog.id).limit(limit)).scalars().all()
+
+
+def latest_cursor():
+    return db.session.execute(select(func.max(ChangeLog.id))).scalar() or 0
+
+
+def event_stream(cursor, config):
+    """Server-sent events for the entries after cursor.
+
+    Polls the primary key index every EVENTS_POLL_INTERVAL seconds and
+    returns the connection to the pool between polls. A comment line
+    keeps idle connections open; after EVENTS_MAX_STREAM seconds the
+    stream ends and EventSource reconnects with Last-Event-ID. The worker
+    serving the stream is busy until then, see config.py.
+    """
+    yield f'retry: {int(config["EVENTS_RETRY"] * 1000)}\n\n'
+    started = last_sent = time.monotonic()
+    while time.monotonic() - started < config['EVENTS_MAX_STREAM']:
+        entries = changes_after(cursor, config['EVENTS_BATCH'])
+        db.session.close()
+        for entry in entries:
+            event = as_event(entry)
+            cursor = entry.id
+            yield (f'id: {cursor}\nevent: {event["type"]}\n'
+                   f'data: {json.dumps(event)}\n\n')
+        if entries:
+            last_sent = time.monotonic()
+            if len(entries) == config['EVENTS_BATCH']:
+                continue  # catching up, no pause
+        elif time.monotonic() - last_sent >= config['EVENTS_HEARTBEAT']:
+            yield ': keep-alive\n\n'
+            last_sent = time.monotonic()
+        time.sleep(config['EVENTS_POLL_INTERVAL'])
+
+
+cli = AppGroup('events', help='Change feed.')
+
+
+@cli.command('prune')
+@click.option('--keep-days', default=30, show_default=True,
+              help='Days of changes to keep.')
+def prune_command(keep_days):
+    """Delete old change log entries."""
+    removed = db.session.execute(delete(ChangeLog).where(
+        ChangeLog.changed_at < datetime.utcnow() -
+        timedelta(days=keep_days))).rowcount
+    db.session.commit()
+    click.echo(f'Removed {removed} change log entries')
@@ -0,0 +1,95 @@
+import gzip
+import zlib  # streaming gzip
+
+from flask import request
+
+try:
+    import brotli  # optional, gzip only without it
+except ImportError:
+    brotli = None
+
+# ----------------------------------------------------------------------------#
+# Response compression.
+# ----------------------------------------------------------------------------#
+
+# Text responses are compressed with brotli or gzip, whichever the client
+# prefers in Accept-Encoding (brotli on a tie). Buffered responses below
+# COMPRESS_MIN_SIZE go out as they are; streamed responses are compressed
+# chunk by chunk and flushed after every chunk so nothing is held back.
+# A compressed response carries the ETag of the uncompressed one plus
+# "-gzip" or "-br", see conditional.is_not_modified.
+
+ETAG_SUFFIXES = {'gzip': '-gzip', 'br': '-br'}
+
+
+def choose_encoding(accept_encodings):
+    available = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best = max(available, key=lambda encoding: (
+        accept_encodings[encoding], encoding == 'br'))
+    return best if accept_encodings[best] > 0 else None
+
+
+def compress(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESS_BR_LEVEL'])
+    return gzip.compress(data, config['COMPRESS_LEVEL'], mtime=0)
+
+
+def compress_stream(chunks, encoding, config):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=config['COMPRESS_BR_LEVEL'])
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+        return
+    # wbits 31: deflate with a gzip header and trailer
+    compressor = zlib.compressobj(config['COMPRESS_LEVEL'], zlib.DEFLATED, 31)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def is_compressible(response, config):
+    return (response.mimetype in config['COMPRESS_MIMETYPES'] and
+            200 <= response.status_code < 300 and
+            response.status_code != 204 and
+            not response.direct_passthrough and
+            'Content-Encoding' not in response.headers and
+            'Content-Range' not in response.headers)
+
+
+def compress_response(response, config):
+    if not is_compressible(response, config):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None or request.method == 'HEAD':
+        return response
+
+    if response.is_streamed:
+        chunks = (chunk.encode(response.charset) if isinstance(chunk, str)
+                  else chunk for chunk in response.response)
+        response.response = compress_stream(chunks, encoding, config)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+        response.set_data(compress(data, encoding, config))
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(etag + ETAG_SUFFIXES[encoding], weak)
+    return response
+
+
+def init_compression(app):
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BR_LEVEL', 4)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+    app.config.setdefault('COMPRESS_MIMETYPES', [
+        'text/html', 'text/css', 'text/plain', 'text/calendar',
+        'application/json', 'application/javascript'])
+    app.after_request(lambda response: compress_response(response,
+                                                         app.config))
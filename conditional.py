@@ -0,0 +1,79 @@
+import hashlib  # to derive ETags
+from datetime import datetime, timezone
+
+from flask import make_response, request, session
+from sqlalchemy import select
+
+from compression import ETAG_SUFFIXES
+from models import db
+
+# ----------------------------------------------------------------------------#
+# Conditional GET.
+# ----------------------------------------------------------------------------#
+
+# A detail page changes when its row's version or updated_at changes (see
+# models.touch), and when a show moves from upcoming to past. The latter
+# is covered by folding the current hour into the validators: a cached
+# page is revalidated into a full response at most an hour after a show
+# has started.
+
+
+def page_validators(model, entity_id, variant='page'):
+    """(etag, last_modified) for a live Venue or Artist, or None.
+
+    variant tells apart the representations of one row (the HTML page,
+    the calendar feed) so their ETags differ.
+
+    One primary key lookup of two columns; the page itself, its shows and
+    its template are not touched.
+    """
+    row = db.session.execute(
+        select(model.version, model.updated_at).
+        where(model.id == entity_id, model.deleted_at.is_(None))).first()
+    if row is None:
+        return None
+    hour = datetime.now(timezone.utc).replace(minute=0, second=0,
+                                              microsecond=0)
+    etag = hashlib.sha1(
+        f'{variant}:{model.__tablename__}:{entity_id}:{row.version}:'
+        f'{row.updated_at.isoformat()}:{hour.isoformat()}'.encode()). \
+        hexdigest()
+    # HTTP dates have whole seconds, the ETag keeps the full precision
+    updated_at = row.updated_at.replace(tzinfo=timezone.utc,
+                                        microsecond=0)
+    return etag, max(updated_at, hour)
+
+
+def matching_etag(etag):
+    # the client may hold the plain, gzip or brotli variant of the page
+    for suffix in ('',) + tuple(ETAG_SUFFIXES.values()):
+        if request.if_none_match.contains(etag + suffix):
+            return etag + suffix
+    return None
+
+
+def is_not_modified(etag, last_modified):
+    # If-None-Match wins over If-Modified-Since when both are sent
+    if '_flashes' in session:
+        return False  # a pending flash message has to be rendered
+    if request.if_none_match:
+        return matching_etag(etag) is not None
+    if request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def not_modified(etag, last_modified):
+    response = make_response('', 304)
+    response.vary.add('Accept-Encoding')
+    with_validators(response, etag, last_modified)
+    if request.if_none_match:
+        response.set_etag(matching_etag(etag) or etag)
+    return response
+
+
+def with_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True  # always revalidate
+    return response
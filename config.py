@@ -7,6 +7,54 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 DEBUG = True
 SQLAlCHEMY_TRACK_MODIFICATIONS = False # to suppress a warning
 
+# Error log, written as JSON lines by a background thread (logging_setup.py)
+LOG_FILE = os.path.join(basedir, 'error.log')
+LOG_MAX_BYTES = 10 * 1024 * 1024  # rotate at 10 MB
+LOG_BACKUP_COUNT = 5
+LOG_LEVEL = 'INFO'
+
+# Show partitions and archive (partitions.py)
+SHOW_PARTITIONS_AHEAD = 12  # months with a partition ahead of the current one
+SHOW_ARCHIVE_AFTER_MONTHS = 24  # past months kept in the database
+SHOW_ARCHIVE_DIR = os.path.join(basedir, 'archive')
+
+# Response compression (compression.py)
+COMPRESS_LEVEL = 6  # gzip, 1-9
+COMPRESS_BR_LEVEL = 4  # brotli, 0-11
+COMPRESS_MIN_SIZE = 500  # bytes; smaller buffered responses go out as is
+
+# Change feed (changes.py)
+# An open stream holds a worker (thread) for up to EVENTS_MAX_STREAM
+# seconds: serve /events with a threaded or gevent worker class, not sync
+# workers, or keep the streams short.
+EVENTS_POLL_INTERVAL = 1.0  # seconds between change log polls
+EVENTS_HEARTBEAT = 15  # seconds of silence before a keep-alive comment
+EVENTS_MAX_STREAM = 30  # seconds before a stream ends and reconnects
+EVENTS_RETRY = 3  # seconds EventSource waits before reconnecting
+EVENTS_BATCH = 500  # entries read per poll
+
+# Search (listings.py) and rate limiting (ratelimit.py)
+SEARCH_CACHE_TTL = 60  # seconds a cached search may miss another worker's write
+RATELIMIT_ENABLED = True
+RATELIMIT_SEARCH_RATE = 1.0  # searches per second per client IP
+RATELIMIT_SEARCH_BURST = 10  # searches allowed at once
+
+# Image store (images.py)
+IMAGE_DIR = os.path.join(basedir, 'media')
+IMAGE_WORKERS = 2  # threads making resized variants of uploads
+MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # bytes; larger uploads get a 413
+
+# Static snapshot (snapshot.py)
+SNAPSHOT_DIR = os.path.join(basedir, 'snapshot')
+
+# Migrations (migrations/online.py)
+MIGRATION_LOCK_TIMEOUT = '5s'  # Postgres lock wait before a migration fails
+
+# Metrics (metrics.py)
+# set to a directory shared by the worker processes to sum their metrics
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 5  # seconds between snapshots of each process
+
 # Connect to the database
 
 # TODO IMPLEMENT DATABASE URL
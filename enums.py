@@ -28,6 +28,22 @@ class Genre(enum.Enum):
           statically without having an instance of the class."""
         return [(choice.name, choice.value) for choice in cls]
 
+    @classmethod
+    def mask(cls, names):
+        """ Bitmask of the given genre names, one bit per member in
+          declaration order. Stored in Venue/Artist.genre_mask, so new
+          members must be appended, never inserted or reordered."""
+        mask = 0
+        for index, choice in enumerate(cls):
+            if choice.name in names:
+                mask |= 1 << index
+        return mask
+
+    @classmethod
+    def from_mask(cls, mask):
+        return [choice.name for index, choice in enumerate(cls)
+                if mask & (1 << index)]
+
 
 class State(enum.Enum):
     AL = 'AL'
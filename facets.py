@@ -0,0 +1,109 @@
+from sqlalchemy import case, func, literal, null, select, tuple_, union_all
+
+from cache import cache
+from enums import Genre
+from models import Artist, Venue, db
+
+# ----------------------------------------------------------------------------#
+# Faceted browse.
+# ----------------------------------------------------------------------------#
+
+SEEKING = {'venue': 'seeking_talent', 'artist': 'seeking_venue'}
+
+
+def listing_model(kind):
+    return Venue if kind == 'venue' else Artist
+
+
+def genre_match(model, genres, match='any'):
+    # a single bitwise predicate over Venue/Artist.genre_mask
+    mask = Genre.mask(genres)
+    if match == 'all':
+        return model.genre_mask.op('&')(mask) == mask
+    return model.genre_mask.op('&')(mask) != 0
+
+
+def browse_criteria(kind, state=None, genres=(), seeking=None, match='any'):
+    # genres match any of the given ones, or all of them
+    model = listing_model(kind)
+    criteria = [model.deleted_at.is_(None)]
+    if state:
+        criteria.append(model.state == state)
+    if genres:
+        criteria.append(genre_match(model, genres, match))
+    if seeking is not None:
+        criteria.append(getattr(model, SEEKING[kind]) == seeking)
+    return criteria
+
+
+def browse(kind, state=None, genres=(), seeking=None, match='any',
+           limit=100, offset=0):
+    model = listing_model(kind)
+    return db.session.execute(
+        select(model.id, model.name, model.city, model.state).
+        where(*browse_criteria(kind, state, genres, seeking, match)).
+        order_by(model.name, model.id).
+        limit(limit).offset(offset)).all()
+
+
+def facet_query(kind, criteria):
+    # state and seeking counts are grouping sets of one statement; genre
+    # counts are conditional sums over the ungrouped row
+    model = listing_model(kind)
+    seeking_column = getattr(model, SEEKING[kind])
+    genre_counts = [func.sum(case((genre_match(model, [genre.name]), 1),
+                                  else_=0)).label(genre.name)
+                    for genre in Genre]
+    if db.engine.dialect.name == 'postgresql':
+        return select(model.state.label('state'),
+                      seeking_column.label('seeking'),
+                      func.grouping(model.state).label('by_state'),
+                      func.grouping(seeking_column).label('by_seeking'),
+                      func.count().label('total'),
+                      *genre_counts). \
+            where(*criteria). \
+            group_by(func.grouping_sets(tuple_(model.state),
+                                        tuple_(seeking_column),
+                                        tuple_()))
+
+    # without GROUPING SETS: the same three groupings as one UNION ALL
+    no_genres = [literal(0).label(genre.name) for genre in Genre]
+    return union_all(
+        select(model.state.label('state'), null().label('seeking'),
+               literal(0).label('by_state'), literal(1).label('by_seeking'),
+               func.count().label('total'), *no_genres).
+        where(*criteria).group_by(model.state),
+        select(null(), seeking_column, literal(1), literal(0),
+               func.count(), *no_genres).
+        where(*criteria).group_by(seeking_column),
+        select(null(), null(), literal(1), literal(1),
+               func.count(), *genre_counts).
+        where(*criteria))
+
+
+def count_facets(kind, state=None, genres=(), seeking=None, match='any'):
+    criteria = browse_criteria(kind, state, genres, seeking, match)
+    counts = {"total": 0, "state": {}, "genre": {}, "seeking": {}}
+    for row in db.session.execute(facet_query(kind, criteria)):
+        if row.by_state == 0:
+            if row.state:
+                counts['state'][row.state] = row.total
+        elif row.by_seeking == 0:
+            counts['seeking'][bool(row.seeking)] = \
+                counts['seeking'].get(bool(row.seeking), 0) + row.total
+        else:
+            counts['total'] = row.total
+            for genre in Genre:
+                counts['genre'][genre.name] = row._mapping[genre.name] or 0
+    return counts
+
+
+def facet_counts(kind, state=None, genres=(), seeking=None, match='any'):
+    # cached until the next venue or artist write, see invalidate_facets()
+    key = (kind, state, tuple(sorted(genres)), seeking, match)
+    return cache.cached('facets', key, lambda: count_facets(
+        kind, state, genres, seeking, match))
+
+
+def invalidate_facets():
+    cache.invalidate('facets')
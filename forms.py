@@ -4,16 +4,21 @@ from wtforms import StringField, \
     SelectField, \
     SelectMultipleField, \
     DateTimeField, \
-    BooleanField
+    BooleanField, \
+    IntegerField
 from wtforms.validators import DataRequired, \
     AnyOf, \
     URL, \
     Regexp, \
-    Optional
+    Optional, \
+    InputRequired
+from wtforms.widgets import HiddenInput
 from flask_wtf.csrf import CSRFProtect
+from flask_wtf.file import FileField, FileAllowed
 from flask import Flask
 import re  # regular expressions for phone number validation
 from enums import Genre, State
+from images import EXTENSIONS, MEDIA_URL, is_image
 
 
 app = Flask(__name__)
@@ -114,6 +119,26 @@ def is_valid_phone(number):
     return pattern.match(number)
 
 
+def image_link_validator(form, field):
+    # uploaded images are linked as /media/..., anything else is a URL
+    if not field.data.startswith(MEDIA_URL):
+        URL()(form, field)
+
+
+def validate_image(form):
+    # a venue or artist needs an image link or an uploaded image, checked
+    # by content since the file name may lie
+    if form.image_file.data:
+        if not is_image(form.image_file.data):
+            form.image_file.errors.append(
+                'Upload a JPEG, PNG, GIF or WebP image')
+            return False
+    elif not form.image_link.data:
+        form.image_link.errors.append('Enter an image link or upload an image')
+        return False
+    return True
+
+
 class ShowForm(Form):
     artist_id = StringField(
         'artist_id',
@@ -151,7 +176,11 @@ class VenueForm(Form):
         'phone'
     )
     image_link = StringField(
-        'image_link', validators=[URL()]  # URL validator
+        # a URL or an uploaded image, Optional() when one is uploaded
+        'image_link', validators=[Optional(), image_link_validator]
+    )
+    image_file = FileField(
+        'image_file', validators=[FileAllowed(EXTENSIONS + ['jpeg'])]
     )
     genres = SelectMultipleField(
         # TODO implement enum restriction
@@ -187,6 +216,9 @@ class VenueForm(Form):
             self.phone.errors.append('Invalid phone number')
             return False
 
+        if not validate_image(self):
+            return False
+
         if not set(self.genres.data).issubset(dict(Genre.choices()).keys()):
             self.genres.errors.append('Invalid genre')
             return False
@@ -198,6 +230,13 @@ class VenueForm(Form):
         return True  # all validations passed
 
 
+class EditVenueForm(VenueForm):
+    # row version the edit form was rendered from, to detect lost updates
+    version = IntegerField(
+        'version', validators=[InputRequired()], widget=HiddenInput()
+    )
+
+
 class ArtistForm(Form):
     name = StringField(
         'name', validators=[DataRequired()]
@@ -215,8 +254,12 @@ class ArtistForm(Form):
         'phone'
     )
     image_link = StringField(
+        # a URL or an uploaded image, Optional() when one is uploaded
         'image_link',
-        validators=[URL()]  # URL validator
+        validators=[Optional(), image_link_validator]
+    )
+    image_file = FileField(
+        'image_file', validators=[FileAllowed(EXTENSIONS + ['jpeg'])]
     )
     genres = SelectMultipleField(
         'genres', validators=[DataRequired()],
@@ -252,6 +295,9 @@ class ArtistForm(Form):
             self.phone.errors.append('Invalid phone number')
             return False
 
+        if not validate_image(self):
+            return False
+
         if not set(self.genres.data).issubset(dict(Genre.choices()).keys()):
             self.genres.errors.append('Invalid genre')
             return False
@@ -261,3 +307,10 @@ class ArtistForm(Form):
             return False
 
         return True  # all validations passed
+
+
+class EditArtistForm(ArtistForm):
+    # row version the edit form was rendered from, to detect lost updates
+    version = IntegerField(
+        'version', validators=[InputRequired()], widget=HiddenInput()
+    )
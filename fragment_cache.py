@@ -0,0 +1,37 @@
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+from cache import cache
+
+# ----------------------------------------------------------------------------#
+# Template fragment cache.
+# ----------------------------------------------------------------------------#
+
+
+class FragmentCacheExtension(Extension):
+    """{% cache key, ttl %}...{% endcache %}
+
+    Renders the block once per key and serves the stored markup from the
+    app cache (namespace 'fragments') for ttl seconds, or the cache's
+    default TTL when ttl is left out. The key is any expression, usually
+    a tuple such as ('venue-item', venue.id, venue.version): keys that
+    include a row's version never serve markup from before an edit, so
+    nothing has to be invalidated explicitly.
+    """
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = parser.parse_expression()
+        ttl = nodes.Const(None)
+        if parser.stream.skip_if('comma'):
+            ttl = parser.parse_expression()
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [key, ttl]),
+                               [], [], body).set_lineno(lineno)
+
+    def _render(self, key, ttl, caller):
+        if isinstance(key, list):
+            key = tuple(key)  # list literals are not hashable
+        return cache.cached('fragments', key, caller, ttl)
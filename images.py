@@ -0,0 +1,160 @@
+import hashlib  # content addresses
+import os
+from concurrent.futures import ThreadPoolExecutor  # variants in background
+
+import click  # for the command line output
+from flask import send_from_directory
+from flask.cli import AppGroup
+
+try:
+    from PIL import Image, ImageOps  # optional, no variants without it
+except ImportError:
+    Image = None
+
+# ----------------------------------------------------------------------------#
+# Image store.
+# ----------------------------------------------------------------------------#
+
+# Uploaded venue and artist images are stored once per content under
+# <IMAGE_DIR>/<ab>/<sha256>.<ext> and linked as /media/<ab>/<sha256>.<ext>.
+# A thread pool then writes resized variants next to them
+# (<sha256>-thumb.jpg, <sha256>-medium.jpg; PNG for non-JPEG originals).
+# Until a variant exists, or for hot-linked images, templates use the
+# original. A file name never changes content, so everything under /media/
+# is cached for a year as immutable.
+
+MEDIA_URL = '/media/'
+EXTENSIONS = ['jpg', 'png', 'gif', 'webp']
+SIGNATURES = [(b'\xff\xd8\xff', 'jpg'), (b'\x89PNG\r\n\x1a\n', 'png'),
+              (b'GIF87a', 'gif'), (b'GIF89a', 'gif')]
+VARIANTS = {'thumb': 400, 'medium': 1000}  # longest side in pixels
+MAX_AGE = 365 * 24 * 3600
+
+
+def image_type(head):
+    # by content, whatever the file name says
+    for signature, extension in SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def is_image(file):
+    head = file.stream.read(12)
+    file.stream.seek(0)
+    return image_type(head) is not None
+
+
+def variant_name(name, variant):
+    stem, extension = name.rsplit('.', 1)
+    return f'{stem}-{variant}.' + ('jpg' if extension == 'jpg' else 'png')
+
+
+def write_atomically(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as file:
+        file.write(data)
+    os.replace(path + '.tmp', path)
+
+
+class ImageStore:
+    def __init__(self):
+        self.directory = None
+        self.pool = None
+        self.logger = None
+
+    def save(self, file):
+        """Store an uploaded image and queue its variants; its /media/ URL."""
+        data = file.read()
+        extension = image_type(data[:12])
+        if extension is None:
+            raise ValueError('Not a JPEG, PNG, GIF or WebP image')
+        digest = hashlib.sha256(data).hexdigest()
+        name = f'{digest[:2]}/{digest}.{extension}'
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):  # same content, same file
+            write_atomically(path, data)
+        if Image is not None:
+            self.pool.submit(self.make_variants, name)
+        return MEDIA_URL + name
+
+    def make_variants(self, name):
+        # runs in the pool; existing variants are kept
+        try:
+            with Image.open(os.path.join(self.directory, name)) as original:
+                original = ImageOps.exif_transpose(original)
+                for variant, size in VARIANTS.items():
+                    path = os.path.join(self.directory,
+                                        variant_name(name, variant))
+                    if os.path.exists(path):
+                        continue
+                    resized = original.copy()
+                    resized.thumbnail((size, size))
+                    if path.endswith('.jpg'):
+                        resized.convert('RGB').save(
+                            path + '.tmp', 'JPEG', quality=82,
+                            optimize=True, progressive=True)
+                    else:
+                        resized.save(path + '.tmp', 'PNG', optimize=True)
+                    os.replace(path + '.tmp', path)
+        except Exception:
+            self.logger.exception('Could not make the variants of %s', name)
+
+    def variant_url(self, link, variant):
+        # the variant when it exists, else the image as linked
+        if not link or not link.startswith(MEDIA_URL):
+            return link
+        name = variant_name(link[len(MEDIA_URL):], variant)
+        if os.path.exists(os.path.join(self.directory, name)):
+            return MEDIA_URL + name
+        return link
+
+    def originals(self):
+        for folder in sorted(os.listdir(self.directory)):
+            for filename in sorted(os.listdir(os.path.join(self.directory,
+                                                           folder))):
+                stem, _, extension = filename.rpartition('.')
+                if '-' not in stem and extension in EXTENSIONS:
+                    yield folder + '/' + filename
+
+
+store = ImageStore()  # shared by the app
+
+
+def serve_media(filename):
+    response = send_from_directory(store.directory, filename,
+                                   max_age=MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_images(app):
+    app.config.setdefault('IMAGE_DIR', os.path.join(app.root_path, 'media'))
+    app.config.setdefault('IMAGE_WORKERS', 2)
+    store.directory = app.config['IMAGE_DIR']
+    store.logger = app.logger
+    store.pool = ThreadPoolExecutor(app.config['IMAGE_WORKERS'],
+                                    thread_name_prefix='image-variants')
+    app.add_url_rule(MEDIA_URL + '<path:filename>', 'media', serve_media)
+    app.jinja_env.filters['variant'] = store.variant_url
+
+
+cli = AppGroup('images', help='Image store.')
+
+
+@cli.command('variants')
+def variants_command():
+    """Make the missing variants of every stored image."""
+    if Image is None:
+        click.echo('Pillow is not installed, no variants can be made')
+        return
+    if not os.path.isdir(store.directory):
+        click.echo('No images stored yet')
+        return
+    names = list(store.originals())
+    for name in names:
+        store.make_variants(name)
+    click.echo(f'Checked the variants of {len(names)} images')
@@ -0,0 +1,74 @@
+from collections import namedtuple  # one compact tuple per row
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from cache import cache
+from models import Artist, Show, ShowCard, Venue, db
+from search_index import normalize
+
+# ----------------------------------------------------------------------------#
+# List and search rows.
+# ----------------------------------------------------------------------------#
+
+# List and search pages read only the columns they render, straight into
+# namedtuples: no ORM instance, no session state, nothing in the identity
+# map and no joined shows. See benchmarks/listing_memory.py.
+
+ListingItem = namedtuple('ListingItem', ['id', 'name', 'version'])
+SearchResult = namedtuple('SearchResult', ['id', 'name'])
+VenueItem = namedtuple('VenueItem', ['id', 'name', 'version', 'city',
+                                     'state', 'num_upcoming_shows'])
+ShowItem = namedtuple('ShowItem', ['venue_id', 'venue_name', 'artist_id',
+                                   'artist_name', 'artist_image_link',
+                                   'start_time'])
+
+
+def fetch(item, statement):
+    return [item._make(row) for row in db.session.execute(statement)]
+
+
+def artist_items():
+    return fetch(ListingItem, select(Artist.id, Artist.name, Artist.version).
+                 where(Artist.deleted_at.is_(None)).order_by(Artist.id))
+
+
+def venue_items():
+    # with the number of upcoming shows, counted in the database; ordered
+    # by area for itertools.groupby
+    upcoming = select(Show.venue_id, func.count(Show.id).label('count')). \
+        where(Show.start_time > datetime.now()). \
+        group_by(Show.venue_id).subquery()
+    return fetch(VenueItem, select(
+        Venue.id, Venue.name, Venue.version, Venue.city, Venue.state,
+        func.coalesce(upcoming.c.count, 0)).
+        outerjoin(upcoming, upcoming.c.venue_id == Venue.id).
+        where(Venue.deleted_at.is_(None)).
+        order_by(Venue.state, Venue.city, Venue.id))
+
+
+def search(model, term):
+    # case-insensitive partial match on the name
+    return fetch(SearchResult, select(model.id, model.name).
+                 where(model.name.ilike(f'%{term}%'),
+                       model.deleted_at.is_(None)).
+                 order_by(model.name, model.id))
+
+
+def cached_search(model, term, ttl=None):
+    # bots repeat the same few terms: results are kept per normalized term
+    # until the next venue or artist write (in another worker: the TTL)
+    term = normalize(term)
+    return cache.cached('search', (model.__tablename__, term),
+                        lambda: search(model, term), ttl)
+
+
+def invalidate_searches():
+    cache.invalidate('search')
+
+
+def show_items():
+    return fetch(ShowItem, select(
+        ShowCard.venue_id, ShowCard.venue_name, ShowCard.artist_id,
+        ShowCard.artist_name, ShowCard.artist_image_link,
+        ShowCard.start_time).order_by(ShowCard.start_time))
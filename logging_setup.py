@@ -0,0 +1,105 @@
+import atexit  # to flush the queue on shutdown
+import copy
+import json  # log lines are JSON objects
+import logging
+import queue
+import uuid  # request ids
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import g, has_request_context, request
+
+# ----------------------------------------------------------------------------#
+# Logging.
+# ----------------------------------------------------------------------------#
+
+# Request threads only put records on an in-memory queue; a single
+# listener thread formats them as JSON and writes them to a size-rotated
+# file, so no request ever waits on disk I/O.
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).
+            isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, 'request_id', None),
+            "method": getattr(record, 'method', None),
+            "path": getattr(record, 'path', None),
+            "source": f'{record.pathname}:{record.lineno}',
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry)
+
+
+class RequestContextFilter(logging.Filter):
+    # runs in the request thread, before the record is queued
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.path = request.path
+        return True
+
+
+class RecordQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # keep message and traceback as plain text, leave formatting to
+        # the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def assign_request_id():
+    # honour an id set by a proxy in front of the app
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+
+def echo_request_id(response):
+    response.headers['X-Request-ID'] = g.get('request_id', '')
+    return response
+
+
+def stop_listener(listener):
+    # drains the queue; safe if the listener was already stopped
+    if listener._thread is not None:
+        listener.stop()
+
+
+def configure_logging(app, log_to_file=True):
+    app.before_request(assign_request_id)
+    app.after_request(echo_request_id)
+    if not log_to_file:
+        return None
+
+    file_handler = RotatingFileHandler(
+        app.config.get('LOG_FILE', 'error.log'),
+        maxBytes=app.config.get('LOG_MAX_BYTES', 10 * 1024 * 1024),
+        backupCount=app.config.get('LOG_BACKUP_COUNT', 5),
+        encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter())
+
+    records = queue.Queue(-1)  # unbounded, put() never blocks
+    queue_handler = RecordQueueHandler(records)
+    queue_handler.addFilter(RequestContextFilter())
+    listener = QueueListener(records, file_handler,
+                             respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_listener, listener)
+
+    level = app.config.get('LOG_LEVEL', 'INFO')
+    app.logger.setLevel(level)
+    app.logger.addHandler(queue_handler)
+    return listener
@@ -0,0 +1,349 @@
+import time  # to report how long a rebuild took
+
+import click  # for the command line output
+import numpy as np  # vectorized scoring
+from flask.cli import AppGroup
+from sqlalchemy import delete, insert, select
+
+from enums import Genre
+from models import Artist, Match, Show, Venue, db
+
+# ----------------------------------------------------------------------------#
+# Artist-venue matchmaking.
+# ----------------------------------------------------------------------------#
+
+# A score is a weighted sum of four parts, each between 0 and 1:
+#   genre    - Jaccard overlap of the artist's and the venue's genres
+#   place    - 1 for the same city, 0.5 for the same state only
+#   bookings - cosine between the artist's genres and the genres of the
+#              artists the venue has booked before
+#   history  - shows the two already played together, capped at 3
+#
+# Not every pair is scored. The genre and bookings parts depend only on
+# the artist's genre mask and the venue, and place and history only ever
+# add to them. So a pair can only make a top k if it shares a city or
+# state and is in that place's top k for the artist's genres, or is in
+# the overall top k for those genres, or has history. Those candidates
+# are found per genre mask and per place, and only they are scored.
+WEIGHTS = {'genre': 0.45, 'place': 0.2, 'bookings': 0.25, 'history': 0.1}
+TOP_K = 20
+PAIRS = 1 << 20  # candidate pairs scored at a time, bounds memory
+BLOCK = 1 << 22  # mask x venue scores computed at a time, likewise
+
+
+def genre_matrix(masks):
+    # one row per entity, one 0/1 column per Genre member
+    bits = np.arange(len(Genre), dtype=np.int64)
+    return ((masks[:, None] >> bits) & 1).astype(np.float32)
+
+
+def codes(values):
+    # dense integer codes, so place comparisons are integer ops
+    lookup = {}
+    return np.array([lookup.setdefault(value, len(lookup))
+                     for value in values], dtype=np.int64)
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix),
+                     where=norms > 0)
+
+
+def groups(keys):
+    # {key: indices with that key}
+    order = np.argsort(keys, kind='stable')
+    values, starts = np.unique(keys[order], return_index=True)
+    return dict(zip(values.tolist(), np.split(order, starts[1:])))
+
+
+def load_entities():
+    # column-only reads of the live rows and of the booking history
+    artists = db.session.execute(
+        select(Artist.id, Artist.genre_mask, Artist.city, Artist.state,
+               Artist.seeking_venue).
+        where(Artist.deleted_at.is_(None))).all()
+    venues = db.session.execute(
+        select(Venue.id, Venue.genre_mask, Venue.city, Venue.state,
+               Venue.seeking_talent).
+        where(Venue.deleted_at.is_(None))).all()
+    shows = db.session.execute(select(Show.artist_id, Show.venue_id)).all()
+    return artists, venues, shows
+
+
+def top_k(scores, k, axis):
+    # indices of the k best scores along axis, best first
+    k = min(k, scores.shape[axis])
+    if k == 0:
+        return np.empty((0,), dtype=np.int64)
+    best = np.argpartition(-scores, k - 1, axis=axis)
+    best = np.take(best, np.arange(k), axis=axis)
+    order = np.argsort(-np.take_along_axis(scores, best, axis=axis),
+                       axis=axis, kind='stable')
+    return np.take_along_axis(best, order, axis=axis)
+
+
+class Scorer:
+    """Scores of artist-venue pairs, by row index into artists and venues."""
+
+    def __init__(self, artists, venues, shows):
+        self.artist_ids = np.array([row.id for row in artists],
+                                   dtype=np.int64)
+        self.venue_ids = np.array([row.id for row in venues], dtype=np.int64)
+        # artists by distinct genre mask: self.masks[self.artist_masks]
+        self.masks, self.artist_masks = np.unique(
+            np.array([row.genre_mask or 0 for row in artists],
+                     dtype=np.int64), return_inverse=True)
+        self.mask_genres = genre_matrix(self.masks)
+        self.mask_units = normalize_rows(self.mask_genres)
+        self.venue_genres = genre_matrix(np.array(
+            [row.genre_mask or 0 for row in venues], dtype=np.int64))
+        self.mask_sizes = self.mask_genres.sum(axis=1)
+        self.venue_sizes = self.venue_genres.sum(axis=1)
+        places = codes([(row.state, (row.city or '').strip().lower())
+                        for row in list(artists) + list(venues)])
+        states = codes([row.state for row in list(artists) + list(venues)])
+        self.artist_places, self.venue_places = \
+            places[:len(artists)], places[len(artists):]
+        self.artist_states, self.venue_states = \
+            states[:len(artists)], states[len(artists):]
+        self.artist_seeking = np.array(
+            [bool(row.seeking_venue) for row in artists], dtype=bool)
+        self.venue_seeking = np.array(
+            [bool(row.seeking_talent) for row in venues], dtype=bool)
+
+        # booking history: distinct (artist row, venue row) pairs, as
+        # artist row * venues + venue row, with their show counts
+        artist_index = {artist_id: index for index, artist_id
+                        in enumerate(self.artist_ids.tolist())}
+        venue_index = {venue_id: index for index, venue_id
+                       in enumerate(self.venue_ids.tolist())}
+        pairs = np.array([(artist_index[show.artist_id],
+                           venue_index[show.venue_id]) for show in shows
+                          if show.artist_id in artist_index and
+                          show.venue_id in venue_index],
+                         dtype=np.int64).reshape(-1, 2)
+        self.history, self.history_counts = np.unique(
+            pairs[:, 0] * len(venues) + pairs[:, 1], return_counts=True)
+
+        # genre profile of each venue's past bookings
+        profiles = np.zeros_like(self.venue_genres)
+        np.add.at(profiles, pairs[:, 1],
+                  self.mask_genres[self.artist_masks[pairs[:, 0]]])
+        self.profiles = normalize_rows(profiles)
+
+    def mask_scores(self, masks, venues):
+        # genre and bookings parts, len(masks) x len(venues)
+        overlap = self.mask_genres[masks] @ self.venue_genres[venues].T
+        union = self.mask_sizes[masks, None] + \
+            self.venue_sizes[None, venues] - overlap
+        scores = np.divide(overlap, union, out=np.zeros_like(overlap),
+                           where=union > 0)
+        scores *= np.float32(WEIGHTS['genre'])
+        scores += np.float32(WEIGHTS['bookings']) * \
+            (self.mask_units[masks] @ self.profiles[venues].T)
+        return scores
+
+    def pair_scores(self, artists, venues):
+        # the whole score of each (artists[i], venues[i]) pair
+        scores = np.empty(len(artists), dtype=np.float32)
+        for start in range(0, len(artists), PAIRS):
+            part = slice(start, start + PAIRS)
+            masks, rows = self.artist_masks[artists[part]], venues[part]
+            overlap = np.einsum('ij,ij->i', self.mask_genres[masks],
+                                self.venue_genres[rows])
+            union = self.mask_sizes[masks] + self.venue_sizes[rows] - overlap
+            score = np.divide(overlap, union, out=np.zeros_like(overlap),
+                              where=union > 0)
+            score *= np.float32(WEIGHTS['genre'])
+            score += np.float32(WEIGHTS['bookings']) * np.einsum(
+                'ij,ij->i', self.mask_units[masks], self.profiles[rows])
+            score += np.float32(WEIGHTS['place'] / 2) * (
+                (self.artist_states[artists[part]] ==
+                 self.venue_states[rows]).astype(np.float32) +
+                (self.artist_places[artists[part]] ==
+                 self.venue_places[rows]))
+            keys = artists[part] * len(self.venue_ids) + rows
+            found = np.minimum(np.searchsorted(self.history, keys),
+                               max(len(self.history) - 1, 0))
+            played = np.where(self.history[found] == keys,
+                              self.history_counts[found], 0) \
+                if len(self.history) else 0
+            score += np.float32(WEIGHTS['history'] / 3) * \
+                np.minimum(played, 3)
+            scores[part] = score
+        return scores
+
+    def areas(self):
+        # (artist rows, venue rows) of everywhere, then of every state and
+        # every city with both
+        everywhere = [(np.arange(len(self.artist_ids)),
+                       np.arange(len(self.venue_ids)))]
+        areas = []
+        for artist_keys, venue_keys in ((self.artist_states,
+                                         self.venue_states),
+                                        (self.artist_places,
+                                         self.venue_places)):
+            artist_groups, venue_groups = groups(artist_keys), \
+                groups(venue_keys)
+            areas.extend((rows, venue_groups[key])
+                         for key, rows in artist_groups.items()
+                         if key in venue_groups)
+        return everywhere + areas
+
+    def venue_candidates(self, k):
+        # (artist rows, venue rows): each artist with the best seeking
+        # venues for its genre mask in each of its areas, and the seeking
+        # venues it has played
+        artists, venues = [], []
+        for artist_rows, venue_rows in self.areas():
+            venue_rows = venue_rows[self.venue_seeking[venue_rows]]
+            if not len(venue_rows):
+                continue
+            masks, inverse = np.unique(self.artist_masks[artist_rows],
+                                       return_inverse=True)
+            step = max(BLOCK // len(venue_rows), 1)
+            best = np.concatenate([
+                top_k(self.mask_scores(masks[start:start + step],
+                                       venue_rows), k, axis=1)
+                for start in range(0, len(masks), step)])
+            best = venue_rows[best[inverse]]
+            artists.append(np.repeat(artist_rows, best.shape[1]))
+            venues.append(best.ravel())
+        played_artists, played_venues = self.played()
+        keep = self.venue_seeking[played_venues]
+        artists.append(played_artists[keep])
+        venues.append(played_venues[keep])
+        return np.concatenate(artists), np.concatenate(venues)
+
+    def artist_candidates(self, k):
+        # (artist rows, venue rows): each venue with the best seeking
+        # artists for it in each of its areas, and the seeking artists it
+        # has booked
+        artists, venues = [], []
+        for artist_rows, venue_rows in self.areas():
+            artist_rows = artist_rows[self.artist_seeking[artist_rows]]
+            if not len(artist_rows):
+                continue
+            # artists with the same genre mask score the same here, and the
+            # first k of each are enough: members[mask] is -1 padded
+            masks, inverse = np.unique(self.artist_masks[artist_rows],
+                                       return_inverse=True)
+            order = np.argsort(inverse, kind='stable')
+            starts = np.searchsorted(inverse[order], np.arange(len(masks)))
+            sizes = np.diff(np.append(starts, len(order)))
+            members = np.full((len(masks), min(sizes.max(), k)), -1,
+                              dtype=np.int64)
+            for column in range(members.shape[1]):
+                filled = sizes > column
+                members[filled, column] = \
+                    artist_rows[order[starts[filled] + column]]
+            # for each venue its best masks, as many as hold k artists
+            step = max(BLOCK // len(masks), 1)
+            for start in range(0, len(venue_rows), step):
+                rows = venue_rows[start:start + step]
+                best = top_k(self.mask_scores(masks, rows).T, k, axis=1)
+                held = np.minimum(sizes[best], k)
+                wanted = np.cumsum(held, axis=1) - held < k
+                chosen = np.where(wanted[:, :, None], members[best], -1). \
+                    reshape(len(rows), -1)
+                real = chosen >= 0
+                artists.append(chosen[real])
+                venues.append(np.broadcast_to(rows[:, None],
+                                              chosen.shape)[real])
+        played_artists, played_venues = self.played()
+        keep = self.artist_seeking[played_artists]
+        artists.append(played_artists[keep])
+        venues.append(played_venues[keep])
+        return np.concatenate(artists), np.concatenate(venues)
+
+    def played(self):
+        # (artist rows, venue rows) of the booking history
+        return divmod(self.history, len(self.venue_ids))
+
+    def best(self, artists, venues, k, per_artist):
+        # {artist id: [(venue id, score), ...]}, or the other way round,
+        # best first, from candidate pairs that may repeat
+        artists, venues = divmod(np.unique(
+            artists * len(self.venue_ids) + venues), len(self.venue_ids))
+        scores = self.pair_scores(artists, venues)
+        if per_artist:
+            owners, owner_ids, others, other_ids = \
+                artists, self.artist_ids, venues, self.venue_ids
+        else:
+            owners, owner_ids, others, other_ids = \
+                venues, self.venue_ids, artists, self.artist_ids
+        # best first per owner (scores are between 0 and 1), ties to the
+        # earlier row
+        order = np.argsort(owners * 2.0 + (1 - scores), kind='stable')
+        owners, others, scores = owners[order], others[order], scores[order]
+        rank = np.arange(len(owners)) - np.searchsorted(owners, owners)
+        keep = rank < k
+        matches = {owner_id: [] for owner_id in owner_ids.tolist()}
+        for owner_id, other_id, score in zip(
+                owner_ids[owners[keep]].tolist(),
+                other_ids[others[keep]].tolist(), scores[keep].tolist()):
+            matches[owner_id].append((other_id, score))
+        return matches
+
+
+def compute_matches(artists, venues, shows, k=TOP_K):
+    """Match every artist and every venue with its best counterparts.
+
+    Returns (artist_matches, venue_matches): dicts of entity id to a list
+    of (counterpart id, score), best first. Artists are only matched with
+    venues seeking talent and venues with artists seeking a venue.
+    """
+    if not artists or not venues:
+        return {}, {}
+    scorer = Scorer(artists, venues, shows)
+    artist_matches = scorer.best(*scorer.venue_candidates(k), k,
+                                 per_artist=True)
+    venue_matches = scorer.best(*scorer.artist_candidates(k), k,
+                                per_artist=False)
+    return artist_matches, venue_matches
+
+
+def rebuild_matches(k=TOP_K):
+    # replaces the whole Match table in one transaction
+    artist_matches, venue_matches = compute_matches(*load_entities(), k=k)
+    rows = []
+    for kind, matches in (('artist', artist_matches),
+                          ('venue', venue_matches)):
+        for entity_id, entries in matches.items():
+            rows.extend({"kind": kind, "entity_id": entity_id,
+                         "rank": rank, "match_id": match_id,
+                         "score": round(score, 4)}
+                        for rank, (match_id, score) in enumerate(entries, 1))
+    db.session.execute(delete(Match))
+    if rows:
+        db.session.execute(insert(Match), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def entity_matches(kind, entity_id, limit=TOP_K):
+    # one indexed read of the precomputed list, joined to the counterpart
+    # table by primary key for display
+    other = Venue if kind == 'artist' else Artist
+    return db.session.execute(
+        select(Match.rank, Match.score, other.id, other.name, other.city,
+               other.state, other.image_link).
+        join(other, other.id == Match.match_id).
+        where(Match.kind == kind, Match.entity_id == entity_id,
+              other.deleted_at.is_(None)).
+        order_by(Match.rank).limit(limit)).all()
+
+
+cli = AppGroup('matches', help='Artist-venue matchmaking.')
+
+
+@cli.command('rebuild')
+@click.option('--top-k', 'k', default=TOP_K, show_default=True,
+              help='Matches kept per venue and artist.')
+def rebuild_command(k):
+    """Recompute the Match table from scratch."""
+    started = time.perf_counter()
+    count = rebuild_matches(k)
+    click.echo(f'Stored {count} matches in '
+               f'{time.perf_counter() - started:.1f}s')
@@ -0,0 +1,359 @@
+import fcntl  # to merge the snapshots of exited processes one at a time
+import glob  # to find the other processes' snapshots
+import json
+import os
+import threading  # to guard the counters and to flush in the background
+import time  # for durations
+from bisect import bisect_left
+
+from flask import g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from cache import cache
+from models import db
+
+# ----------------------------------------------------------------------------#
+# Metrics.
+# ----------------------------------------------------------------------------#
+
+# Counters and histograms are plain dicts in each process, updated under a
+# lock. With METRICS_DIR set, every process also writes its snapshot to
+# <METRICS_DIR>/<pid>.json every METRICS_FLUSH_INTERVAL seconds and /metrics
+# adds up the snapshots of all processes, so any worker can answer a
+# scrape. Counters of exited workers keep counting towards the totals: a
+# scrape folds their snapshots into retired.json and removes them. Their
+# gauges are dropped.
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+           10.0)
+
+HELP = {
+    'fyyur_http_requests_total': ('counter', 'Requests by endpoint, method '
+                                  'and status.'),
+    'fyyur_http_request_duration_seconds': ('histogram', 'Time to build '
+                                            'the response, by endpoint.'),
+    'fyyur_db_queries_total': ('counter', 'SQL statements, by endpoint.'),
+    'fyyur_db_query_duration_seconds': ('histogram', 'SQL statement time.'),
+    'fyyur_template_render_seconds': ('histogram', 'Template render time, '
+                                      'by template.'),
+    'fyyur_cache_requests_total': ('counter', 'App cache lookups, by result.'),
+    'fyyur_cache_hit_ratio': ('gauge', 'App cache hits over lookups.'),
+    'fyyur_db_pool_checked_out': ('gauge', 'Connections in use, by process.'),
+    'fyyur_db_pool_overflow': ('gauge', 'Connections over the pool size, '
+                               'by process.'),
+}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts, sum, count]
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        key = (name, labels)
+        index = bisect_left(BUCKETS, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = \
+                    [[0] * (len(BUCKETS) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def snapshot(self):
+        # JSON-ready copy: {"counters": [...], "histograms": [...]}
+        with self._lock:
+            return {
+                "counters": [[name, list(labels), value] for
+                             (name, labels), value in self._counters.items()],
+                "histograms": [[name, list(labels), list(buckets), total,
+                                count] for (name, labels),
+                               (buckets, total, count) in
+                               self._histograms.items()],
+            }
+
+
+registry = Registry()
+
+
+def endpoint_label():
+    if has_request_context():
+        return request.endpoint or 'none'
+    return 'none'
+
+
+# ----------------------------------------------------------------------------#
+# Collectors.
+# ----------------------------------------------------------------------------#
+
+
+def start_timer():
+    g.metrics_started = time.perf_counter()
+
+
+def count_request(status):
+    started = g.pop('metrics_started', None)
+    endpoint = (('endpoint', endpoint_label()),)
+    registry.inc('fyyur_http_requests_total', endpoint + (
+        ('method', request.method), ('status', str(status))))
+    if started is not None:
+        registry.observe('fyyur_http_request_duration_seconds',
+                         time.perf_counter() - started, endpoint)
+
+
+def record_request(response):
+    count_request(response.status_code)
+    return response
+
+
+def record_failure(error):
+    # after_request is skipped when an exception propagates out of the app
+    # (or an earlier after_request handler fails); the timer is still set
+    if 'metrics_started' in g:
+        count_request(500)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context,
+                         executemany):
+    started = conn.info['metrics_started'].pop()
+    registry.inc('fyyur_db_queries_total',
+                 (('endpoint', endpoint_label()),))
+    registry.observe('fyyur_db_query_duration_seconds',
+                     time.perf_counter() - started)
+
+
+def handle_error(context):
+    # a failed statement gets no after_cursor_execute; drop its start time
+    # so the next statement on the connection is not timed from it (one
+    # statement runs at a time, so the list holds at most this one)
+    conn = context.connection
+    if conn is not None and conn.info.get('metrics_started'):
+        conn.info['metrics_started'].pop()
+        registry.inc('fyyur_db_queries_total',
+                     (('endpoint', endpoint_label()),))
+
+
+class TimedTemplate(Template):
+    # render_template() ends in Template.render()
+    def render(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            registry.observe('fyyur_template_render_seconds',
+                             time.perf_counter() - started,
+                             (('template', self.name or 'string'),))
+
+
+def process_snapshot(app):
+    # the registry plus the values read at snapshot time
+    snapshot = registry.snapshot()
+    snapshot['counters'] += [
+        ['fyyur_cache_requests_total', [['result', 'hit']], cache.hits],
+        ['fyyur_cache_requests_total', [['result', 'miss']], cache.misses],
+    ]
+    gauges = []
+    with app.app_context():
+        pool = db.engine.pool
+        if hasattr(pool, 'checkedout'):
+            gauges.append(['fyyur_db_pool_checked_out', [], pool.checkedout()])
+        if hasattr(pool, 'overflow'):
+            gauges.append(['fyyur_db_pool_overflow', [], max(pool.overflow(),
+                                                             0)])
+    snapshot['gauges'] = gauges
+    snapshot['pid'] = os.getpid()
+    return snapshot
+
+
+# ----------------------------------------------------------------------------#
+# Multi-process snapshots.
+# ----------------------------------------------------------------------------#
+
+
+def write_snapshot(app):
+    directory = app.config['METRICS_DIR']
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    with open(path + '.tmp', 'w') as file:
+        json.dump(process_snapshot(app), file)
+    os.replace(path + '.tmp', path)
+
+
+def flush_forever(app):
+    while True:
+        time.sleep(app.config['METRICS_FLUSH_INTERVAL'])
+        try:
+            write_snapshot(app)
+        except Exception:
+            app.logger.exception('Could not write the metrics snapshot')
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_snapshots(directory):
+    collected = {}
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            with open(path) as file:
+                collected[path] = json.load(file)
+        except (OSError, ValueError):
+            continue  # being replaced
+    return collected
+
+
+def retire(directory, collected):
+    # adds the counters and histograms of exited processes to retired.json
+    # and removes their snapshots, so the totals stay the same
+    retired_path = os.path.join(directory, 'retired.json')
+    exited = [path for path, snapshot in collected.items()
+              if snapshot.get('pid') and not is_alive(snapshot['pid'])]
+    if not exited:
+        return
+    snapshots = [collected[path] for path in exited]
+    if retired_path in collected:
+        snapshots.append(collected[retired_path])
+    counters, histograms = merge(snapshots)
+    retired = {
+        "counters": [[name, list(labels), value] for
+                     (name, labels), value in counters.items()],
+        "histograms": [[name, list(labels), buckets, total, count] for
+                       (name, labels), (buckets, total, count) in
+                       histograms.items()],
+        "pid": None,
+    }
+    with open(retired_path + '.tmp', 'w') as file:
+        json.dump(retired, file)
+    os.replace(retired_path + '.tmp', retired_path)
+    for path in exited:
+        os.remove(path)
+        del collected[path]
+    collected[retired_path] = retired
+
+
+def snapshots(app):
+    if not app.config.get('METRICS_DIR'):
+        return [process_snapshot(app)]
+    directory = app.config['METRICS_DIR']
+    write_snapshot(app)  # this process, up to date
+    # one scrape at a time, so an exited process is counted exactly once
+    with open(os.path.join(directory, 'metrics.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        collected = read_snapshots(directory)
+        retire(directory, collected)
+    return list(collected.values())
+
+
+# ----------------------------------------------------------------------------#
+# Exposition.
+# ----------------------------------------------------------------------------#
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').
+                         replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels) + '}'
+
+
+def merge(snapshots):
+    # summed counters and histograms, keyed by (name, labels)
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, total, count in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key,
+                                           [[0] * len(buckets), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+            merged[1] += total
+            merged[2] += count
+    return counters, histograms
+
+
+def exposition(app):
+    """All processes' metrics in the Prometheus text format."""
+    collected = snapshots(app)
+    counters, histograms = merge(collected)
+    gauges = {}
+    for snapshot in collected:
+        if snapshot.get('gauges') and is_alive(snapshot['pid']):
+            for name, labels, value in snapshot['gauges']:
+                key = (name, tuple(map(tuple, labels)) +
+                       (('pid', snapshot['pid']),))
+                gauges[key] = value
+
+    hits = counters.get(('fyyur_cache_requests_total', (('result', 'hit'),)),
+                        0)
+    misses = counters.get(('fyyur_cache_requests_total',
+                           (('result', 'miss'),)), 0)
+    gauges[('fyyur_cache_hit_ratio', ())] = \
+        hits / (hits + misses) if hits + misses else 0
+
+    lines = []
+    for name, (kind, text) in HELP.items():
+        lines += [f'# HELP {name} {text}', f'# TYPE {name} {kind}']
+        if kind == 'counter':
+            lines += [f'{name}{format_labels(labels)} {value}'
+                      for (metric, labels), value in sorted(counters.items())
+                      if metric == name]
+        elif kind == 'gauge':
+            lines += [f'{name}{format_labels(labels)} {value}'
+                      for (metric, labels), value in sorted(gauges.items())
+                      if metric == name]
+        else:
+            for (metric, labels), (buckets, total, count) in \
+                    sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket in zip(BUCKETS + ('+Inf',), buckets):
+                    cumulative += bucket
+                    lines.append(f'{name}_bucket'
+                                 f'{format_labels(labels + (("le", bound),))}'
+                                 f' {cumulative}')
+                lines.append(f'{name}_sum{format_labels(labels)} {total}')
+                lines.append(f'{name}_count{format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def init_metrics(app):
+    app.config.setdefault('METRICS_DIR', None)
+    app.config.setdefault('METRICS_FLUSH_INTERVAL', 5)
+    app.before_request(start_timer)
+    app.after_request(record_request)
+    app.teardown_request(record_failure)
+    app.jinja_env.template_class = TimedTemplate
+    if not event.contains(Engine, 'before_cursor_execute',
+                          before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+        event.listen(Engine, 'handle_error', handle_error)
+    if app.config['METRICS_DIR']:
+        os.makedirs(app.config['METRICS_DIR'], exist_ok=True)
+        threading.Thread(target=flush_forever, args=(app,),
+                         daemon=True).start()
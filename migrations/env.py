@@ -1,10 +1,18 @@
 import logging
+import os
+import sys
 from logging.config import fileConfig
 
 from flask import current_app
 
 from alembic import context
 
+# online.py registers op.create_index_concurrently, op.backfill and the
+# other helpers for large tables
+if os.path.dirname(__file__) not in sys.path:
+    sys.path.insert(0, os.path.dirname(__file__))
+import online  # noqa: E402
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
@@ -69,6 +77,10 @@ def run_migrations_offline():
     )
 
     with context.begin_transaction():
+        statement = online.lock_timeout_statement(
+            current_app.config.get('MIGRATION_LOCK_TIMEOUT'))
+        if statement and url.startswith('postgresql'):
+            context.execute(statement)
         context.run_migrations()
 
 
@@ -93,6 +105,9 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        # DDL waiting for a lock gives up instead of blocking the app
+        online.guard_locks(connection,
+                           current_app.config.get('MIGRATION_LOCK_TIMEOUT'))
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
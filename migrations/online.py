@@ -0,0 +1,343 @@
+import logging
+import re
+import time  # to throttle backfills
+
+import sqlalchemy as sa
+from alembic.operations import MigrateOperation, Operations
+
+# ----------------------------------------------------------------------------#
+# Online migrations.
+# ----------------------------------------------------------------------------#
+
+# env.py imports this module, which registers the operations below on `op`
+# for every migration script:
+#
+#   op.create_index_concurrently('ix_Show_venue_id', 'Show', ['venue_id'])
+#   op.drop_index_concurrently('ix_Show_venue_id', 'Show')
+#   op.backfill('Venue', {'seeking_talent': False},
+#               where='seeking_talent IS NULL', batch_size=5000)
+#   op.set_not_null('Venue', 'seeking_talent')
+#
+# On Postgres they run outside the migration's transaction (see
+# autocommit_block), so no lock is held for longer than one statement or
+# one batch. env.py also sets lock_timeout (MIGRATION_LOCK_TIMEOUT): DDL
+# that cannot get its lock fails fast instead of queueing every query on
+# the table behind it. All of them are safe to run again after a failure,
+# so a migration that timed out is simply retried. On other databases
+# they fall back to the plain operations.
+#
+# Adding a column to a busy table: add it nullable and without a volatile
+# default (instant on Postgres 11+), backfill it, then set_not_null.
+
+logger = logging.getLogger('alembic.online')
+
+TIMEOUT = re.compile(r'^\d+\s*(ms|s|min)?$')
+
+
+def lock_timeout_statement(timeout):
+    # SET takes no bind parameters, so the value is checked instead
+    if not timeout:
+        return None
+    timeout = str(timeout)
+    if not TIMEOUT.match(timeout):
+        raise ValueError(f'Invalid lock timeout {timeout!r}')
+    return f"SET lock_timeout = '{timeout}'"
+
+
+def guard_locks(connection, timeout):
+    statement = lock_timeout_statement(timeout)
+    if statement and connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql(statement)
+
+
+def is_postgres(operations):
+    return operations.get_context().dialect.name == 'postgresql'
+
+
+def quote(operations, name):
+    return operations.get_context().dialect.identifier_preparer.quote(name)
+
+
+def index_state(operations, index_name):
+    # None when missing, else (is_valid, is_partitioned)
+    row = operations.get_bind().execute(sa.text(
+        "SELECT i.indisvalid, c.relkind = 'I' FROM pg_class c "
+        "JOIN pg_index i ON i.indexrelid = c.oid "
+        "WHERE c.relname = :name"), {"name": index_name}).first()
+    return None if row is None else tuple(row)
+
+
+def partitions_of(operations, table_name):
+    return operations.get_bind().execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :name AND p.relkind = 'p' "
+        "ORDER BY c.relname"), {"name": table_name}).scalars().all()
+
+
+# ----------------------------------------------------------------------------#
+# Indexes.
+# ----------------------------------------------------------------------------#
+
+
+@Operations.register_operation('create_index_concurrently')
+class CreateIndexConcurrentlyOp(MigrateOperation):
+    """CREATE INDEX CONCURRENTLY, resumable.
+
+    A valid index of that name is kept, an invalid one (left by a failed
+    build) is dropped and built again. On a partitioned table, such as
+    Show, every partition is indexed concurrently and the indexes are
+    attached to an index created ON ONLY the parent.
+    """
+
+    def __init__(self, index_name, table_name, columns, unique=False):
+        self.index_name = index_name
+        self.table_name = table_name
+        self.columns = columns
+        self.unique = unique
+
+    @classmethod
+    def create_index_concurrently(cls, operations, index_name, table_name,
+                                  columns, unique=False):
+        return operations.invoke(cls(index_name, table_name, columns,
+                                     unique))
+
+    def reverse(self):
+        return DropIndexConcurrentlyOp(self.index_name, self.table_name)
+
+
+@Operations.register_operation('drop_index_concurrently')
+class DropIndexConcurrentlyOp(MigrateOperation):
+    def __init__(self, index_name, table_name):
+        self.index_name = index_name
+        self.table_name = table_name
+
+    @classmethod
+    def drop_index_concurrently(cls, operations, index_name, table_name):
+        return operations.invoke(cls(index_name, table_name))
+
+
+def build_index(operations, index_name, table_name, columns, unique,
+                only=False):
+    operations.execute(
+        'CREATE {}INDEX {}{} ON {}{} ({})'.format(
+            'UNIQUE ' if unique else '',
+            '' if only else 'CONCURRENTLY ',
+            quote(operations, index_name),
+            'ONLY ' if only else '',
+            quote(operations, table_name),
+            ', '.join(quote(operations, column) for column in columns)))
+
+
+@Operations.implementation_for(CreateIndexConcurrentlyOp)
+def create_index_concurrently(operations, operation):
+    if not is_postgres(operations):
+        operations.create_index(operation.index_name, operation.table_name,
+                                operation.columns, unique=operation.unique)
+        return
+    context = operations.get_context()
+    if context.as_sql:
+        # offline (--sql): no catalog to look at
+        with context.autocommit_block():
+            build_index(operations, operation.index_name,
+                        operation.table_name, operation.columns,
+                        operation.unique)
+        return
+
+    with context.autocommit_block():
+        partitions = partitions_of(operations, operation.table_name)
+        if not partitions:
+            state = index_state(operations, operation.index_name)
+            if state == (True, False):
+                return  # built on an earlier run
+            if state is not None:
+                drop_invalid(operations, operation.index_name)
+            build_index(operations, operation.index_name,
+                        operation.table_name, operation.columns,
+                        operation.unique)
+            return
+
+        # the parent's index stays invalid until every partition's index
+        # is attached to it
+        if index_state(operations, operation.index_name) is None:
+            build_index(operations, operation.index_name,
+                        operation.table_name, operation.columns,
+                        operation.unique, only=True)
+        attached = attached_indexes(operations, operation.index_name)
+        for partition in partitions:
+            if partition in attached:
+                continue
+            name = (partition + '_' + operation.index_name)[:63]
+            state = index_state(operations, name)
+            if state is not None and not state[0]:
+                drop_invalid(operations, name)
+                state = None
+            if state is None:
+                logger.info('Indexing %s concurrently', partition)
+                build_index(operations, name, partition, operation.columns,
+                            operation.unique)
+            operations.execute('ALTER INDEX {} ATTACH PARTITION {}'.format(
+                quote(operations, operation.index_name),
+                quote(operations, name)))
+
+
+def drop_invalid(operations, index_name):
+    # left behind by a failed concurrent build
+    logger.info('Dropping the invalid index %s', index_name)
+    operations.execute('DROP INDEX CONCURRENTLY ' +
+                       quote(operations, index_name))
+
+
+def attached_indexes(operations, index_name):
+    # the tables whose index is attached to index_name
+    return operations.get_bind().execute(sa.text(
+        "SELECT t.relname FROM pg_inherits i "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "JOIN pg_index x ON x.indexrelid = i.inhrelid "
+        "JOIN pg_class t ON t.oid = x.indrelid "
+        "WHERE p.relname = :name"), {"name": index_name}).scalars().all()
+
+
+@Operations.implementation_for(DropIndexConcurrentlyOp)
+def drop_index_concurrently(operations, operation):
+    if not is_postgres(operations):
+        operations.drop_index(operation.index_name, operation.table_name)
+        return
+    context = operations.get_context()
+    with context.autocommit_block():
+        state = None if context.as_sql else \
+            index_state(operations, operation.index_name)
+        if state and state[1]:
+            # partitioned indexes cannot be dropped concurrently; dropping
+            # the parent drops the attached ones
+            operations.execute('DROP INDEX IF EXISTS ' +
+                               quote(operations, operation.index_name))
+        else:
+            operations.execute('DROP INDEX CONCURRENTLY IF EXISTS ' +
+                               quote(operations, operation.index_name))
+
+
+# ----------------------------------------------------------------------------#
+# Backfills.
+# ----------------------------------------------------------------------------#
+
+
+@Operations.register_operation('backfill')
+class BackfillOp(MigrateOperation):
+    """UPDATE a large table in short transactions.
+
+    Rows matching `where` (SQL that turns false once a row is done) are
+    given `values` (Python values, or SQL expressions such as
+    sa.column('updated_at')), batch_size rows at a time in primary key order, each
+    batch committed on its own and followed by `pause` seconds for the
+    replicas and autovacuum to keep up. A backfill that is interrupted
+    picks up the remaining rows when the migration runs again.
+    """
+
+    def __init__(self, table_name, values, where, key='id', batch_size=1000,
+                 pause=0.1):
+        self.table_name = table_name
+        self.values = values
+        self.where = where
+        self.key = key
+        self.batch_size = batch_size
+        self.pause = pause
+
+    @classmethod
+    def backfill(cls, operations, table_name, values, where, key='id',
+                 batch_size=1000, pause=0.1):
+        return operations.invoke(cls(table_name, values, where, key,
+                                     batch_size, pause))
+
+
+@Operations.implementation_for(BackfillOp)
+def backfill(operations, operation):
+    table = sa.table(operation.table_name, sa.column(operation.key),
+                     *(sa.column(name) for name in operation.values))
+    key = table.c[operation.key]
+    pending = sa.text(operation.where) if isinstance(operation.where, str) \
+        else operation.where
+    context = operations.get_context()
+    if context.as_sql:
+        # offline (--sql): one UPDATE in the script, with the values
+        # written out since a script has no bind parameters
+        values = {name: value if isinstance(value, sa.sql.ClauseElement)
+                  else sa.literal(value)  # typed by the Python value
+                  for name, value in operation.values.items()}
+        operations.execute(str(table.update().where(pending).
+                               values(values).
+                               compile(dialect=context.dialect,
+                                       compile_kwargs={"literal_binds":
+                                                       True})))
+        return
+
+    with context.autocommit_block():
+        bind = operations.get_bind()
+        # the key range comes from the primary key index, not a scan
+        low, high = bind.execute(sa.select(sa.func.min(key),
+                                           sa.func.max(key))).one()
+        if low is None:
+            return
+        last, done, started = low - 1, 0, time.monotonic()
+        while True:
+            keys = bind.execute(
+                sa.select(key).where(key > last, pending).order_by(key).
+                limit(operation.batch_size)).scalars().all()
+            if not keys:
+                break
+            bind.execute(table.update().
+                         where(key.between(keys[0], keys[-1]), pending).
+                         values(operation.values))
+            done += len(keys)
+            last = keys[-1]
+            logger.info('Backfilled %d rows of %s, %.0f%% of the keys, %.0fs',
+                        done, operation.table_name,
+                        (last - low + 1) * 100 / (high - low + 1),
+                        time.monotonic() - started)
+            time.sleep(operation.pause)
+
+
+# ----------------------------------------------------------------------------#
+# Constraints.
+# ----------------------------------------------------------------------------#
+
+
+@Operations.register_operation('set_not_null')
+class SetNotNullOp(MigrateOperation):
+    """SET NOT NULL without scanning the table under an exclusive lock.
+
+    A NOT VALID check constraint is added, then validated (which only
+    blocks other DDL), and Postgres 12+ uses it to skip the scan of
+    SET NOT NULL.
+    """
+
+    def __init__(self, table_name, column_name):
+        self.table_name = table_name
+        self.column_name = column_name
+
+    @classmethod
+    def set_not_null(cls, operations, table_name, column_name):
+        return operations.invoke(cls(table_name, column_name))
+
+
+@Operations.implementation_for(SetNotNullOp)
+def set_not_null(operations, operation):
+    if not is_postgres(operations):
+        with operations.batch_alter_table(operation.table_name) as batch_op:
+            batch_op.alter_column(operation.column_name, nullable=False)
+        return
+    table = quote(operations, operation.table_name)
+    column = quote(operations, operation.column_name)
+    constraint = quote(operations, (operation.table_name + '_' +
+                                    operation.column_name + '_not_null')[:63])
+    with operations.get_context().autocommit_block():
+        operations.execute(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS '
+                           f'{constraint}')
+        operations.execute(f'ALTER TABLE {table} ADD CONSTRAINT {constraint} '
+                           f'CHECK ({column} IS NOT NULL) NOT VALID')
+        operations.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT '
+                           f'{constraint}')
+        operations.execute(f'ALTER TABLE {table} ALTER COLUMN {column} '
+                           f'SET NOT NULL')
+        operations.execute(f'ALTER TABLE {table} DROP CONSTRAINT {constraint}')
@@ -0,0 +1,30 @@
+"""add similar artist table
+
+Revision ID: 0a6e93f1d7b4
+Revises: f8a27c4d6b15
+Create Date: 2026-10-19 13:05:26.771390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a6e93f1d7b4'
+down_revision = 'f8a27c4d6b15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('SimilarArtist',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('similar_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('artist_id', 'rank')
+    )
+
+
+def downgrade():
+    op.drop_table('SimilarArtist')
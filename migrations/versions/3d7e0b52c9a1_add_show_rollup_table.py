@@ -0,0 +1,31 @@
+"""add show rollup table
+
+Revision ID: 3d7e0b52c9a1
+Revises: 0a6e93f1d7b4
+Create Date: 2026-10-19 13:48:12.504217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d7e0b52c9a1'
+down_revision = '0a6e93f1d7b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing shows are counted by `flask stats rebuild`
+    op.create_table('ShowRollup',
+    sa.Column('dimension', sa.String(length=10), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('key', sa.String(length=120), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('dimension', 'month', 'key')
+    )
+
+
+def downgrade():
+    op.drop_table('ShowRollup')
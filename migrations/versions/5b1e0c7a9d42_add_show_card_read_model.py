@@ -0,0 +1,53 @@
+"""add show card read model
+
+Revision ID: 5b1e0c7a9d42
+Revises: 288266175818
+Create Date: 2026-10-19 09:12:44.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e0c7a9d42'
+down_revision = '288266175818'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ShowCard',
+    sa.Column('show_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('venue_name', sa.String(), nullable=True),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('artist_name', sa.String(), nullable=True),
+    sa.Column('artist_image_link', sa.String(length=500), nullable=True),
+    sa.PrimaryKeyConstraint('show_id')
+    )
+    with op.batch_alter_table('ShowCard', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ShowCard_artist_id'), ['artist_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ShowCard_start_time'), ['start_time'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ShowCard_venue_id'), ['venue_id'], unique=False)
+
+    # backfill the cards of the existing shows
+    op.execute(
+        'INSERT INTO "ShowCard" (show_id, start_time, venue_id, venue_name, '
+        'artist_id, artist_name, artist_image_link) '
+        'SELECT "Show".id, "Show".start_time, "Venue".id, "Venue".name, '
+        '"Artist".id, "Artist".name, "Artist".image_link '
+        'FROM "Show" '
+        'JOIN "Venue" ON "Venue".id = "Show".venue_id '
+        'JOIN "Artist" ON "Artist".id = "Show".artist_id'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('ShowCard', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ShowCard_venue_id'))
+        batch_op.drop_index(batch_op.f('ix_ShowCard_start_time'))
+        batch_op.drop_index(batch_op.f('ix_ShowCard_artist_id'))
+
+    op.drop_table('ShowCard')
@@ -0,0 +1,93 @@
+"""partition show by start_time
+
+Revision ID: 7b2f4c8e1d36
+Revises: 3d7e0b52c9a1
+Create Date: 2026-10-19 14:20:37.915406
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2f4c8e1d36'
+down_revision = '3d7e0b52c9a1'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 12
+
+
+def show_table(name, partitioned):
+    # partitioned tables need the partition key in the primary key
+    primary_key = 'id, start_time' if partitioned else 'id'
+    return (
+        f'CREATE TABLE "{name}" ('
+        """id integer NOT NULL DEFAULT nextval('"Show_id_seq"'::regclass), """
+        'start_time timestamp without time zone NOT NULL, '
+        'artist_id integer NOT NULL CONSTRAINT "Show_artist_id_fkey" '
+        'REFERENCES "Artist" (id) ON DELETE CASCADE, '
+        'venue_id integer NOT NULL CONSTRAINT "Show_venue_id_fkey" '
+        'REFERENCES "Venue" (id) ON DELETE CASCADE, '
+        f'CONSTRAINT "Show_pkey" PRIMARY KEY ({primary_key}))' +
+        (' PARTITION BY RANGE (start_time)' if partitioned else ''))
+
+
+def swap_show_table(partitioned):
+    # rebuilds "Show" as a new table and copies the rows over; the id
+    # sequence moves to the new table so ids keep counting up
+    old = 'Show_partitioned' if not partitioned else 'Show_unpartitioned'
+    op.execute(f'ALTER TABLE "Show" RENAME TO "{old}"')
+    op.execute(f'ALTER TABLE "{old}" RENAME CONSTRAINT "Show_pkey" '
+               f'TO "{old}_pkey"')
+    op.execute(show_table('Show', partitioned))
+    op.execute('ALTER SEQUENCE "Show_id_seq" OWNED BY "Show".id')
+    if partitioned:
+        create_month_partitions()
+    op.execute('INSERT INTO "Show" (id, start_time, artist_id, venue_id) '
+               f'SELECT id, start_time, artist_id, venue_id FROM "{old}"')
+    op.execute(f'DROP TABLE "{old}"')
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def create_month_partitions():
+    # one partition per month from the oldest show to MONTHS_AHEAD months
+    # from now (names as in partitions.partition_name), plus a default
+    # partition for anything booked further ahead
+    oldest = op.get_bind().execute(sa.text(
+        'SELECT min(start_time) FROM "Show_unpartitioned"')).scalar()
+    today = date.today()
+    month = date(today.year, today.month, 1)
+    if oldest is not None:
+        month = min(month, date(oldest.year, oldest.month, 1))
+    last = add_months(date(today.year, today.month, 1), MONTHS_AHEAD)
+    while month <= last:
+        end = add_months(month, 1)
+        op.execute(f'CREATE TABLE "Show_p{month.year:04d}_{month.month:02d}" '
+                   f"""PARTITION OF "Show" FOR VALUES FROM ('{month}') """
+                   f"TO ('{end}')")
+        month = end
+    op.execute('CREATE TABLE "Show_default" PARTITION OF "Show" DEFAULT')
+
+
+def upgrade():
+    # SQLite keeps the single Show table
+    if op.get_bind().dialect.name == 'postgresql':
+        swap_show_table(partitioned=True)
+
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+
+    if op.get_bind().dialect.name == 'postgresql':
+        swap_show_table(partitioned=False)
@@ -0,0 +1,58 @@
+"""cascading and soft deletes
+
+Revision ID: 9c3f2d6e1a70
+Revises: 5b1e0c7a9d42
+Create Date: 2026-10-19 10:02:17.550961
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3f2d6e1a70'
+down_revision = '5b1e0c7a9d42'
+branch_labels = None
+depends_on = None
+
+
+def recreate_show_foreign_keys(ondelete):
+    # SQLite does not enforce these by default and cannot alter them in
+    # place; the app deletes dependent shows explicitly either way.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for column, table in (('artist_id', 'Artist'), ('venue_id', 'Venue')):
+        name = 'Show_' + column + '_fkey'
+        op.drop_constraint(name, 'Show', type_='foreignkey')
+        op.create_foreign_key(name, 'Show', table, [column], ['id'],
+                              ondelete=ondelete)
+
+
+def upgrade():
+    with op.batch_alter_table('Artist', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+    op.create_index('ix_Artist_live_id', 'Artist', ['id'], unique=False,
+                    postgresql_where=sa.text('deleted_at IS NULL'),
+                    sqlite_where=sa.text('deleted_at IS NULL'))
+    op.create_index('ix_Venue_live_city_state', 'Venue', ['city', 'state'], unique=False,
+                    postgresql_where=sa.text('deleted_at IS NULL'),
+                    sqlite_where=sa.text('deleted_at IS NULL'))
+
+    recreate_show_foreign_keys('CASCADE')
+
+
+def downgrade():
+    recreate_show_foreign_keys(None)
+
+    op.drop_index('ix_Venue_live_city_state', table_name='Venue')
+    op.drop_index('ix_Artist_live_id', table_name='Artist')
+
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.drop_column('deleted_at')
+
+    with op.batch_alter_table('Artist', schema=None) as batch_op:
+        batch_op.drop_column('deleted_at')
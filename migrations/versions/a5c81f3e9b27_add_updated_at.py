@@ -0,0 +1,40 @@
+"""add updated_at
+
+Revision ID: a5c81f3e9b27
+Revises: 7b2f4c8e1d36
+Create Date: 2026-10-19 14:52:08.316724
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5c81f3e9b27'
+down_revision = '7b2f4c8e1d36'
+branch_labels = None
+depends_on = None
+
+
+def utc_now():
+    # the app writes datetime.utcnow(); CURRENT_TIMESTAMP is UTC on SQLite
+    # but in the session's time zone on Postgres
+    if op.get_context().dialect.name == 'postgresql':
+        return sa.text("timezone('utc', now())")
+    return sa.text('CURRENT_TIMESTAMP')
+
+
+def upgrade():
+    with op.batch_alter_table('Artist', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=utc_now(), nullable=False))
+
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=utc_now(), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+
+    with op.batch_alter_table('Artist', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,53 @@
+"""add created_at
+
+Revision ID: b6d0e2f4a813
+Revises: c2e94a7d5f18
+Create Date: 2026-10-19 18:07:42.519306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d0e2f4a813'
+down_revision = 'c2e94a7d5f18'
+branch_labels = None
+depends_on = None
+
+
+def utc_now():
+    # the app writes datetime.utcnow(); CURRENT_TIMESTAMP is UTC on SQLite
+    # but in the session's time zone on Postgres
+    if op.get_context().dialect.name == 'postgresql':
+        return sa.text("timezone('utc', now())")
+    return sa.text('CURRENT_TIMESTAMP')
+
+
+def upgrade():
+    # nullable and without a default first, so adding the column does not
+    # rewrite the table; the default is set on its own so that it only
+    # applies to rows inserted later
+    for table in ('Artist', 'Venue'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('created_at', server_default=utc_now())
+
+    # existing rows: updated_at is the closest thing to a listing time
+    op.backfill('Artist', {"created_at": sa.column('updated_at')},
+                where='created_at IS NULL')
+    op.backfill('Venue', {"created_at": sa.column('updated_at')},
+                where='created_at IS NULL')
+
+    op.set_not_null('Artist', 'created_at')
+    op.set_not_null('Venue', 'created_at')
+
+
+def downgrade():
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.drop_column('created_at')
+
+    with op.batch_alter_table('Artist', schema=None) as batch_op:
+        batch_op.drop_column('created_at')
@@ -0,0 +1,38 @@
+"""add change log table
+
+Revision ID: c2e94a7d5f18
+Revises: a5c81f3e9b27
+Create Date: 2026-10-19 15:31:44.208913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e94a7d5f18'
+down_revision = 'a5c81f3e9b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ChangeLog',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('action', sa.String(length=10), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=True),
+    sa.Column('artist_id', sa.Integer(), nullable=True),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('ChangeLog', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ChangeLog_changed_at'), ['changed_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ChangeLog', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ChangeLog_changed_at'))
+
+    op.drop_table('ChangeLog')
@@ -0,0 +1,71 @@
+"""add genre masks
+
+Revision ID: e1d5b9a03c28
+Revises: c47a81e5f093
+Create Date: 2026-10-19 11:37:05.912664
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1d5b9a03c28'
+down_revision = 'c47a81e5f093'
+branch_labels = None
+depends_on = None
+
+# enums.Genre member names in declaration order, frozen for this migration
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic',
+          'Folk', 'Funk', 'HipHop', 'HeavyMetal', 'Instrumental', 'Jazz',
+          'MusicalTheatre', 'Pop', 'Punk', 'RnB', 'Reggae', 'RocknRoll',
+          'Soul', 'Other']
+
+
+def genre_mask(genres):
+    try:
+        names = json.loads(genres or '[]')
+    except ValueError:
+        return 0
+    return sum(1 << GENRES.index(name) for name in set(names)
+               if name in GENRES)
+
+
+def backfill(table_name):
+    table = sa.table(table_name, sa.column('id', sa.Integer),
+                     sa.column('genres', sa.String),
+                     sa.column('genre_mask', sa.Integer))
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(table.c.id, table.c.genres)).fetchall()
+    updates = [{'row_id': row.id, 'mask': genre_mask(row.genres)}
+               for row in rows]
+    updates = [update for update in updates if update['mask']]
+    if updates:
+        bind.execute(table.update().
+                     where(table.c.id == sa.bindparam('row_id')).
+                     values(genre_mask=sa.bindparam('mask')), updates)
+
+
+def upgrade():
+    with op.batch_alter_table('Artist', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('genre_mask', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index(batch_op.f('ix_Artist_genre_mask'), ['genre_mask'], unique=False)
+
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('genre_mask', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index(batch_op.f('ix_Venue_genre_mask'), ['genre_mask'], unique=False)
+
+    backfill('Artist')
+    backfill('Venue')
+
+
+def downgrade():
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_Venue_genre_mask'))
+        batch_op.drop_column('genre_mask')
+
+    with op.batch_alter_table('Artist', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_Artist_genre_mask'))
+        batch_op.drop_column('genre_mask')
@@ -0,0 +1,37 @@
+"""add match table
+
+Revision ID: f8a27c4d6b15
+Revises: e1d5b9a03c28
+Create Date: 2026-10-19 12:21:49.083125
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f8a27c4d6b15'
+down_revision = 'e1d5b9a03c28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('Match',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('match_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('Match', schema=None) as batch_op:
+        batch_op.create_index('ix_Match_kind_entity_id_rank', ['kind', 'entity_id', 'rank'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('Match', schema=None) as batch_op:
+        batch_op.drop_index('ix_Match_kind_entity_id_rank')
+
+    op.drop_table('Match')
@@ -10,6 +10,9 @@ from wtforms import StringField, \
     DateTimeField
 from wtforms.validators import DataRequired, AnyOf, URL
 from flask_wtf.csrf import CSRFProtect
+from sqlalchemy import update
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
 
 # ----------------------------------------------------------------------------#
 # App Config.
@@ -17,6 +20,24 @@ from flask_wtf.csrf import CSRFProtect
 
 db = SQLAlchemy()
 
+
+class utcnow(FunctionElement):
+    # the database's current UTC time, for server defaults next to
+    # datetime.utcnow(): CURRENT_TIMESTAMP is UTC on SQLite, but in the
+    # session's time zone on Postgres
+    type = db.DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def compile_utcnow(element, compiler, **kwargs):
+    return 'CURRENT_TIMESTAMP'
+
+
+@compiles(utcnow, 'postgresql')
+def compile_utcnow_postgresql(element, compiler, **kwargs):
+    return "timezone('utc', now())"
+
 # ----------------------------------------------------------------------------#
 # Models.
 # ----------------------------------------------------------------------------#
@@ -32,6 +53,9 @@ class Venue(db.Model):
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     genres = db.Column(db.String(120))
+    # enums.Genre.mask(genres), kept in sync on create and edit
+    genre_mask = db.Column(db.Integer, nullable=False, default=0,
+                           server_default='0', index=True)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean, default=False)
@@ -40,9 +64,32 @@ class Venue(db.Model):
     # TODO:
     # implement any missing fields,
     # as a database migration using Flask-Migrate
-    shows = db.relationship('Show', backref='venue', lazy='joined')
+    shows = db.relationship('Show', backref='venue', lazy='joined',
+                            passive_deletes=True)
     # shows = db.relationship('Show', backref='artist', lazy=False)
     website = db.Column(db.String(120))
+    # soft delete: listing queries only read rows where this is NULL
+    deleted_at = db.Column(db.DateTime)
+    # bumped on every edit, see update_versioned()
+    version = db.Column(db.Integer, nullable=False, default=1,
+                        server_default='1')
+    # UTC time the row was listed, for the home page feed
+    created_at = db.Column(db.DateTime, nullable=False,
+                           default=datetime.utcnow,
+                           server_default=utcnow())
+    # UTC time of the last change to anything the detail page shows: the
+    # row itself, its shows, or the other side of those shows, see touch()
+    updated_at = db.Column(db.DateTime, nullable=False,
+                           default=datetime.utcnow,
+                           server_default=utcnow())
+
+    __mapper_args__ = {'version_id_col': version}
+    __table_args__ = (
+        # partial index over the live rows, used by the venues listing
+        db.Index('ix_Venue_live_city_state', 'city', 'state',
+                 postgresql_where=deleted_at.is_(None),
+                 sqlite_where=deleted_at.is_(None)),
+    )
 
     def __repr__(self):
         return f'<Venue {self.id} \
@@ -64,6 +111,9 @@ class Artist(db.Model):
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     genres = db.Column(db.String(120))
+    # enums.Genre.mask(genres), kept in sync on create and edit
+    genre_mask = db.Column(db.Integer, nullable=False, default=0,
+                           server_default='0', index=True)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, default=False)
@@ -72,7 +122,30 @@ class Artist(db.Model):
     # TODO: implement any missing fields,
     # as a database migration using Flask-Migrate
     website = db.Column(db.String(120))
-    shows = db.relationship('Show', backref='artist', lazy='joined')
+    shows = db.relationship('Show', backref='artist', lazy='joined',
+                            passive_deletes=True)
+    # soft delete: listing queries only read rows where this is NULL
+    deleted_at = db.Column(db.DateTime)
+    # bumped on every edit, see update_versioned()
+    version = db.Column(db.Integer, nullable=False, default=1,
+                        server_default='1')
+    # UTC time the row was listed, for the home page feed
+    created_at = db.Column(db.DateTime, nullable=False,
+                           default=datetime.utcnow,
+                           server_default=utcnow())
+    # UTC time of the last change to anything the detail page shows: the
+    # row itself, its shows, or the other side of those shows, see touch()
+    updated_at = db.Column(db.DateTime, nullable=False,
+                           default=datetime.utcnow,
+                           server_default=utcnow())
+
+    __mapper_args__ = {'version_id_col': version}
+    __table_args__ = (
+        # partial index over the live rows, used by the artists listing
+        db.Index('ix_Artist_live_id', 'id',
+                 postgresql_where=deleted_at.is_(None),
+                 sqlite_where=deleted_at.is_(None)),
+    )
     # shows = db.relationship('Show', backref='venue', lazy=False)
 
     def __repr__(self):
@@ -85,21 +158,164 @@ class Artist(db.Model):
                                 {self.image_link} \
                                     {self.facebook_link}>'
 
+
+def update_versioned(model, entity_id, version, values):
+    """Update a live Venue or Artist row in one statement.
+
+    Runs UPDATE ... SET version = version + 1 WHERE id = ? AND version = ?
+    without loading the row or its shows, using RETURNING where the
+    dialect supports it. Returns the new version, or None when the row
+    is gone or another edit committed first (a lost update).
+    """
+    statement = update(model). \
+        where(model.id == entity_id). \
+        where(model.version == version). \
+        where(model.deleted_at.is_(None)). \
+        values(version=model.version + 1, updated_at=datetime.utcnow(),
+               **values). \
+        execution_options(synchronize_session=False)
+    if getattr(db.engine.dialect, 'full_returning', False):
+        return db.session.execute(
+            statement.returning(model.version)).scalar()
+    if db.session.execute(statement).rowcount != 1:
+        return None
+    return version + 1
+
+
+def touch(model, *criteria):
+    # stamps updated_at on the matching Venue or Artist rows without
+    # bumping their version, so open edit forms stay valid
+    db.session.execute(update(model).where(*criteria).
+                       values(updated_at=datetime.utcnow()).
+                       execution_options(synchronize_session=False))
+
 # TODO Implement Show and Artist models, and
 # complete all model relationships and properties, as a database migration.
 
 
 class Show(db.Model):
+    # On Postgres the table is partitioned by month of start_time and its
+    # primary key is (id, start_time), see partitions.py; ids still come
+    # from one sequence, so id alone identifies a show.
     __tablename__ = 'Show'
 
     id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.DateTime, nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey(
-        'Artist.id'), nullable=False)
-    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
+        'Artist.id', ondelete='CASCADE'), nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey(
+        'Venue.id', ondelete='CASCADE'), nullable=False)
+
+    __table_args__ = (
+        # past/upcoming shows of one venue or artist
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+    )
 
     def __repr__(self):
         return f'<Show {self.id} \
             {self.start_time} \
                 {self.artist_id} \
                     {self.venue_id}>'
+
+
+class ShowCard(db.Model):
+    # Denormalized read model for the /shows page: one flat row per show,
+    # kept in sync by read_models.py on writes to Show, Venue and Artist.
+    __tablename__ = 'ShowCard'
+
+    show_id = db.Column(db.Integer, primary_key=True)
+    start_time = db.Column(db.DateTime, nullable=False, index=True)
+    venue_id = db.Column(db.Integer, nullable=False, index=True)
+    venue_name = db.Column(db.String)
+    artist_id = db.Column(db.Integer, nullable=False, index=True)
+    artist_name = db.Column(db.String)
+    artist_image_link = db.Column(db.String(500))
+
+    def __repr__(self):
+        return f'<ShowCard {self.show_id} \
+            {self.start_time} \
+                {self.venue_name} \
+                    {self.artist_name}>'
+
+
+class Match(db.Model):
+    # Precomputed top-K counterparts per venue and artist, rebuilt by
+    # `flask matches rebuild` (matchmaking.py). kind is the kind of the
+    # entity the list belongs to; match_id is a Venue id for artists and
+    # an Artist id for venues.
+    __tablename__ = 'Match'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+    match_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_Match_kind_entity_id_rank', 'kind', 'entity_id', 'rank'),
+    )
+
+    def __repr__(self):
+        return f'<Match {self.kind} \
+            {self.entity_id} \
+                {self.rank} \
+                    {self.match_id}>'
+
+
+class SimilarArtist(db.Model):
+    # Top-K artists sharing venues with an artist, computed by
+    # recommendations.py and read by the artist page in rank order.
+    __tablename__ = 'SimilarArtist'
+
+    artist_id = db.Column(db.Integer, primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    similar_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<SimilarArtist {self.artist_id} \
+            {self.rank} \
+                {self.similar_id}>'
+
+
+class ShowRollup(db.Model):
+    # Show counts per month and dimension ('genre', 'city' or 'venue'),
+    # kept up to date by rollups.py on show writes and read by /stats.
+    # key is a Genre name, "City, ST", or a Venue id.
+    __tablename__ = 'ShowRollup'
+
+    dimension = db.Column(db.String(10), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)
+    key = db.Column(db.String(120), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ShowRollup {self.dimension} \
+            {self.month} \
+                {self.key} \
+                    {self.count}>'
+
+
+class ChangeLog(db.Model):
+    # Append-only log of venue, artist and show changes, written in the
+    # same transaction as the change and read by /events (changes.py).
+    # id is the cursor clients resume from. Show entries also carry the
+    # show's venue_id and artist_id.
+    __tablename__ = 'ChangeLog'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)
+    venue_id = db.Column(db.Integer)
+    artist_id = db.Column(db.Integer)
+    changed_at = db.Column(db.DateTime, nullable=False,
+                           default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<ChangeLog {self.id} \
+            {self.kind} \
+                {self.entity_id} \
+                    {self.action}>'
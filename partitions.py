@@ -0,0 +1,229 @@
+import glob  # to find the archive files
+import gzip  # archived months are gzipped JSON lines
+import json
+import os
+from datetime import date, datetime
+
+import click  # for the command line output
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, delete, func, select, text
+
+from cache import cache
+from models import Artist, Show, ShowCard, Venue, db, touch
+
+# ----------------------------------------------------------------------------#
+# Show partitions and archive.
+# ----------------------------------------------------------------------------#
+
+# On Postgres "Show" is range-partitioned by start_time into one table per
+# month ("Show_p2026_10"), plus "Show_default" for anything outside the
+# created months, see migration 7b2f4c8e1d36. Upcoming-show queries only
+# touch the current and future partitions. Old months are written to
+# <SHOW_ARCHIVE_DIR>/shows-YYYY-MM.jsonl.gz and then detached and dropped.
+# On SQLite Show stays a single table and the same commands just archive
+# and delete the rows.
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def current_month():
+    today = date.today()
+    return date(today.year, today.month, 1)
+
+
+def partition_name(month):
+    # keep in sync with the migration that partitioned the table
+    return f'Show_p{month.year:04d}_{month.month:02d}'
+
+
+def is_partitioned():
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return db.session.execute(text(
+        "SELECT relkind FROM pg_class WHERE relname = 'Show'")).scalar() \
+        == 'p'
+
+
+def partitions():
+    return {name for name, in db.session.execute(text(
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+        'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        "WHERE parent.relname = 'Show'"))}
+
+
+def create_partitions(ahead):
+    """Make sure the current month and the next `ahead` months have a
+    partition. Shows already booked into "Show_default" for one of those
+    months are moved into the new partition before it is attached.
+    Returns the names of the partitions created."""
+    if not is_partitioned():
+        return []
+    existing = partitions()
+    created = []
+    for offset in range(ahead + 1):
+        month = add_months(current_month(), offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        bounds = {"start": month, "end": add_months(month, 1)}
+        db.session.execute(text(
+            f'CREATE TABLE "{name}" (LIKE "Show" INCLUDING DEFAULTS)'))
+        db.session.execute(text(
+            'WITH moved AS (DELETE FROM "Show_default" '
+            'WHERE start_time >= :start AND start_time < :end '
+            'RETURNING id, start_time, artist_id, venue_id) '
+            f'INSERT INTO "{name}" (id, start_time, artist_id, venue_id) '
+            'SELECT id, start_time, artist_id, venue_id FROM moved'), bounds)
+        db.session.execute(text(
+            f'ALTER TABLE "Show" ATTACH PARTITION "{name}" '
+            f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"))
+        db.session.commit()
+        created.append(name)
+    return created
+
+
+def archive_path(directory, month):
+    return os.path.join(directory, f'shows-{month:%Y-%m}.jsonl.gz')
+
+
+def read_entries(path):
+    with gzip.open(path, 'rt') as archive:
+        return [json.loads(line) for line in archive]
+
+
+def write_archive(path, rows):
+    # The month's archived entries plus rows, one entry per show id, are
+    # written to a temporary file, synced and renamed over the archive. A
+    # run that failed before its DELETE committed is re-run over the same
+    # shows, which then replace their entries instead of being added twice.
+    entries = {entry['id']: entry for entry in
+               (read_entries(path) if os.path.exists(path) else [])}
+    for row in rows:
+        entry = dict(row._mapping)
+        entry['start_time'] = entry['start_time'].isoformat()
+        entries[entry['id']] = entry
+    with open(path + '.tmp', 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+            for entry in sorted(entries.values(), key=lambda entry: (
+                    entry['start_time'], entry['id'])):
+                archive.write((json.dumps(entry) + '\n').encode())
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def archive_month(month, directory):
+    """Move one month of shows to its archive file.
+
+    The rows are merged into the month's archive, which is replaced
+    atomically, first; only then are they removed, by dropping the
+    month's partition on Postgres and deleting whatever is left in the
+    range. Rollup counts are kept. Returns the number of shows archived.
+    """
+    end = add_months(month, 1)
+    in_month = and_(Show.start_time >= month, Show.start_time < end)
+    rows = db.session.execute(
+        select(Show.id, Show.start_time,
+               Venue.id.label('venue_id'), Venue.name.label('venue_name'),
+               Venue.image_link.label('venue_image_link'),
+               Artist.id.label('artist_id'),
+               Artist.name.label('artist_name'),
+               Artist.image_link.label('artist_image_link')).
+        join(Venue, Venue.id == Show.venue_id).
+        join(Artist, Artist.id == Show.artist_id).
+        where(in_month).order_by(Show.start_time, Show.id)).all()
+    if rows:
+        os.makedirs(directory, exist_ok=True)
+        write_archive(archive_path(directory, month), rows)
+
+    # the shows leave the past shows of these pages
+    touch(Venue, Venue.id.in_(select(Show.venue_id).where(in_month)))
+    touch(Artist, Artist.id.in_(select(Show.artist_id).where(in_month)))
+    name = partition_name(month)
+    if is_partitioned() and name in partitions():
+        db.session.execute(text(
+            f'ALTER TABLE "Show" DETACH PARTITION "{name}"'))
+        db.session.execute(text(f'DROP TABLE "{name}"'))
+    db.session.execute(delete(Show).where(in_month))
+    db.session.execute(delete(ShowCard).where(
+        ShowCard.start_time >= month, ShowCard.start_time < end))
+    db.session.commit()
+    return len(rows)
+
+
+def archive_before(cutoff, directory):
+    # archives every month before cutoff, oldest first
+    oldest = db.session.execute(
+        select(func.min(Show.start_time)).
+        where(Show.start_time < cutoff)).scalar()
+    archived = {}
+    if oldest is None:
+        return archived
+    month = date(oldest.year, oldest.month, 1)
+    while month < cutoff:
+        archived[month] = archive_month(month, directory)
+        month = add_months(month, 1)
+    return archived
+
+
+def read_archive(directory, column, entity_id):
+    shows = []
+    for path in sorted(glob.glob(os.path.join(directory,
+                                              'shows-*.jsonl.gz'))):
+        with gzip.open(path, 'rt') as archive:
+            for line in archive:
+                entry = json.loads(line)
+                if entry[column] == entity_id:
+                    entry['start_time'] = datetime.fromisoformat(
+                        entry['start_time'])
+                    shows.append(entry)
+    return shows
+
+
+def archived_shows(kind, entity_id):
+    # archived shows of a venue or artist, oldest first; only read when a
+    # detail page asks for ?history=archived
+    directory = current_app.config['SHOW_ARCHIVE_DIR']
+    return cache.cached('archive', (kind, entity_id), lambda: read_archive(
+        directory, kind + '_id', entity_id))
+
+
+cli = AppGroup('shows', help='Show partitions and archive.')
+
+
+@cli.command('partition')
+@click.option('--ahead', default=None, type=int,
+              help='Months to create ahead of the current one.')
+def partition_command(ahead):
+    """Create the upcoming monthly Show partitions."""
+    if ahead is None:
+        ahead = current_app.config['SHOW_PARTITIONS_AHEAD']
+    if not is_partitioned():
+        click.echo('Show is not partitioned on this database, nothing to do')
+        return
+    created = create_partitions(ahead)
+    click.echo(f'Created {len(created)} partitions' +
+               (': ' + ', '.join(created) if created else ''))
+
+
+@cli.command('archive')
+@click.option('--keep-months', default=None, type=int,
+              help='Months of past shows to keep in the database.')
+@click.option('--to', 'directory', default=None,
+              help='Archive directory (default: SHOW_ARCHIVE_DIR).')
+def archive_command(keep_months, directory):
+    """Archive and remove the shows of old months."""
+    if keep_months is None:
+        keep_months = current_app.config['SHOW_ARCHIVE_AFTER_MONTHS']
+    directory = directory or current_app.config['SHOW_ARCHIVE_DIR']
+    cutoff = add_months(current_month(), -keep_months)
+    archived = archive_before(cutoff, directory)
+    for month, count in archived.items():
+        click.echo(f'{month:%Y-%m}: archived {count} shows')
+    click.echo(f'Archived {sum(archived.values())} shows from before '
+               f'{cutoff:%Y-%m} to {directory}')
@@ -0,0 +1,81 @@
+import math  # to round Retry-After up
+import threading  # to guard the buckets across request threads
+import time  # to refill the buckets
+from collections import OrderedDict  # LRU order
+from functools import wraps
+
+from flask import current_app, request
+from werkzeug.exceptions import TooManyRequests
+
+# ----------------------------------------------------------------------------#
+# Rate limiting.
+# ----------------------------------------------------------------------------#
+
+# A token bucket per client IP and scope: `burst` requests at once, then
+# `rate` requests per second. Behind a proxy, wrap app.wsgi_app in
+# werkzeug's ProxyFix so request.remote_addr is the client's address.
+
+
+class Backend:
+    """Where the buckets live.
+
+    take() spends one token from the bucket at key and returns 0, or
+    returns the seconds until the bucket holds a token again. MemoryBackend
+    keeps the buckets of one process; a shared backend (e.g. a Redis
+    script doing the same arithmetic) makes the limit hold across workers.
+    """
+
+    def take(self, key, rate, burst):
+        raise NotImplementedError
+
+
+class MemoryBackend(Backend):
+    def __init__(self, max_keys=10000):
+        # the least recently seen clients are dropped first; a dropped
+        # client comes back with a full bucket
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class RateLimiter:
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+
+    def check(self, scope, rate, burst):
+        # raises 429 with Retry-After (whole seconds, rounded up)
+        wait = self.backend.take((scope, request.remote_addr), rate, burst)
+        if wait:
+            raise TooManyRequests(retry_after=math.ceil(wait))
+
+    def limit(self, scope):
+        # rate and burst come from RATELIMIT_<SCOPE>_RATE/_BURST
+        def decorator(view):
+            @wraps(view)
+            def limited(*args, **kwargs):
+                config = current_app.config
+                prefix = 'RATELIMIT_' + scope.upper()
+                if config['RATELIMIT_ENABLED']:
+                    self.check(scope, config[prefix + '_RATE'],
+                               config[prefix + '_BURST'])
+                return view(*args, **kwargs)
+            return limited
+        return decorator
+
+
+limiter = RateLimiter()  # shared by the app; set limiter.backend to share
@@ -0,0 +1,48 @@
+from sqlalchemy import and_, delete, insert, select, update
+
+from models import Artist, Show, ShowCard, Venue, db
+
+# ----------------------------------------------------------------------------#
+# Show cards.
+# ----------------------------------------------------------------------------#
+
+# The /shows page reads ShowCard only. Every statement below is a single
+# set-based INSERT/UPDATE/DELETE that runs inside the caller's transaction,
+# so a card is never committed without (or after) the write it mirrors.
+
+CARD_COLUMNS = [ShowCard.show_id, ShowCard.start_time,
+                ShowCard.venue_id, ShowCard.venue_name,
+                ShowCard.artist_id, ShowCard.artist_name,
+                ShowCard.artist_image_link]
+
+
+def insert_show_cards(*criteria):
+    # INSERT ... SELECT for every show matching criteria that has no card
+    # yet, between a live venue and a live artist
+    source = select(Show.id, Show.start_time,
+                    Venue.id, Venue.name,
+                    Artist.id, Artist.name, Artist.image_link). \
+        join(Venue, Show.venue_id == Venue.id). \
+        join(Artist, Show.artist_id == Artist.id). \
+        outerjoin(ShowCard, ShowCard.show_id == Show.id). \
+        where(and_(ShowCard.show_id.is_(None), Venue.deleted_at.is_(None),
+                   Artist.deleted_at.is_(None), *criteria))
+    db.session.execute(insert(ShowCard).from_select(
+        [column.key for column in CARD_COLUMNS], source))
+
+
+def update_venue_cards(venue_id, name):
+    db.session.execute(update(ShowCard).
+                       where(ShowCard.venue_id == venue_id).
+                       values(venue_name=name))
+
+
+def update_artist_cards(artist_id, name, image_link):
+    db.session.execute(update(ShowCard).
+                       where(ShowCard.artist_id == artist_id).
+                       values(artist_name=name,
+                              artist_image_link=image_link))
+
+
+def delete_show_cards(*criteria):
+    db.session.execute(delete(ShowCard).where(*criteria))
@@ -0,0 +1,171 @@
+import time  # to report how long a rebuild took
+
+import click  # for the command line output
+import numpy as np
+from flask.cli import AppGroup
+from scipy import sparse  # artist x venue co-occurrence matrix
+from sqlalchemy import delete, distinct, func, insert, select
+
+from models import Artist, Show, SimilarArtist, db, touch
+
+# ----------------------------------------------------------------------------#
+# Similar artists.
+# ----------------------------------------------------------------------------#
+
+# Two artists are similar when they play the same venues: the score is the
+# cosine between their binary artist x venue rows, shared venues divided by
+# sqrt(venues of one * venues of the other).
+TOP_K = 10
+CHUNK = 2048  # artist rows multiplied at a time
+
+
+def live_pairs(*criteria):
+    # distinct (artist_id, venue_id) pairs of live artists
+    return db.session.execute(
+        select(Show.artist_id, Show.venue_id).distinct().
+        join(Artist, Artist.id == Show.artist_id).
+        where(Artist.deleted_at.is_(None), *criteria)).all()
+
+
+def cooccurrence_matrix(pairs):
+    # binary artist x venue matrix, rows scaled to unit length
+    artist_ids = np.unique(np.array([pair[0] for pair in pairs],
+                                    dtype=np.int64))
+    venue_ids = np.unique(np.array([pair[1] for pair in pairs],
+                                   dtype=np.int64))
+    rows = np.searchsorted(artist_ids, [pair[0] for pair in pairs])
+    columns = np.searchsorted(venue_ids, [pair[1] for pair in pairs])
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (rows, columns)),
+        shape=(len(artist_ids), len(venue_ids)))
+    norms = np.sqrt(np.asarray(matrix.sum(axis=1)).ravel())
+    matrix = sparse.diags(1 / np.maximum(norms, 1)) @ matrix
+    return artist_ids, matrix.tocsr()
+
+
+def neighbors(artist_ids, matrix, rows, k=TOP_K):
+    # {artist_id: [(similar_id, score), ...]} for the given matrix rows
+    similar = {}
+    for start in range(0, len(rows), CHUNK):
+        chunk = rows[start:start + CHUNK]
+        scores = (matrix[chunk] @ matrix.T).tocsr()
+        for offset, row in enumerate(chunk):
+            begin, end = scores.indptr[offset], scores.indptr[offset + 1]
+            columns = scores.indices[begin:end]
+            values = scores.data[begin:end]
+            keep = columns != row
+            columns, values = columns[keep], np.round(values[keep], 4)
+            if len(values) > k:
+                best = np.argpartition(-values, k - 1)[:k]
+                columns, values = columns[best], values[best]
+            order = np.lexsort((artist_ids[columns], -values))
+            similar[int(artist_ids[row])] = [
+                (int(artist_ids[columns[index]]), float(values[index]))
+                for index in order]
+    return similar
+
+
+def store(similar):
+    # replaces the stored lists of the given artists
+    if not similar:
+        return
+    db.session.execute(delete(SimilarArtist).where(
+        SimilarArtist.artist_id.in_(list(similar))))
+    rows = [{"artist_id": artist_id, "rank": rank,
+             "similar_id": similar_id, "score": round(score, 4)}
+            for artist_id, entries in similar.items()
+            for rank, (similar_id, score) in enumerate(entries, 1)]
+    if rows:
+        db.session.execute(insert(SimilarArtist), rows)
+
+
+def rebuild_similar_artists(k=TOP_K):
+    # offline full pass over the Show table
+    pairs = live_pairs()
+    db.session.execute(delete(SimilarArtist))
+    if pairs:
+        artist_ids, matrix = cooccurrence_matrix(pairs)
+        similar = neighbors(artist_ids, matrix, np.arange(len(artist_ids)),
+                            k)
+        store({artist_id: entries for artist_id, entries in similar.items()
+               if entries})
+    touch(Artist)  # every artist page shows its list
+    db.session.commit()
+
+
+def refresh_similar_artists(artist_id, k=TOP_K):
+    """Incremental update after artist_id played a new venue.
+
+    Only artists sharing a venue with artist_id can see their score with
+    it change. The artist's own list is recomputed exactly from its
+    neighbourhood; each neighbour's stored list gets the new score for
+    artist_id merged in. A neighbour whose score with artist_id dropped
+    can be left one entry short until the next full rebuild.
+    """
+    venues = select(Show.venue_id).where(Show.artist_id == artist_id)
+    pairs = live_pairs(Show.venue_id.in_(venues))
+    if not pairs:
+        return
+    # binary rows: the dot product is the number of shared venues
+    artist_ids, matrix = cooccurrence_matrix(pairs)
+    if artist_id not in artist_ids:
+        return
+    matrix.data[:] = 1
+    sizes = dict(db.session.execute(
+        select(Show.artist_id, func.count(distinct(Show.venue_id))).
+        where(Show.artist_id.in_(artist_ids.tolist())).
+        group_by(Show.artist_id)).all())
+    row = int(np.searchsorted(artist_ids, artist_id))
+    shared = np.asarray((matrix @ matrix[row].T).todense()).ravel()
+    scores = shared / np.sqrt(
+        np.array([sizes.get(int(other), 1) for other in artist_ids]) *
+        sizes.get(artist_id, 1))
+
+    # rounded like the stored scores, so ties order the same way
+    own = [(int(other), round(float(score), 4))
+           for other, score in zip(artist_ids, scores)
+           if other != artist_id and score > 0]
+    own.sort(key=lambda entry: (-entry[1], entry[0]))
+    updated = {artist_id: own[:k]}
+
+    others = [entry[0] for entry in own]
+    stored = {}
+    for entry in db.session.execute(
+            select(SimilarArtist.artist_id, SimilarArtist.similar_id,
+                   SimilarArtist.score).
+            where(SimilarArtist.artist_id.in_(others)).
+            order_by(SimilarArtist.artist_id, SimilarArtist.rank)):
+        stored.setdefault(entry.artist_id, []).append(
+            (entry.similar_id, entry.score))
+    for other, score in own:
+        entries = [entry for entry in stored.get(other, [])
+                   if entry[0] != artist_id] + [(artist_id, score)]
+        entries.sort(key=lambda entry: (-entry[1], entry[0]))
+        updated[other] = entries[:k]
+    store(updated)
+    touch(Artist, Artist.id.in_(list(updated)))
+
+
+def similar_artists(artist_id, limit=TOP_K):
+    # one indexed read of the stored list, joined by primary key for names
+    return db.session.execute(
+        select(Artist.id, Artist.name, Artist.image_link,
+               SimilarArtist.score).
+        join(Artist, Artist.id == SimilarArtist.similar_id).
+        where(SimilarArtist.artist_id == artist_id,
+              Artist.deleted_at.is_(None)).
+        order_by(SimilarArtist.rank).limit(limit)).all()
+
+
+cli = AppGroup('recommendations', help='Similar artist recommendations.')
+
+
+@cli.command('rebuild')
+@click.option('--top-k', 'k', default=TOP_K, show_default=True,
+              help='Similar artists kept per artist.')
+def rebuild_command(k):
+    """Recompute the SimilarArtist table from the Show table."""
+    started = time.perf_counter()
+    rebuild_similar_artists(k)
+    click.echo(f'Rebuilt similar artists in '
+               f'{time.perf_counter() - started:.1f}s')
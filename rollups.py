@@ -0,0 +1,172 @@
+import time  # to report how long a rebuild took
+from collections import Counter
+from datetime import date
+
+import click  # for the command line output
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from enums import Genre
+from models import Artist, Show, ShowRollup, Venue, db
+
+# ----------------------------------------------------------------------------#
+# Analytics rollups.
+# ----------------------------------------------------------------------------#
+
+# ShowRollup holds one count per (dimension, month, key). Show writes add
+# or subtract their own rows' counts with a single upsert inside the
+# caller's transaction, so /stats never aggregates the Show table. A show
+# is counted under its artist's genres and its venue's city at the time it
+# is booked; `flask stats rebuild` recounts everything from current data.
+
+
+def month_of(start_time):
+    return date(start_time.year, start_time.month, 1)
+
+
+def city_key(city, state):
+    return f'{(city or "").strip()}, {state or ""}'
+
+
+def count_rows(rows):
+    # rows of (start_time, venue_id, city, state, genre_mask)
+    counts = Counter()
+    for start_time, venue_id, city, state, genre_mask in rows:
+        month = month_of(start_time)
+        counts['venue', month, str(venue_id)] += 1
+        counts['city', month, city_key(city, state)] += 1
+        for genre in Genre.from_mask(genre_mask or 0):
+            counts['genre', month, genre] += 1
+    return counts
+
+
+def apply_counts(counts, sign=1):
+    # one multi-row INSERT ... ON CONFLICT DO UPDATE SET count = count + n
+    rows = [{"dimension": dimension, "month": month, "key": key,
+             "count": sign * count}
+            for (dimension, month, key), count in counts.items()]
+    if not rows:
+        return
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' \
+        else sqlite
+    statement = dialect.insert(ShowRollup)
+    statement = statement.on_conflict_do_update(
+        index_elements=[ShowRollup.dimension, ShowRollup.month,
+                        ShowRollup.key],
+        set_={"count": ShowRollup.count + statement.excluded.count})
+    db.session.execute(statement, rows)
+    if sign < 0:
+        db.session.execute(delete(ShowRollup).where(ShowRollup.count <= 0))
+
+
+def add_shows(values):
+    # values: dicts of artist_id, venue_id and start_time, as inserted;
+    # like show_rows(), only shows between live venues and artists count
+    venues = {row.id: row for row in db.session.execute(
+        select(Venue.id, Venue.city, Venue.state).
+        where(Venue.id.in_({value['venue_id'] for value in values}),
+              Venue.deleted_at.is_(None)))}
+    masks = dict(db.session.execute(
+        select(Artist.id, Artist.genre_mask).
+        where(Artist.id.in_({value['artist_id'] for value in values}),
+              Artist.deleted_at.is_(None))).all())
+    apply_counts(count_rows(
+        (value['start_time'], value['venue_id'],
+         venues[value['venue_id']].city, venues[value['venue_id']].state,
+         masks[value['artist_id']])
+        for value in values
+        if value['venue_id'] in venues and value['artist_id'] in masks))
+
+
+def show_rows(*criteria):
+    # shows between live venues and artists; soft-deleted ones are not
+    # counted
+    return select(Show.start_time, Show.venue_id, Venue.city, Venue.state,
+                  Artist.genre_mask). \
+        join(Venue, Venue.id == Show.venue_id). \
+        join(Artist, Artist.id == Show.artist_id). \
+        where(Venue.deleted_at.is_(None), Artist.deleted_at.is_(None),
+              *criteria)
+
+
+def remove_shows(*criteria):
+    # call before deleting the shows matching criteria, or soft deleting
+    # their venue or artist
+    apply_counts(count_rows(db.session.execute(show_rows(*criteria))), -1)
+
+
+def rebuild_rollups():
+    db.session.execute(delete(ShowRollup))
+    apply_counts(count_rows(db.session.execute(
+        show_rows().execution_options(stream_results=True))))
+    db.session.commit()
+
+
+def stats(months=12):
+    """Trend figures for /stats, read from ShowRollup only.
+
+    Covers the last `months` months, the current one included, plus
+    every month with shows already booked ahead.
+    """
+    today = date.today()
+    first = today.year * 12 + today.month - months
+    since = date(first // 12, first % 12 + 1, 1)
+
+    genre_rows = db.session.execute(
+        select(ShowRollup.month, ShowRollup.key, ShowRollup.count).
+        where(ShowRollup.dimension == 'genre', ShowRollup.month >= since)).all()
+    # every show has exactly one venue, so venue counts sum to show counts
+    totals = dict(db.session.execute(
+        select(ShowRollup.month, func.sum(ShowRollup.count)).
+        where(ShowRollup.dimension == 'venue', ShowRollup.month >= since).
+        group_by(ShowRollup.month).order_by(ShowRollup.month)).all())
+    active_months = len(totals) or 1
+    cities = db.session.execute(
+        select(ShowRollup.key, func.sum(ShowRollup.count).label('shows')).
+        where(ShowRollup.dimension == 'city', ShowRollup.month >= since).
+        group_by(ShowRollup.key).
+        order_by(func.sum(ShowRollup.count).desc(), ShowRollup.key).
+        limit(10)).all()
+    busiest = db.session.execute(
+        select(ShowRollup.key, func.sum(ShowRollup.count).label('shows'),
+               func.count(ShowRollup.month).label('months')).
+        where(ShowRollup.dimension == 'venue', ShowRollup.month >= since).
+        group_by(ShowRollup.key).
+        order_by(func.sum(ShowRollup.count).desc(), ShowRollup.key).
+        limit(10)).all()
+    names = dict(db.session.execute(
+        select(Venue.id, Venue.name).
+        where(Venue.id.in_([int(row.key) for row in busiest]))).all())
+
+    month_keys = [month.strftime('%Y-%m') for month in totals]
+    genres = {}
+    for month, genre, count in genre_rows:
+        genres.setdefault(genre, dict.fromkeys(month_keys, 0))[
+            month.strftime('%Y-%m')] = count
+    return {
+        "since": since.strftime('%Y-%m'),
+        "months": month_keys,
+        "shows": {month.strftime('%Y-%m'): count
+                  for month, count in totals.items()},
+        "genres": {genre: genres[genre] for genre in sorted(
+            genres, key=lambda genre: -sum(genres[genre].values()))},
+        "cities": [{"city": row.key, "shows": row.shows} for row in cities],
+        "venues": [{"id": int(row.key),
+                    "name": names.get(int(row.key)),
+                    "shows": row.shows,
+                    "months_active": row.months,
+                    "shows_per_month": round(row.shows / active_months, 2)}
+                   for row in busiest],
+    }
+
+
+cli = AppGroup('stats', help='Analytics rollups.')
+
+
+@cli.command('rebuild')
+def rebuild_command():
+    """Recount the ShowRollup table from the Show table."""
+    started = time.perf_counter()
+    rebuild_rollups()
+    click.echo(f'Rebuilt rollups in {time.perf_counter() - started:.1f}s')
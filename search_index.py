@@ -0,0 +1,108 @@
+import bisect  # binary search over the sorted keys
+import threading  # to guard the index across request threads
+import time  # to know when the index was loaded
+
+# ----------------------------------------------------------------------------#
+# Prefix index.
+# ----------------------------------------------------------------------------#
+
+
+def normalize(text):
+    # case-insensitive and whitespace-insensitive, like the ilike search
+    return ' '.join((text or '').lower().split())
+
+
+class PrefixIndex:
+    """In-memory prefix index over venue and artist names.
+
+    Every word of a name starts one key, so "hop" finds "The Musical Hop"
+    as well as "Hop Along". Keys live in one sorted list, a lookup is a
+    binary search followed by a short forward scan. Every worker process
+    has its own index and only sees its own writes; it is stale after
+    `refresh_after` seconds and then reloaded by the app, like the
+    activity feed.
+    """
+
+    def __init__(self, refresh_after=300):
+        self.refresh_after = refresh_after
+        self._keys = []  # sorted (key, kind, entity_id) tuples
+        self._entries = {}  # (kind, entity_id) -> (name, keys)
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self.loaded = False
+
+    def _keys_for(self, name):
+        words = normalize(name).split(' ')
+        return [' '.join(words[i:]) for i in range(len(words)) if words[i]]
+
+    def _remove(self, kind, entity_id):
+        entry = self._entries.pop((kind, entity_id), None)
+        if entry is None:
+            return
+        for key in entry[1]:
+            position = bisect.bisect_left(self._keys, (key, kind, entity_id))
+            if position < len(self._keys) and \
+                    self._keys[position] == (key, kind, entity_id):
+                del self._keys[position]
+
+    def add(self, kind, entity_id, name):
+        # also used for edits: the old keys of the entity are replaced
+        keys = self._keys_for(name)
+        with self._lock:
+            self._remove(kind, entity_id)
+            self._entries[(kind, entity_id)] = (name, keys)
+            for key in keys:
+                bisect.insort(self._keys, (key, kind, entity_id))
+
+    def remove(self, kind, entity_id):
+        with self._lock:
+            self._remove(kind, entity_id)
+
+    def load(self, rows):
+        # rows of (kind, entity_id, name); replaces the whole index at once
+        keys = []
+        entries = {}
+        for kind, entity_id, name in rows:
+            entry_keys = self._keys_for(name)
+            entries[(kind, entity_id)] = (name, entry_keys)
+            keys.extend((key, kind, entity_id) for key in entry_keys)
+        keys.sort()
+        with self._lock:
+            self._keys = keys
+            self._entries = entries
+            self._loaded_at = time.monotonic()
+            self.loaded = True
+
+    def stale(self):
+        # never loaded, or loaded more than refresh_after seconds ago
+        with self._lock:
+            return self._loaded_at is None or \
+                time.monotonic() - self._loaded_at > self.refresh_after
+
+    def search(self, query, limit=10, kind=None):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        with self._lock:
+            position = bisect.bisect_left(self._keys, (prefix,))
+            while position < len(self._keys) and len(results) < limit:
+                key, entry_kind, entity_id = self._keys[position]
+                if not key.startswith(prefix):
+                    break
+                position += 1
+                if kind and entry_kind != kind:
+                    continue
+                if (entry_kind, entity_id) in seen:
+                    continue
+                seen.add((entry_kind, entity_id))
+                results.append({
+                    "type": entry_kind,
+                    "id": entity_id,
+                    "name": self._entries[(entry_kind, entity_id)][0],
+                })
+        return results
+
+
+names = PrefixIndex()  # shared by the app's handlers
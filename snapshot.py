@@ -0,0 +1,202 @@
+import hashlib  # content hashes for the manifest
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor  # renders in parallel
+from datetime import datetime, timedelta
+from importlib import import_module
+
+import click  # for the command line output
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import literal, select, union_all
+
+from models import Artist, Show, Venue, db
+
+# ----------------------------------------------------------------------------#
+# Static snapshot.
+# ----------------------------------------------------------------------------#
+
+# `flask snapshot` renders the public pages to <SNAPSHOT_DIR>/<path>.html
+# (/venues/1 -> venues/1.html) and lists them in manifest.json with their
+# size and SHA-256, so a web server can answer from disk first, e.g. with
+# nginx: try_files /snapshot$uri.html @flask;
+#
+# A later run re-renders only the detail pages of venues and artists whose
+# updated_at moved (edits, and bookings, renames and deletions of their
+# counterparts all stamp it) or that have a show which went from upcoming
+# to past since, plus the listings. Files of removed venues and artists,
+# of pages that no longer render, and any other detail page file the
+# manifest does not list are deleted.
+
+LISTINGS = ['/venues', '/artists', '/shows']
+DETAILS = ['venues', 'artists']  # subdirectories of the detail pages
+MANIFEST = 'manifest.json'
+# re-checked before the last run's start, for writes that were committing
+# during it and for clock differences between the app servers
+OVERLAP = timedelta(minutes=1)
+
+worker_app = None  # set in each worker process
+
+
+def file_for(path):
+    return path.strip('/') + '.html'
+
+
+def write_atomically(filename, data):
+    # a web server never sees a half-written page
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename + '.tmp', 'wb') as file:
+        file.write(data)
+    os.replace(filename + '.tmp', filename)
+
+
+def remove_file(directory, filename):
+    try:
+        os.remove(os.path.join(directory, filename))
+    except FileNotFoundError:
+        pass
+
+
+def stray_files(directory, manifest):
+    # detail page files (and leftover .tmp files) the manifest does not list
+    listed = {entry['file'] for entry in manifest['pages'].values()}
+    for subdirectory in DETAILS:
+        try:
+            names = os.listdir(os.path.join(directory, subdirectory))
+        except FileNotFoundError:
+            continue
+        for name in sorted(names):
+            filename = subdirectory + '/' + name
+            if filename.endswith(('.html', '.tmp')) and \
+                    filename not in listed:
+                yield filename
+
+
+def init_worker(import_name):
+    # a forked worker finds the app already imported, a spawned one
+    # imports it
+    global worker_app
+    worker_app = import_module(import_name).app
+
+
+def render_pages(directory, paths):
+    """Render paths through the app, in a worker; (path, entry) pairs."""
+    rendered = []
+    client = worker_app.test_client()
+    for path in paths:
+        response = client.get(path)
+        if response.status_code != 200:
+            rendered.append((path, None))
+            continue
+        data = response.get_data()
+        write_atomically(os.path.join(directory, file_for(path)), data)
+        rendered.append((path, {
+            "file": file_for(path),
+            "bytes": len(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+            "rendered_at": datetime.utcnow().isoformat() + 'Z',
+        }))
+    return rendered
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def live_pages():
+    return {f'/{kind}s/{entity_id}' for kind, entity_id in db.session.execute(
+        union_all(select(literal('venue'), Venue.id).
+                  where(Venue.deleted_at.is_(None)),
+                  select(literal('artist'), Artist.id).
+                  where(Artist.deleted_at.is_(None))))}
+
+
+def changed_pages(since, shows_since, now):
+    # entities stamped since the last run, and both sides of every show
+    # that started in between
+    pages = set()
+    for kind, model in (('venue', Venue), ('artist', Artist)):
+        pages.update(f'/{kind}s/{entity_id}' for entity_id in
+                     db.session.execute(
+                         select(model.id).where(
+                             model.deleted_at.is_(None),
+                             model.updated_at > since)).scalars())
+    for venue_id, artist_id in db.session.execute(
+            select(Show.venue_id, Show.artist_id).distinct().
+            where(Show.start_time > shows_since, Show.start_time <= now)):
+        pages.add(f'/venues/{venue_id}')
+        pages.add(f'/artists/{artist_id}')
+    return pages
+
+
+def take_snapshot(directory, workers, full=False, chunk_size=50):
+    """Render the changed pages; returns (rendered, removed) counts."""
+    manifest = read_manifest(directory)
+    started = datetime.utcnow()  # like updated_at
+    now = datetime.now()  # like start_time
+    live = live_pages()
+    if manifest is None or full:
+        manifest = {"pages": manifest['pages'] if manifest else {}}
+        paths = sorted(live)
+    else:
+        paths = sorted(changed_pages(
+            datetime.fromisoformat(manifest['updated_since']) - OVERLAP,
+            datetime.fromisoformat(manifest['shows_until']), now) & live)
+    removed = [path for path in manifest['pages']
+               if path not in LISTINGS and path not in live]
+    if paths or removed or not all(path in manifest['pages']
+                                   for path in LISTINGS):
+        paths = LISTINGS + paths
+
+    # no connection may be shared with the forked workers
+    db.session.remove()
+    db.engine.dispose()
+    chunks = [paths[start:start + chunk_size]
+              for start in range(0, len(paths), chunk_size)]
+    with ProcessPoolExecutor(workers, initializer=init_worker,
+                             initargs=(current_app.import_name,)) as pool:
+        for rendered in pool.map(render_pages, [directory] * len(chunks),
+                                 chunks):
+            for path, entry in rendered:
+                if entry is None:
+                    # no longer renders: its old file must not be served
+                    manifest['pages'].pop(path, None)
+                    removed.append(path)
+                else:
+                    manifest['pages'][path] = entry
+
+    for path in removed:
+        manifest['pages'].pop(path, None)
+        remove_file(directory, file_for(path))
+    for filename in stray_files(directory, manifest):
+        remove_file(directory, filename)
+        removed.append(filename)
+    manifest.update({
+        "generated_at": datetime.utcnow().isoformat() + 'Z',
+        "updated_since": started.isoformat(),
+        "shows_until": now.isoformat(),
+    })
+    write_atomically(os.path.join(directory, MANIFEST),
+                     json.dumps(manifest, indent=1, sort_keys=True).encode())
+    return len(paths), len(removed)
+
+
+@click.command('snapshot')
+@click.option('--to', 'directory', default=None,
+              help='Output directory (default: SNAPSHOT_DIR).')
+@click.option('--workers', default=None, type=int,
+              help='Render processes (default: one per CPU).')
+@click.option('--full', is_flag=True,
+              help='Render every page, not only the changed ones.')
+@with_appcontext
+def snapshot_command(directory, workers, full):
+    """Render the public pages to static HTML files."""
+    directory = directory or current_app.config['SNAPSHOT_DIR']
+    rendered, removed = take_snapshot(directory, workers or os.cpu_count(),
+                                      full)
+    click.echo(f'Rendered {rendered} pages and removed {removed} in '
+               f'{directory}')
@@ -2,3 +2,34 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// typeahead for the navbar search boxes, backed by /autocomplete
+(function () {
+  var inputs = document.querySelectorAll('form.search input[name="search_term"]');
+  Array.prototype.forEach.call(inputs, function (input) {
+    var type = input.form.getAttribute('action').indexOf('/artists') === 0 ? 'artist' : 'venue';
+    var list = document.createElement('datalist');
+    list.id = 'autocomplete-' + type;
+    input.setAttribute('list', list.id);
+    input.setAttribute('autocomplete', 'off');
+    input.parentNode.appendChild(list);
+    var pending = null;
+    input.addEventListener('input', function () {
+      var query = input.value;
+      clearTimeout(pending);
+      if (!query) { list.innerHTML = ''; return; }
+      pending = setTimeout(function () {
+        fetch('/autocomplete?type=' + type + '&q=' + encodeURIComponent(query))
+          .then(function (response) { return response.json(); })
+          .then(function (data) {
+            list.innerHTML = '';
+            data.results.forEach(function (result) {
+              var option = document.createElement('option');
+              option.value = result.name;
+              list.appendChild(option);
+            });
+          });
+      }, 100);
+    });
+  });
+})();
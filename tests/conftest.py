@@ -0,0 +1,159 @@
+import json
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Mapper
+
+import app as fyyur
+from activity import feed
+from cache import cache
+from matchmaking import rebuild_matches
+from models import Artist, Show, Venue, db
+from read_models import insert_show_cards
+from recommendations import rebuild_similar_artists
+from rollups import rebuild_rollups
+
+# ----------------------------------------------------------------------------#
+# Fixtures.
+# ----------------------------------------------------------------------------#
+
+# Every page is measured against the same data at two sizes. A page whose
+# statement or hydrated row count differs between them does work per row
+# (N+1).
+
+SIZES = {
+    'small': {"venues": 4, "artists": 4, "shows": 8, "cities": 2},
+    'large': {"venues": 40, "artists": 40, "shows": 200, "cities": 12},
+}
+STATES = ['CA', 'NY', 'TX']
+
+
+def seed(venues, artists, shows, cities):
+    genres = json.dumps(['Jazz', 'Folk'])
+    for number in range(venues):
+        city, state = f'City {number % cities}', STATES[number % cities % 3]
+        db.session.add(Venue(
+            name=f'Venue {number}', city=city, state=state,
+            address=f'{number} Main St', phone='123-456-7890',
+            genres=genres, genre_mask=3, image_link='http://x.com/v.png',
+            seeking_talent=number % 2 == 0))
+    for number in range(artists):
+        city, state = f'City {number % cities}', STATES[number % cities % 3]
+        db.session.add(Artist(
+            name=f'Artist {number}', city=city, state=state,
+            phone='123-456-7890', genres=genres, genre_mask=3,
+            image_link='http://x.com/a.png', seeking_venue=number % 2 == 0))
+    db.session.flush()
+    now = datetime.now().replace(microsecond=0)
+    # half past, half upcoming; every artist plays several venues and every
+    # venue hosts several artists, venue 1 and artist 1 included
+    db.session.add_all(Show(
+        venue_id=(number + number // artists) % venues + 1,
+        artist_id=number % artists + 1,
+        start_time=now + timedelta(days=number - shows // 2, hours=1))
+        for number in range(shows))
+    db.session.flush()
+    insert_show_cards()
+    rebuild_rollups()
+    rebuild_matches()
+    rebuild_similar_artists()
+    db.session.commit()
+
+
+@pytest.fixture(scope='session')
+def app():
+    fyyur.app.config.update(
+        SQLALCHEMY_DATABASE_URI='sqlite://', TESTING=True,
+        WTF_CSRF_ENABLED=False, RATELIMIT_ENABLED=False)
+    with fyyur.app.app_context():
+        db.create_all()
+        # runs the before_first_request loaders now, not in a measured call
+        fyyur.app.test_client().get('/')
+        yield fyyur.app
+
+
+NAMESPACES = ['fragments', 'facets', 'search', 'archive']  # app cache
+
+
+def reseed(size):
+    # a fresh database, and in-memory state that matches it
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    seed(**SIZES[size])
+    fyyur.load_name_index()
+    feed.load()
+    cache.invalidate(*NAMESPACES)
+    db.session.remove()
+
+
+@pytest.fixture(params=list(SIZES))
+def seeded(app, request):
+    """The app over a fresh database of the given size."""
+    reseed(request.param)
+    return request.param
+
+
+@pytest.fixture
+def database(app):
+    """The app over a fresh database of the small size, for tests that
+    write to it."""
+    reseed('small')
+    yield db
+    db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+class QueryCount:
+    def __init__(self):
+        self.statements = []
+        self.hydrated = 0  # ORM instances loaded
+
+    def __repr__(self):
+        return (f'<{len(self.statements)} statements, '
+                f'{self.hydrated} rows hydrated>')
+
+
+@contextmanager
+def count_queries():
+    counted = QueryCount()
+
+    def statement(conn, cursor, text, parameters, context, executemany):
+        counted.statements.append(text)
+
+    def load(target, context):
+        counted.hydrated += 1
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', statement)
+    event.listen(Mapper, 'load', load)
+    try:
+        yield counted
+    finally:
+        event.remove(engine, 'before_cursor_execute', statement)
+        event.remove(Mapper, 'load', load)
+
+
+@pytest.fixture
+def query_budget(client):
+    """Request a page and count what it cost.
+
+    The app cache is emptied first so cached fragments, facet counts and
+    search results do not hide queries; the session is reset so nothing
+    comes from the identity map.
+    """
+    def measure(method, path, status=200, **kwargs):
+        cache.invalidate(*NAMESPACES)
+        db.session.remove()
+        with count_queries() as counted:
+            response = client.open(path, method=method, **kwargs)
+            response.get_data()  # streamed pages query while iterated
+        assert response.status_code == status, (path, response.status_code)
+        return counted
+    return measure
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from activity import feed
+from models import Artist, Venue, touch
+
+# ----------------------------------------------------------------------------#
+# Home page feed.
+# ----------------------------------------------------------------------------#
+
+
+def listed():
+    return [(entry['type'], entry['id']) for entry in feed.snapshot()[0]]
+
+
+def test_listed_by_creation_not_by_edits(database):
+    listed_at = datetime(2030, 1, 1)
+    for number in range(1, 5):
+        for model, offset in ((Venue, 0), (Artist, 30)):
+            database.session.execute(
+                model.__table__.update().where(model.id == number).values(
+                    created_at=listed_at + timedelta(minutes=number,
+                                                     seconds=offset)))
+    # a booking or an edit stamps updated_at on the oldest listings
+    touch(Venue, Venue.id == 1)
+    touch(Artist, Artist.id == 1)
+    database.session.commit()
+    feed.load()
+    assert listed() == [('artist', 4), ('venue', 4), ('artist', 3),
+                        ('venue', 3), ('artist', 2), ('venue', 2),
+                        ('artist', 1), ('venue', 1)]
+
+
+def test_new_listings_and_deletions(database, client):
+    client.post('/artists/create', data={
+        "name": 'Newcomer', "city": 'Oakland', "state": 'CA',
+        "phone": '123-456-7890', "genres": ['Jazz'],
+        "facebook_link": 'https://www.facebook.com/newcomer',
+        "image_link": 'https://example.com/newcomer.png'})
+    artist_id = Artist.query.with_entities(Artist.id). \
+        filter_by(name='Newcomer').scalar()
+    assert listed()[0] == ('artist', artist_id)
+    assert 'Newcomer' in client.get('/').get_data(as_text=True)
+
+    client.delete(f'/artists/{artist_id}')
+    assert ('artist', artist_id) not in listed()
+    feed.load()
+    assert ('artist', artist_id) not in listed()
@@ -0,0 +1,56 @@
+from models import Venue
+from search_index import PrefixIndex, names
+
+# ----------------------------------------------------------------------------#
+# Autocomplete.
+# ----------------------------------------------------------------------------#
+
+
+def found(index, query, **kwargs):
+    return [(result['type'], result['id'])
+            for result in index.search(query, **kwargs)]
+
+
+def test_prefix_index():
+    index = PrefixIndex()
+    index.load([('venue', 1, 'The Musical Hop'), ('artist', 1, 'Hop Along'),
+                ('artist', 2, 'Guns N Petals')])
+    # any word starts a match, ignoring case and extra spaces; shorter
+    # keys sort first
+    assert found(index, 'hop') == [('venue', 1), ('artist', 1)]
+    assert found(index, '  MUSICAL   h') == [('venue', 1)]
+    assert found(index, 'hop', kind='artist') == [('artist', 1)]
+    assert found(index, 'hop', limit=1) == [('venue', 1)]
+    assert found(index, '') == [] and found(index, 'jazz') == []
+
+    index.add('artist', 1, 'Along Came Jazz')  # an edit replaces the keys
+    assert found(index, 'hop') == [('venue', 1)]
+    assert found(index, 'jazz') == [('artist', 1)]
+    index.remove('venue', 1)
+    assert found(index, 'hop') == []
+
+
+def test_autocomplete_route(database, client):
+    data = client.get('/autocomplete?q=artist 1&type=artist').get_json()
+    assert data['query'] == 'artist 1'
+    assert data['results'] == [{"type": 'artist', "id": 2,
+                                "name": 'Artist 1', "url": '/artists/2'}]
+    assert client.get('/autocomplete').get_json()['results'] == []
+
+    # deletions reach the index without a reload
+    client.delete('/artists/2')
+    assert client.get('/autocomplete?q=artist 1').get_json()['results'] \
+        == []
+
+
+def test_stale_index_is_reloaded(database, client, monkeypatch):
+    # written by another worker: this worker's index does not know it yet
+    venue = Venue.query.get(1)
+    venue.name = 'Hop Along Hall'
+    database.session.commit()
+    assert client.get('/autocomplete?q=hop').get_json()['results'] == []
+
+    monkeypatch.setattr(names, 'refresh_after', -1)
+    assert client.get('/autocomplete?q=hop').get_json()['results'] == [
+        {"type": 'venue', "id": 1, "name": 'Hop Along Hall',
+         "url": '/venues/1'}]
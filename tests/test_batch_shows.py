@@ -0,0 +1,65 @@
+from datetime import datetime
+
+import pytest
+
+from models import ChangeLog, Show, ShowCard
+
+# ----------------------------------------------------------------------------#
+# Batch show creation.
+# ----------------------------------------------------------------------------#
+
+TOUR = {"artist_id": 1, "shows": [
+    {"venue_id": 1, "start_time": '2031-05-01 20:00:00'},
+    {"venue_id": 2, "start_time": '2031-05-02 20:00:00'},
+    {"venue_id": 3, "start_time": '2031-05-03 20:00:00'},
+]}
+
+
+def test_books_every_show(database, client):
+    # a show of the same artist without a card must not be taken for one
+    # of the new ones
+    database.session.add(Show(artist_id=1, venue_id=4,
+                              start_time=datetime(2031, 1, 1, 20)))
+    database.session.commit()
+    shows_before = Show.query.count()
+    response = client.post('/shows/batch', json=TOUR)
+    assert response.status_code == 201
+    assert response.get_json() == {"success": True, "created": 3}
+
+    new_ids = [show.id for show in Show.query.filter(
+        Show.start_time >= datetime(2031, 5, 1)).order_by(Show.start_time)]
+    assert Show.query.count() == shows_before + 3
+    assert sorted(card.show_id for card in ShowCard.query.filter(
+        ShowCard.artist_id == 1, ShowCard.start_time >=
+        datetime(2031, 1, 1))) == new_ids
+    assert sorted(entry.entity_id for entry in ChangeLog.query.filter_by(
+        kind='show', action='created')) == new_ids
+
+
+def test_writes_nothing_when_a_row_is_invalid(database, client):
+    shows_before = Show.query.count()
+    tour = {"artist_id": 1, "shows": TOUR['shows'] + [
+        {"venue_id": 999, "start_time": '2031-05-04 20:00:00'},
+        {"venue_id": 2, "start_time": 'tomorrow-ish'},
+    ]}
+    response = client.post('/shows/batch', json=tour)
+    assert response.status_code == 400
+    errors = response.get_json()['errors']
+    assert [error['row'] for error in errors] == [4]
+    assert 'start_time' in errors[0]['errors']
+    assert Show.query.count() == shows_before
+
+    # the rows are valid on their own, the venue does not exist
+    tour['shows'].pop()
+    response = client.post('/shows/batch', json=tour)
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [
+        {"row": 3, "errors": {"venue_id": ['Venue does not exist']}}]
+    assert Show.query.count() == shows_before
+
+
+@pytest.mark.parametrize('body', ['foo', 5, {"shows": 'foo'}])
+def test_rejects_bodies_of_other_shapes(database, client, body):
+    response = client.post('/shows/batch', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
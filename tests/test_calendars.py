@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from calendars import escape_text, fold
+from models import Show
+
+# ----------------------------------------------------------------------------#
+# iCalendar feeds.
+# ----------------------------------------------------------------------------#
+
+
+def unfold(text):
+    return text.replace('\r\n ', '')
+
+
+def test_fold_and_escape():
+    line = 'SUMMARY:' + 'Café Ümlaut ' * 12
+    folded = fold(line)
+    assert folded.endswith('\r\n')
+    assert all(len(part.encode()) <= 75
+               for part in folded[:-2].split('\r\n'))
+    assert unfold(folded) == line + '\r\n'
+    assert fold('END:VEVENT') == 'END:VEVENT\r\n'
+    assert escape_text('a,b;c\\d\ne') == 'a\\,b\\;c\\\\d\\ne'
+
+
+def test_venue_feed(database, client):
+    response = client.get('/venues/1/calendar.ics')
+    assert response.mimetype == 'text/calendar'
+    assert response.headers['Content-Disposition'] == \
+        'inline; filename="venue-1.ics"'
+    text = unfold(response.get_data(as_text=True))
+    lines = text.split('\r\n')
+    assert lines[0] == 'BEGIN:VCALENDAR' and lines[-2] == 'END:VCALENDAR'
+    assert 'X-WR-CALNAME:Venue 0' in lines
+
+    upcoming = Show.query.with_entities(Show.id).filter(
+        Show.venue_id == 1, Show.start_time >= datetime.now()). \
+        order_by(Show.start_time, Show.id).all()
+    assert upcoming
+    assert [line for line in lines if line.startswith('UID:')] == \
+        [f'UID:show-{show.id}@fyyur' for show in upcoming]
+    assert 'URL:http://localhost/venues/1' in lines
+    assert 'LOCATION:0 Main St\\, City 0\\, CA' in lines
+
+
+def test_repeat_polls_and_missing_feeds(database, client):
+    etag = client.get('/artists/1/calendar.ics').headers['ETag']
+    assert client.get('/artists/1/calendar.ics', headers={
+        'If-None-Match': etag}).status_code == 304
+    client.post('/shows/create', data={
+        "artist_id": '1', "venue_id": '2',
+        "start_time": '2031-01-01 20:00:00'})
+    response = client.get('/artists/1/calendar.ics', headers={
+        'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'DTSTART:20310101T200000' in response.get_data(as_text=True)
+    assert client.get('/artists/999/calendar.ics').status_code == 404
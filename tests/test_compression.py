@@ -0,0 +1,59 @@
+import gzip
+
+import pytest
+
+# ----------------------------------------------------------------------------#
+# Response compression.
+# ----------------------------------------------------------------------------#
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+def test_pages_are_gzipped(database, client):
+    plain = client.get('/venues')
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+
+    response = client.get('/venues', headers=GZIP)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert int(response.headers['Content-Length']) < len(plain.data)
+    assert gzip.decompress(response.data) == plain.data
+
+    refused = client.get('/venues', headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in refused.headers
+
+
+def test_small_responses_are_not_compressed(database, client):
+    response = client.get('/autocomplete?q=nothing', headers=GZIP)
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json()['results'] == []
+
+
+def test_streams_are_gzipped(database, client):
+    plain = client.get('/venues/1/calendar.ics').data
+    response = client.get('/venues/1/calendar.ics', headers=GZIP)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.data) == plain
+
+
+def test_gzip_etag(database, client):
+    etag = client.get('/venues/1').headers['ETag']
+    gzip_etag = client.get('/venues/1', headers=GZIP).headers['ETag']
+    assert gzip_etag == etag[:-1] + '-gzip"'
+    # either tag validates the page
+    for tag in (etag, gzip_etag):
+        assert client.get('/venues/1', headers=dict(
+            GZIP, **{'If-None-Match': tag})).status_code == 304
+
+
+def test_brotli_is_preferred(database, client):
+    brotli = pytest.importorskip('brotli')
+    plain = client.get('/venues').data
+    response = client.get('/venues', headers={
+        'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.data) == plain
+    response = client.get('/venues', headers={
+        'Accept-Encoding': 'gzip, br;q=0.5'})
+    assert response.headers['Content-Encoding'] == 'gzip'
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from models import Artist, Venue
+
+# ----------------------------------------------------------------------------#
+# Conditional GET.
+# ----------------------------------------------------------------------------#
+
+
+def test_304_until_the_row_changes(database, client):
+    response = client.get('/venues/1')
+    etag, last_modified = response.headers['ETag'], \
+        response.headers['Last-Modified']
+    assert response.status_code == 200
+
+    response = client.get('/venues/1', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.headers['ETag'] == etag
+    assert client.get('/venues/1', headers={
+        'If-Modified-Since': last_modified}).status_code == 304
+
+    # a show booked at the venue changes the page
+    client.post('/shows/batch', json={"artist_id": 2, "shows": [
+        {"venue_id": 1, "start_time": '2031-01-01 20:00:00'}]})
+    response = client.get('/venues/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_artist_edit_changes_the_etag(database, client):
+    etag = client.get('/artists/1').headers['ETag']
+    database.session.execute(
+        Artist.__table__.update().where(Artist.id == 1).
+        values(version=Artist.version + 1))
+    database.session.commit()
+    assert client.get('/artists/1', headers={'If-None-Match': etag}). \
+        status_code == 200
+
+
+def test_missing_pages_are_404(database, client):
+    assert client.get('/venues/999', headers={'If-None-Match': '"x"'}). \
+        status_code == 404
+    client.delete('/artists/1?soft=true')
+    assert client.get('/artists/1').status_code == 404
+
+
+def test_updated_at_defaults_to_utc(database):
+    # the server default matches the datetime.utcnow() the app writes
+    database.session.execute(insert(Venue).values(
+        name='Default', city='Oakland', state='CA', address='1 Main St',
+        genres='["Jazz"]', genre_mask=0))
+    updated_at = database.session.execute(
+        select(Venue.updated_at).where(Venue.name == 'Default')).scalar()
+    assert abs(updated_at - datetime.utcnow()) < timedelta(minutes=1)
+    assert "DEFAULT timezone('utc', now())" in str(
+        CreateTable(Venue.__table__).compile(dialect=postgresql.dialect()))
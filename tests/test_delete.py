@@ -0,0 +1,79 @@
+from datetime import datetime
+
+from models import Artist, ChangeLog, Show, ShowCard, Venue
+from read_models import insert_show_cards
+
+# ----------------------------------------------------------------------------#
+# Deletes.
+# ----------------------------------------------------------------------------#
+
+
+def counted_shows(client):
+    stats = client.get('/stats?format=json&months=60').get_json()
+    return sum(stats['shows'].values())
+
+
+def deletions(kind, entity_id):
+    return ChangeLog.query.filter_by(kind=kind, entity_id=entity_id,
+                                     action='deleted').count()
+
+
+def test_soft_delete_hides_the_artist(database, client):
+    shows = Show.query.filter_by(artist_id=1).count()
+    total = counted_shows(client)
+    response = client.delete('/artists/1?soft=true')
+    assert response.get_json() == {"success": True}
+
+    assert Artist.query.get(1).deleted_at is not None
+    assert Show.query.filter_by(artist_id=1).count() == shows  # history kept
+    assert ShowCard.query.filter_by(artist_id=1).count() == 0
+    assert counted_shows(client) == total - shows
+    assert deletions('artist', 1) == 1
+    assert client.get('/artists/1').status_code == 404
+    assert 1 not in [result['id'] for result in client.get(
+        '/autocomplete?q=artist&type=artist').get_json()['results']]
+
+
+def test_hard_delete_after_soft_delete_counts_once(database, client):
+    shows = Show.query.filter_by(venue_id=1).count()
+    total = counted_shows(client)
+    client.delete('/venues/1?soft=true')
+    response = client.post('/venues/1/delete')
+    assert response.status_code == 302
+    assert Venue.query.get(1) is None
+    assert Show.query.filter_by(venue_id=1).count() == 0
+    assert counted_shows(client) == total - shows
+
+
+def test_deleting_nothing_writes_nothing(database, client):
+    client.delete('/artists/2?soft=true')
+    venue = Venue.query.get(2)
+    updated_at, version = venue.updated_at, venue.version
+    database.session.remove()
+
+    assert client.delete('/artists/2?soft=true').status_code == 404
+    assert client.delete('/artists/999').status_code == 404
+    assert deletions('artist', 2) == 1
+    assert deletions('artist', 999) == 0
+    venue = Venue.query.get(2)
+    assert (venue.updated_at, venue.version) == (updated_at, version)
+
+
+def test_soft_deleted_rows_cannot_be_booked(database, client):
+    client.delete('/venues/1?soft=true')
+    shows = Show.query.count()
+    total = counted_shows(client)
+    client.post('/shows/create', data={
+        "artist_id": '2', "venue_id": '1',
+        "start_time": '2031-01-01 20:00:00'})
+    assert Show.query.count() == shows
+    assert ShowCard.query.filter_by(venue_id=1).count() == 0
+    assert counted_shows(client) == total
+
+    # a card is never built for a show of a soft-deleted artist either
+    client.delete('/artists/2?soft=true')
+    database.session.add(Show(venue_id=2, artist_id=2,
+                              start_time=datetime(2031, 1, 1, 20)))
+    database.session.flush()
+    insert_show_cards()
+    assert ShowCard.query.filter_by(artist_id=2).count() == 0
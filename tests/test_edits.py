@@ -0,0 +1,52 @@
+from models import Venue, update_versioned
+
+# ----------------------------------------------------------------------------#
+# Versioned edits.
+# ----------------------------------------------------------------------------#
+
+VENUE = {"name": 'The Blue Door', "city": 'Oakland', "state": 'CA',
+         "address": '1 Main St', "phone": '123-456-7890',
+         "genres": ['Jazz', 'Blues'],
+         "image_link": 'https://example.com/bluedoor.png'}
+
+
+def venue(venue_id):
+    return Venue.query.with_entities(
+        Venue.name, Venue.version). \
+        filter(Venue.id == venue_id).one()
+
+
+def test_edit_bumps_the_version(database, client):
+    assert 'value="1"' in client.get('/venues/1/edit').get_data(as_text=True)
+    response = client.post('/venues/1/edit', data=dict(VENUE, version='1'))
+    assert response.headers['Location'].endswith('/venues/1')
+    assert venue(1).name == 'The Blue Door' and venue(1).version == 2
+    assert 'The Blue Door' in client.get('/venues/1').get_data(as_text=True)
+
+
+def test_stale_version_is_a_conflict(database, client):
+    # two forms rendered at version 1; the second submit loses
+    client.post('/venues/1/edit', data=dict(VENUE, version='1'))
+    response = client.post('/venues/1/edit',
+                           data=dict(VENUE, name='Lost Update', version='1'),
+                           follow_redirects=True)
+    assert 'was changed or removed by someone else' in \
+        response.get_data(as_text=True)
+    assert venue(1).name == 'The Blue Door' and venue(1).version == 2
+
+
+def test_missing_version_is_a_validation_error(database, client):
+    # rejected by the form, not reported as someone else's edit
+    for data in (VENUE, dict(VENUE, version='abc')):
+        page = client.post('/venues/1/edit', data=data,
+                           follow_redirects=True).get_data(as_text=True)
+        assert '&#39;version ' in page and 'someone else' not in page
+    assert venue(1).name == 'Venue 0' and venue(1).version == 1
+
+
+def test_update_versioned(database):
+    assert update_versioned(Venue, 1, 1, {"name": 'Renamed'}) == 2
+    assert update_versioned(Venue, 1, 1, {"name": 'Lost'}) is None
+    assert update_versioned(Venue, 999, 1, {"name": 'Missing'}) is None
+    database.session.commit()
+    assert venue(1).name == 'Renamed'
@@ -0,0 +1,57 @@
+from changes import latest_cursor, record
+
+# ----------------------------------------------------------------------------#
+# Change feed.
+# ----------------------------------------------------------------------------#
+
+
+def changes(database, count):
+    for number in range(count):
+        record('artist', number + 1, 'updated')
+    database.session.commit()
+
+
+def test_json_pages(database, client):
+    changes(database, 3)
+    page = client.get('/events?since=0&limit=2').get_json()
+    assert [event['cursor'] for event in page['events']] == [1, 2]
+    assert page['events'][0] == {
+        "cursor": 1, "type": 'artist.updated', "id": 1, "url": '/artists/1',
+        "changed_at": page['events'][0]['changed_at']}
+    assert page['more'] and page['cursor'] == 2
+
+    page = client.get(f'/events?since={page["cursor"]}&limit=2').get_json()
+    assert [event['cursor'] for event in page['events']] == [3]
+    assert not page['more'] and page['cursor'] == 3
+    # nothing new: the cursor stays put
+    assert client.get('/events?since=3').get_json() == {
+        "events": [], "cursor": 3, "more": False}
+
+
+def test_limit_is_clamped(database, client):
+    changes(database, 2)
+    for limit in (0, -5):
+        page = client.get(f'/events?since=0&limit={limit}').get_json()
+        assert len(page['events']) == 1 and page['more']
+
+
+def test_stream_resumes_after_last_event_id(database, client, app,
+                                            monkeypatch):
+    monkeypatch.setitem(app.config, 'EVENTS_MAX_STREAM', 0.05)
+    monkeypatch.setitem(app.config, 'EVENTS_POLL_INTERVAL', 0.01)
+    changes(database, 3)
+    response = client.get('/events', headers={
+        'Accept': 'text/event-stream', 'Last-Event-ID': '1'})
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    body = response.get_data(as_text=True)
+    assert body.startswith('retry: 3000\n\n')
+    assert [line for line in body.splitlines()
+            if line.startswith('id: ')] == ['id: 2', 'id: 3']
+    assert 'event: artist.updated' in body
+
+    # without a cursor the stream starts from now on
+    assert latest_cursor() == 3
+    body = client.get('/events', headers={
+        'Accept': 'text/event-stream'}).get_data(as_text=True)
+    assert 'id: ' not in body
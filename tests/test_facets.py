@@ -0,0 +1,69 @@
+from enums import Genre
+from models import Venue
+
+# ----------------------------------------------------------------------------#
+# Faceted browse.
+# ----------------------------------------------------------------------------#
+
+# the small seed: venues 1 and 3 in CA seeking talent, 2 and 4 in NY
+
+VENUE = {"name": 'The Blue Door', "city": 'Oakland', "state": 'CA',
+         "address": '1 Main St', "phone": '123-456-7890', "genres": ['Blues'],
+         "image_link": 'https://example.com/bluedoor.png'}
+
+
+def browse(client, query=''):
+    return client.get('/venues/browse?format=json&' + query).get_json()
+
+
+def genres(database, masks):
+    for venue_id, names in masks.items():
+        database.session.execute(
+            Venue.__table__.update().where(Venue.id == venue_id).
+            values(genre_mask=Genre.mask(names)))
+    database.session.commit()
+
+
+def test_counts_and_filters(database, client):
+    genres(database, {1: ['Jazz'], 2: ['Jazz'], 3: ['Jazz', 'Blues'],
+                      4: ['Folk']})
+    data = browse(client)
+    assert data['facets']['total'] == 4
+    assert data['facets']['state'] == {"CA": 2, "NY": 2}
+    assert data['facets']['seeking'] == {"true": 2, "false": 2}
+    assert {name: count for name, count in data['facets']['genre'].items()
+            if count} == {"Jazz": 3, "Blues": 1, "Folk": 1}
+
+    # counts are for the filtered set
+    data = browse(client, 'state=CA')
+    assert [row['id'] for row in data['data']] == [1, 3]
+    assert data['facets']['total'] == 2
+    assert data['facets']['genre']['Blues'] == 1
+    assert data['facets']['genre']['Folk'] == 0
+
+    assert browse(client, 'genre=Blues&genre=Folk')['facets']['total'] == 2
+    data = browse(client, 'genre=Jazz&genre=Blues&match=all')
+    assert [row['id'] for row in data['data']] == [3]
+    assert browse(client, 'seeking=false&genre=Jazz')['facets']['total'] \
+        == 1
+    # unknown values are ignored, not matched
+    data = browse(client, 'state=XX&genre=Polka')
+    assert data['filters']['state'] is None and data['filters']['genre'] \
+        == []
+    assert data['facets']['total'] == 4
+
+
+def test_counts_follow_writes(database, client):
+    genres(database, {venue_id: ['Jazz'] for venue_id in range(1, 5)})
+    assert browse(client)['facets']['genre']['Blues'] == 0
+    client.post('/venues/create', data=VENUE)
+    data = browse(client)  # the cached counts were dropped
+    assert data['facets']['total'] == 5
+    assert data['facets']['genre']['Blues'] == 1
+    client.delete('/venues/1')
+    assert browse(client)['facets']['total'] == 4
+
+
+def test_browse_page(database, client):
+    page = client.get('/venues/browse?state=CA').get_data(as_text=True)
+    assert 'Venue 0' in page and 'Venue 1' not in page
@@ -0,0 +1,48 @@
+import cache as cache_module
+from cache import Cache, cache
+
+# ----------------------------------------------------------------------------#
+# Cache and template fragments.
+# ----------------------------------------------------------------------------#
+
+VENUE = {"name": 'The Blue Door', "city": 'City 0', "state": 'CA',
+         "address": '1 Main St', "phone": '123-456-7890', "genres": ['Jazz'],
+         "image_link": 'https://example.com/bluedoor.png', "version": '1'}
+
+
+def test_lru_ttl_and_invalidation(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now[0])
+    store = Cache(max_entries=2, default_ttl=10)
+    store.set('a', 1, 'one')
+    store.set('a', 2, 'two')
+    assert store.get('a', 1) == 'one'  # now the most recently used
+    store.set('b', 3, 'three')
+    assert store.get('a', 2) is None and store.get('a', 1) == 'one'
+
+    store.set('b', 4, 'four', ttl=60)
+    now[0] += 30
+    assert store.get('b', 3) is None and store.get('b', 4) == 'four'
+
+    store.invalidate('b')
+    assert store.get('b', 4) is None
+    assert store.cached('b', 4, lambda: 'recomputed') == 'recomputed'
+    assert (store.hits, store.misses) == (3, 4)
+
+
+def test_fragments_render_once_per_key(app):
+    cache.invalidate('fragments')
+    template = app.jinja_env.from_string(
+        "{% cache ('tile', item_id), 60 %}{{ name }}{% endcache %}")
+    assert template.render(item_id=1, name='first') == 'first'
+    assert template.render(item_id=1, name='second') == 'first'
+    assert template.render(item_id=2, name='second') == 'second'
+    cache.invalidate('fragments')
+    assert template.render(item_id=1, name='third') == 'third'
+
+
+def test_edits_change_the_key(database, client):
+    assert 'Venue 0' in client.get('/venues').get_data(as_text=True)
+    client.post('/venues/1/edit', data=VENUE)
+    page = client.get('/venues').get_data(as_text=True)
+    assert 'The Blue Door' in page and 'Venue 0' not in page
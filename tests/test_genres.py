@@ -0,0 +1,53 @@
+import importlib.util
+import os
+
+from enums import Genre
+from facets import genre_match
+from models import Artist
+
+# ----------------------------------------------------------------------------#
+# Genre masks.
+# ----------------------------------------------------------------------------#
+
+ARTIST = {"name": 'The Newcomers', "city": 'Oakland', "state": 'CA',
+          "phone": '123-456-7890', "genres": ['Jazz', 'Soul'],
+          "image_link": 'https://example.com/newcomers.png'}
+
+
+def test_mask_round_trip():
+    assert Genre.mask([]) == 0
+    assert Genre.mask(['Alternative', 'Blues']) == 3
+    assert Genre.from_mask(Genre.mask(['Soul', 'Jazz', 'Nope'])) == \
+        ['Jazz', 'Soul']
+
+
+def test_migration_bits_match_the_enum():
+    # the backfill froze the member order; the enum must only append
+    path = os.path.join(os.path.dirname(__file__), '..', 'migrations',
+                        'versions', 'e1d5b9a03c28_add_genre_masks.py')
+    spec = importlib.util.spec_from_file_location('genre_masks', path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    assert [genre.name for genre in Genre][:len(migration.GENRES)] == \
+        migration.GENRES
+    assert migration.genre_mask('["Jazz", "Soul"]') == \
+        Genre.mask(['Jazz', 'Soul'])
+    assert migration.genre_mask('not json') == 0
+
+
+def artist_ids(*criteria):
+    return [row.id for row in Artist.query.with_entities(Artist.id).
+            filter(*criteria).order_by(Artist.id)]
+
+
+def test_writes_keep_the_mask(database, client):
+    client.post('/artists/create', data=ARTIST)
+    artist_id = artist_ids(Artist.name == 'The Newcomers')[0]
+    assert artist_ids(genre_match(Artist, ['Soul'])) == [artist_id]
+    assert artist_ids(genre_match(Artist, ['Jazz', 'Soul'], 'all')) == \
+        [artist_id]
+
+    client.post(f'/artists/{artist_id}/edit',
+                data=dict(ARTIST, genres=['Funk'], version='1'))
+    assert artist_ids(genre_match(Artist, ['Soul'])) == []
+    assert artist_ids(genre_match(Artist, ['Funk'])) == [artist_id]
@@ -0,0 +1,63 @@
+from io import BytesIO
+
+import pytest
+
+from images import store
+from models import Artist
+
+# ----------------------------------------------------------------------------#
+# Uploaded images.
+# ----------------------------------------------------------------------------#
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+ARTIST = {"name": 'The Uploaders', "city": 'Oakland', "state": 'CA',
+          "phone": '123-456-7890', "genres": ['Jazz'],
+          "facebook_link": 'https://www.facebook.com/uploaders'}
+
+
+@pytest.fixture
+def image_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, 'directory', str(tmp_path))
+    return tmp_path
+
+
+def create_artist(client, data, filename):
+    form = dict(ARTIST, image_link='',
+                image_file=(BytesIO(data), filename))
+    page = client.post('/artists/create', data=form,
+                       content_type='multipart/form-data')
+    return page.get_data(as_text=True)
+
+
+def new_artist():
+    return Artist.query.with_entities(Artist.image_link). \
+        filter_by(name=ARTIST['name']).first()
+
+
+def test_upload_is_stored_and_served(database, client, image_dir):
+    assert 'successfully listed' in create_artist(client, PNG, 'band.png')
+    link = new_artist().image_link
+    assert link.startswith('/media/') and link.endswith('.png')
+    assert (image_dir / link[len('/media/'):]).read_bytes() == PNG
+
+    response = client.get(link)
+    assert response.status_code == 200 and response.data == PNG
+    assert 'immutable' in response.headers['Cache-Control']
+
+
+def test_upload_is_checked_by_content(database, client, image_dir):
+    page = create_artist(client, b'<html>not an image</html>', 'band.png')
+    assert 'Upload a JPEG, PNG, GIF or WebP image' in page
+    assert new_artist() is None
+    assert not list(image_dir.iterdir())
+
+
+def test_storage_errors_are_reported(database, client, image_dir,
+                                     monkeypatch):
+    def fail(file):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(store, 'save', fail)
+    page = create_artist(client, PNG, 'band.png')
+    assert 'could not be listed' in page
+    assert new_artist() is None
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from listings import VenueItem, artist_items, search, venue_items
+from models import Show, Venue
+
+# ----------------------------------------------------------------------------#
+# List and search rows.
+# ----------------------------------------------------------------------------#
+
+
+def test_venue_items(database, client):
+    client.delete('/venues/2?soft=true')
+    items = venue_items()
+    assert all(type(item) is VenueItem for item in items)
+    assert [item.id for item in items] == [1, 3, 4]  # CA first, then NY
+    upcoming = dict(Show.query.with_entities(
+        Show.venue_id, database.func.count(Show.id)).
+        filter(Show.start_time > datetime.now()).
+        group_by(Show.venue_id).all())
+    assert {item.id: item.num_upcoming_shows for item in items} == \
+        {venue_id: upcoming.get(venue_id, 0) for venue_id in (1, 3, 4)}
+
+
+def test_artist_items_and_search(database, client):
+    client.delete('/artists/4')
+    assert [(item.id, item.name, item.version) for item in artist_items()] \
+        == [(1, 'Artist 0', 1), (2, 'Artist 1', 1), (3, 'Artist 2', 1)]
+    assert [result.id for result in search(Venue, 'ENUE 1')] == [2]
+    assert search(Venue, 'nothing') == []
+
+
+def test_listing_pages(database, client):
+    page = client.get('/venues').get_data(as_text=True)
+    assert page.index('City 0') < page.index('Venue 0') < \
+        page.index('City 1') < page.index('Venue 1')
+    page = client.post('/artists/search', data={"search_term": 'artist 1'}). \
+        get_data(as_text=True)
+    assert 'Artist 1' in page and 'Artist 2' not in page
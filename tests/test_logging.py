@@ -0,0 +1,51 @@
+import json
+import logging
+
+from flask import Flask
+
+from logging_setup import configure_logging, stop_listener
+
+# ----------------------------------------------------------------------------#
+# Logging.
+# ----------------------------------------------------------------------------#
+
+
+def test_errors_are_logged_as_json_lines(tmp_path):
+    app = Flask('logging_test')
+    app.config['LOG_FILE'] = str(tmp_path / 'error.log')
+    listener = configure_logging(app)
+
+    @app.route('/fail')
+    def fail():
+        try:
+            raise ValueError('bad value')
+        except ValueError:
+            app.logger.exception('Could not handle %s', 'the request')
+        return 'handled'
+
+    try:
+        response = app.test_client().get('/fail', headers={
+            'X-Request-ID': 'abc123'})
+        assert response.headers['X-Request-ID'] == 'abc123'
+        app.logger.info('outside a request')
+    finally:
+        stop_listener(listener)  # drains the queue
+        app.logger.handlers.clear()
+    stop_listener(listener)  # twice is fine
+
+    entries = [json.loads(line) for line in
+               (tmp_path / 'error.log').read_text().splitlines()]
+    assert [entry['message'] for entry in entries] == [
+        'Could not handle the request', 'outside a request']
+    error = entries[0]
+    assert (error['level'], error['request_id'], error['method'],
+            error['path']) == ('ERROR', 'abc123', 'GET', '/fail')
+    assert 'ValueError: bad value' in error['exception']
+    assert entries[1]['request_id'] is None
+    assert logging.getLevelName(app.logger.level) == 'INFO'
+
+
+def test_request_ids_are_generated(client):
+    first = client.get('/shows/create').headers['X-Request-ID']
+    second = client.get('/shows/create').headers['X-Request-ID']
+    assert len(first) == 32 and first != second
@@ -0,0 +1,78 @@
+from collections import namedtuple
+
+import pytest
+
+from enums import Genre
+from matchmaking import compute_matches, rebuild_matches
+
+# ----------------------------------------------------------------------------#
+# Matchmaking.
+# ----------------------------------------------------------------------------#
+
+ArtistRow = namedtuple('ArtistRow', ['id', 'genre_mask', 'city', 'state',
+                                     'seeking_venue'])
+VenueRow = namedtuple('VenueRow', ['id', 'genre_mask', 'city', 'state',
+                                   'seeking_talent'])
+ShowRow = namedtuple('ShowRow', ['artist_id', 'venue_id'])
+
+JAZZ = Genre.mask(['Jazz'])
+ROCK = Genre.mask(['RocknRoll'])
+
+ARTISTS = [
+    ArtistRow(1, JAZZ, 'San Francisco', 'CA', True),
+    ArtistRow(2, ROCK, 'San Francisco', 'CA', True),
+    ArtistRow(3, JAZZ, 'New York', 'NY', True),
+    ArtistRow(4, JAZZ, 'San Francisco', 'CA', False),
+]
+VENUES = [
+    VenueRow(1, JAZZ, 'San Francisco', 'CA', True),
+    VenueRow(2, JAZZ, 'New York', 'NY', True),
+    VenueRow(3, ROCK, 'Los Angeles', 'CA', True),
+    VenueRow(4, JAZZ, ' san francisco ', 'CA', False),
+]
+SHOWS = [ShowRow(2, 1)]  # venue 1 booked a rock artist once
+
+
+def scores(matches):
+    return {entity_id: [(match_id, round(score, 4))
+                        for match_id, score in entries]
+            for entity_id, entries in matches.items()}
+
+
+def test_scores_and_ranks():
+    artist_matches, venue_matches = compute_matches(ARTISTS, VENUES, SHOWS)
+    # genre 0.45, same city 0.2 (same state only 0.1), bookings 0.25 times
+    # the cosine with the venue's past bookings, 0.1 / 3 per show played
+    assert scores(artist_matches) == {
+        1: [(1, 0.65), (2, 0.45), (3, 0.1)],
+        2: [(3, 0.55), (1, 0.4833), (2, 0.0)],
+        3: [(2, 0.65), (1, 0.45), (3, 0.0)],
+        4: [(1, 0.65), (2, 0.45), (3, 0.1)],  # venues only seek artists
+    }
+    assert scores(venue_matches) == {
+        1: [(1, 0.65), (2, 0.4833), (3, 0.45)],
+        2: [(3, 0.65), (1, 0.45), (2, 0.0)],
+        3: [(2, 0.55), (1, 0.1), (3, 0.0)],
+        4: [(1, 0.65), (3, 0.45), (2, 0.2)],  # artist 4 seeks no venue
+    }
+
+
+def test_top_k():
+    artist_matches, venue_matches = compute_matches(ARTISTS, VENUES, SHOWS,
+                                                    k=1)
+    assert scores(artist_matches)[2] == [(3, 0.55)]
+    assert scores(venue_matches)[4] == [(1, 0.65)]
+    assert compute_matches(ARTISTS, [], SHOWS) == ({}, {})
+
+
+@pytest.mark.parametrize('kind, entity_id', [('venue', 1), ('artist', 1)])
+def test_matches_page(database, client, kind, entity_id):
+    rebuild_matches()
+    data = client.get(f'/{kind}s/{entity_id}/matches?format=json'). \
+        get_json()
+    assert data['id'] == entity_id
+    assert [match['rank'] for match in data['matches']] == \
+        list(range(1, len(data['matches']) + 1))
+    assert data['matches'] == sorted(data['matches'],
+                                     key=lambda match: -match['score'])
+    assert client.get(f'/{kind}s/999/matches').status_code == 404
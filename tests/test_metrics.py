@@ -0,0 +1,74 @@
+import json
+import subprocess
+
+import pytest
+from sqlalchemy import text
+
+# ----------------------------------------------------------------------------#
+# Metrics.
+# ----------------------------------------------------------------------------#
+
+
+def sample(client, line):
+    # the value of one exposition line, 0 when it is not there yet
+    for row in client.get('/metrics').get_data(as_text=True).splitlines():
+        if row.rsplit(' ', 1)[0] == line:
+            return float(row.rsplit(' ', 1)[1])
+    return 0
+
+
+def test_requests_and_queries_are_counted(database, client):
+    line = 'fyyur_http_requests_total{endpoint="venues",method="GET",' \
+        'status="200"}'
+    before = sample(client, line)
+    client.get('/venues')
+    assert sample(client, line) == before + 1
+    page = client.get('/metrics').get_data(as_text=True)
+    assert 'fyyur_db_queries_total{endpoint="venues"}' in page
+    assert 'fyyur_template_render_seconds_count{template=' \
+        '"pages/venues.html"}' in page
+
+
+def test_unhandled_errors_are_counted(database, client, app, monkeypatch):
+    def fail():
+        raise RuntimeError('boom')
+
+    line = 'fyyur_http_requests_total{endpoint="show_stats",method="GET",' \
+        'status="500"}'
+    before = sample(client, line)
+    monkeypatch.setitem(app.view_functions, 'show_stats', fail)
+    with pytest.raises(RuntimeError):  # TESTING propagates exceptions
+        client.get('/stats')
+    monkeypatch.undo()
+    assert sample(client, line) == before + 1
+
+
+def test_failed_statements_leave_no_timer(database):
+    with database.engine.connect() as connection:
+        with pytest.raises(Exception):
+            connection.execute(text('SELECT * FROM missing'))
+        assert not connection.info['metrics_started']
+        connection.execute(text('SELECT 1'))
+        assert not connection.info['metrics_started']
+
+
+def test_exited_workers_are_retired(database, client, app, tmp_path,
+                                    monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_DIR', str(tmp_path))
+    exited = subprocess.Popen(['true'])
+    exited.wait()
+    dead = tmp_path / f'{exited.pid}.json'
+    dead.write_text(json.dumps({
+        "counters": [['fyyur_db_queries_total', [['endpoint', 'retired']],
+                      7]],
+        "histograms": [],
+        "gauges": [['fyyur_db_pool_checked_out', [], 3]],
+        "pid": exited.pid}))
+    line = 'fyyur_db_queries_total{endpoint="retired"}'
+
+    assert sample(client, line) == 7
+    assert not dead.exists() and (tmp_path / 'retired.json').exists()
+    assert f'pid="{exited.pid}"' not in \
+        client.get('/metrics').get_data(as_text=True)
+    # still counted, and only once
+    assert sample(client, line) == 7
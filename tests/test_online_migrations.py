@@ -0,0 +1,131 @@
+import importlib.util
+import io
+import os
+import sys
+
+import pytest
+import sqlalchemy as sa
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..',
+                                'migrations'))
+import online  # noqa: E402  registers the operations
+
+# ----------------------------------------------------------------------------#
+# Online migrations.
+# ----------------------------------------------------------------------------#
+
+
+@pytest.fixture
+def sqlite_op():
+    engine = sa.create_engine('sqlite://')
+    with engine.connect() as connection:
+        connection.exec_driver_sql(
+            'CREATE TABLE items (id INTEGER PRIMARY KEY, flag INTEGER)')
+        connection.exec_driver_sql(
+            'INSERT INTO items (id, flag) VALUES ' + ', '.join(
+                f'({number}, {1 if number % 5 == 0 else "NULL"})'
+                for number in range(1, 26)))
+        yield Operations(MigrationContext.configure(connection)), connection
+
+
+def postgres_script(run):
+    output = io.StringIO()
+    context = MigrationContext.configure(
+        dialect_name='postgresql',
+        opts={"as_sql": True, "output_buffer": output})
+    run(Operations(context))
+    return output.getvalue()
+
+
+def test_lock_timeout_statement():
+    assert online.lock_timeout_statement('5s') == "SET lock_timeout = '5s'"
+    assert online.lock_timeout_statement(1500) == \
+        "SET lock_timeout = '1500'"
+    assert online.lock_timeout_statement(None) is None
+    with pytest.raises(ValueError):
+        online.lock_timeout_statement("5s'; DROP TABLE \"Show\"; --")
+
+
+def test_backfill_in_batches(sqlite_op):
+    op, connection = sqlite_op
+    op.backfill('items', {"flag": 0}, where='flag IS NULL', batch_size=7,
+                pause=0)
+    assert dict(connection.exec_driver_sql(
+        'SELECT flag, count(*) FROM items GROUP BY flag').all()) == \
+        {0: 20, 1: 5}
+    op.backfill('items', {"flag": 2}, where='flag IS NULL', pause=0)
+    assert connection.exec_driver_sql(
+        'SELECT count(*) FROM items WHERE flag = 2').scalar() == 0
+
+
+def test_sqlite_falls_back_to_plain_operations(sqlite_op):
+    op, connection = sqlite_op
+    op.create_index_concurrently('ix_items_flag', 'items', ['flag'])
+    assert [index['name'] for index in
+            sa.inspect(connection).get_indexes('items')] == ['ix_items_flag']
+    op.drop_index_concurrently('ix_items_flag', 'items')
+    assert sa.inspect(connection).get_indexes('items') == []
+
+    op.backfill('items', {"flag": 0}, where='flag IS NULL', pause=0)
+    op.set_not_null('items', 'flag')
+    assert not next(column for column in
+                    sa.inspect(connection).get_columns('items')
+                    if column['name'] == 'flag')['nullable']
+
+
+def test_postgres_statements():
+    script = postgres_script(lambda op: (
+        op.create_index_concurrently('ix_Venue_city', 'Venue', ['city']),
+        op.backfill('Venue', {"seeking_talent": False},
+                    where='seeking_talent IS NULL'),
+        op.set_not_null('Venue', 'seeking_talent')))
+    assert 'CREATE INDEX CONCURRENTLY "ix_Venue_city" ON "Venue" (city)' \
+        in script
+    assert 'UPDATE "Venue" SET seeking_talent=false WHERE ' \
+        'seeking_talent IS NULL' in script
+    assert 'CHECK (seeking_talent IS NOT NULL) NOT VALID' in script
+    assert 'ALTER TABLE "Venue" ALTER COLUMN seeking_talent SET NOT NULL' \
+        in script
+
+
+def load_migration(filename):
+    path = os.path.join(os.path.dirname(__file__), '..', 'migrations',
+                        'versions', filename)
+    spec = importlib.util.spec_from_file_location(filename[:-3], path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    return migration
+
+
+def test_created_at_migration():
+    migration = load_migration('b6d0e2f4a813_add_created_at.py')
+
+    def upgrade(op):
+        with Operations.context(op.migration_context):
+            migration.upgrade()
+
+    engine = sa.create_engine('sqlite://')
+    with engine.connect() as connection:
+        for table in ('Artist', 'Venue'):
+            connection.exec_driver_sql(
+                f'CREATE TABLE "{table}" (id INTEGER PRIMARY KEY, '
+                f'updated_at DATETIME NOT NULL)')
+            connection.exec_driver_sql(
+                f'INSERT INTO "{table}" (id, updated_at) VALUES '
+                f"(1, '2020-01-01 00:00:00'), (2, '2021-06-01 12:00:00')")
+        upgrade(Operations(MigrationContext.configure(connection)))
+        assert connection.exec_driver_sql(
+            'SELECT count(*) FROM "Venue" WHERE created_at = updated_at'). \
+            scalar() == 2
+        assert not next(column for column in
+                        sa.inspect(connection).get_columns('Artist')
+                        if column['name'] == 'created_at')['nullable']
+
+    # on Postgres: batched backfill and NOT NULL through a check constraint
+    script = postgres_script(upgrade)
+    assert 'UPDATE "Artist" SET created_at=updated_at WHERE ' \
+        'created_at IS NULL' in script
+    assert 'ALTER TABLE "Venue" ALTER COLUMN created_at SET NOT NULL' \
+        in script
@@ -0,0 +1,67 @@
+from datetime import date, datetime
+
+import pytest
+
+import partitions
+from cache import cache
+from models import Show, ShowCard
+from partitions import archive_month, archive_path, read_entries
+from read_models import insert_show_cards
+
+# ----------------------------------------------------------------------------#
+# Show archive.
+# ----------------------------------------------------------------------------#
+
+MONTH = date(2020, 1, 1)
+
+
+@pytest.fixture
+def old_shows(database):
+    database.session.add_all([
+        Show(venue_id=1, artist_id=1, start_time=datetime(2020, 1, 5, 20)),
+        Show(venue_id=2, artist_id=1, start_time=datetime(2020, 1, 9, 20)),
+        Show(venue_id=1, artist_id=2, start_time=datetime(2020, 2, 1, 20)),
+    ])
+    database.session.flush()
+    insert_show_cards()
+    database.session.commit()
+
+
+def test_archives_and_removes_the_month(old_shows, tmp_path, app, client,
+                                        monkeypatch):
+    assert archive_month(MONTH, str(tmp_path)) == 2
+    entries = read_entries(archive_path(str(tmp_path), MONTH))
+    assert [(entry['venue_id'], entry['start_time']) for entry in entries] \
+        == [(1, '2020-01-05T20:00:00'), (2, '2020-01-09T20:00:00')]
+    assert Show.query.filter(Show.start_time < datetime(2020, 2, 1)). \
+        count() == 0
+    assert ShowCard.query.filter(
+        ShowCard.start_time < datetime(2020, 2, 1)).count() == 0
+    assert Show.query.filter(Show.start_time >= datetime(2020, 2, 1),
+                             Show.start_time < datetime(2020, 3, 1)). \
+        count() == 1
+
+    monkeypatch.setitem(app.config, 'SHOW_ARCHIVE_DIR', str(tmp_path))
+    cache.invalidate('archive', 'fragments')
+    page = client.get('/venues/1?history=archived').get_data(as_text=True)
+    assert '1 Archived Show' in page and 'January, 5, 2020' in page
+
+
+def test_rerun_after_a_failure_archives_once(old_shows, tmp_path,
+                                             monkeypatch):
+    def fail(*args):
+        raise RuntimeError('connection lost')
+
+    # written to the archive, but the shows are still in the database
+    monkeypatch.setattr(partitions, 'touch', fail)
+    with pytest.raises(RuntimeError):
+        archive_month(MONTH, str(tmp_path))
+    partitions.db.session.rollback()
+    assert Show.query.filter(Show.start_time < datetime(2020, 2, 1)). \
+        count() == 2
+
+    monkeypatch.undo()
+    assert archive_month(MONTH, str(tmp_path)) == 2
+    entries = read_entries(archive_path(str(tmp_path), MONTH))
+    assert len(entries) == len({entry['id'] for entry in entries}) == 2
+    assert not list(tmp_path.glob('*.tmp'))
@@ -0,0 +1,88 @@
+import pytest
+
+# ----------------------------------------------------------------------------#
+# Query budgets.
+# ----------------------------------------------------------------------------#
+
+# (method, path, request arguments, status, max statements, max rows
+# hydrated). Both counts must also be the same at both seed sizes: a page
+# whose statements or ORM rows grow with the data does work per row (N+1),
+# even when it stays under its budget at the small size.
+
+VENUE = {"name": 'The Blue Door', "city": 'Oakland', "state": 'CA',
+         "address": '1 Main St', "phone": '123-456-7890', "genres": ['Jazz'],
+         "facebook_link": 'https://www.facebook.com/bluedoor',
+         "image_link": 'https://example.com/bluedoor.png'}
+ARTIST = {"name": 'The Newcomers', "city": 'Oakland', "state": 'CA',
+          "phone": '123-456-7890', "genres": ['Jazz'],
+          "facebook_link": 'https://www.facebook.com/newcomers',
+          "image_link": 'https://example.com/newcomers.png'}
+SHOW = {"artist_id": '1', "venue_id": '1',
+        "start_time": '2031-01-01 20:00:00'}
+TOUR = {"artist_id": 1, "shows": [
+    {"venue_id": 1, "start_time": '2031-01-01 20:00:00'},
+    {"venue_id": 2, "start_time": '2031-01-02 20:00:00'},
+    {"venue_id": 3, "start_time": '2031-01-03 20:00:00'}]}
+
+BUDGETS = [
+    ('GET', '/', {}, 200, 0, 0),
+    ('GET', '/autocomplete?q=ven', {}, 200, 0, 0),
+    ('GET', '/venues', {}, 200, 1, 0),
+    ('POST', '/venues/search', {"data": {"search_term": 'venue 1'}}, 200,
+     1, 0),
+    ('GET', '/venues/1', {}, 200, 3, 1),
+    ('GET', '/venues/1/edit', {}, 200, 1, 0),
+    ('GET', '/venues/create', {}, 200, 0, 0),
+    ('GET', '/venues/browse', {}, 200, 2, 0),
+    ('GET', '/venues/browse?genre=Jazz&state=CA', {}, 200, 2, 0),
+    ('GET', '/venues/1/matches', {}, 200, 2, 0),
+    ('GET', '/venues/1/calendar.ics', {}, 200, 3, 0),
+    ('GET', '/artists', {}, 200, 1, 0),
+    ('POST', '/artists/search', {"data": {"search_term": 'artist 1'}}, 200,
+     1, 0),
+    ('GET', '/artists/1', {}, 200, 4, 1),
+    ('GET', '/artists/1/edit', {}, 200, 1, 0),
+    ('GET', '/artists/create', {}, 200, 0, 0),
+    ('GET', '/artists/browse', {}, 200, 2, 0),
+    ('GET', '/artists/1/matches', {}, 200, 2, 0),
+    ('GET', '/artists/1/calendar.ics', {}, 200, 3, 0),
+    ('GET', '/shows', {}, 200, 1, 0),
+    ('GET', '/shows/create', {}, 200, 0, 0),
+    ('GET', '/shows/batch', {}, 200, 0, 0),
+    ('GET', '/events?since=0', {}, 200, 1, 0),
+    ('GET', '/stats', {}, 200, 5, 0),
+    ('GET', '/metrics', {}, 200, 0, 0),
+    # writes
+    ('POST', '/venues/create', {"data": VENUE}, 200, 3, 0),
+    ('POST', '/venues/1/edit', {"data": dict(VENUE, version='1')}, 302,
+     4, 0),
+    ('DELETE', '/venues/1', {}, 200, 10, 0),
+    ('DELETE', '/venues/1?soft=true', {}, 200, 8, 0),
+    ('POST', '/venues/1/delete', {}, 302, 10, 0),
+    ('POST', '/artists/create', {"data": ARTIST}, 200, 3, 0),
+    ('POST', '/artists/1/edit', {"data": dict(ARTIST, version='1')}, 302,
+     4, 0),
+    ('DELETE', '/artists/1', {}, 200, 10, 0),
+    ('DELETE', '/artists/1?soft=true', {}, 200, 8, 0),
+    ('POST', '/shows/create', {"data": SHOW}, 200, 17, 0),
+    ('POST', '/shows/batch', {"json": TOUR}, 201, 17, 0),
+]
+
+counts = {}  # (method, path, size) -> (statements, hydrated)
+
+
+@pytest.mark.parametrize('method, path, arguments, status, max_statements, '
+                         'max_hydrated', BUDGETS,
+                         ids=[f'{method} {path}' for method, path, *_ in
+                              BUDGETS])
+def test_query_budget(seeded, query_budget, method, path, arguments,
+                      status, max_statements, max_hydrated):
+    counted = query_budget(method, path, status, **arguments)
+    assert len(counted.statements) <= max_statements, counted.statements
+    assert counted.hydrated <= max_hydrated, counted
+    counts[method, path, seeded] = len(counted.statements), counted.hydrated
+    other = counts.get((method, path,
+                        'small' if seeded == 'large' else 'large'))
+    assert other is None or other == counts[method, path, seeded], \
+        f'{method} {path} costs {other[0]} statements and {other[1]} rows ' \
+        f'at one size and {counted!r} at the other'
@@ -0,0 +1,66 @@
+import pytest
+
+import ratelimit
+from cache import cache
+from models import Venue
+from ratelimit import MemoryBackend, limiter
+
+# ----------------------------------------------------------------------------#
+# Search caching and rate limiting.
+# ----------------------------------------------------------------------------#
+
+VENUE = {"name": 'Venue 1 Annex', "city": 'Oakland', "state": 'CA',
+         "address": '1 Main St', "phone": '123-456-7890', "genres": ['Jazz'],
+         "image_link": 'https://example.com/annex.png'}
+
+
+@pytest.fixture
+def clock(app, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(limiter, 'backend', MemoryBackend())
+    monkeypatch.setitem(app.config, 'RATELIMIT_ENABLED', True)
+    monkeypatch.setitem(app.config, 'RATELIMIT_SEARCH_RATE', 0.5)
+    monkeypatch.setitem(app.config, 'RATELIMIT_SEARCH_BURST', 2)
+    return now
+
+
+def search(client, term, address='10.0.0.1'):
+    return client.post('/venues/search', data={"search_term": term},
+                       environ_base={'REMOTE_ADDR': address})
+
+
+def test_bucket(clock):
+    backend = MemoryBackend(max_keys=2)
+    assert [backend.take('a', 1.0, 2) for _ in range(3)] == [0, 0, 1.0]
+    backend.take('b', 1.0, 2)
+    backend.take('c', 1.0, 2)  # 'a' is dropped and comes back full
+    assert backend.take('a', 1.0, 2) == 0
+
+
+def test_429_with_retry_after(database, client, clock):
+    assert search(client, 'venue').status_code == 200
+    assert search(client, 'venue').status_code == 200
+    response = search(client, 'venue')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '2'  # one token at 0.5/s
+    # per client address
+    assert search(client, 'venue', '10.0.0.2').status_code == 200
+
+    clock[0] += 1.5
+    assert search(client, 'venue').headers['Retry-After'] == '1'
+    clock[0] += 2
+    assert search(client, 'venue').status_code == 200
+
+
+def test_search_cache_is_invalidated_by_writes(database, client):
+    assert 'Venue 1' in search(client, 'venue 1').get_data(as_text=True)
+    # served from the cache, whatever the case and spacing
+    Venue.query.filter(Venue.id == 2).update({"name": 'Hidden'})
+    Venue.query.session.commit()
+    assert 'Venue 1' in search(client, '  VENUE  1 ').get_data(as_text=True)
+
+    client.post('/venues/create', data=VENUE)
+    page = search(client, 'venue 1').get_data(as_text=True)
+    assert 'Venue 1 Annex' in page and 'Hidden' not in page
+    assert cache.get('search', ('Venue', 'venue 1')) is not None
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import pytest
+
+from models import Show, ShowCard
+from recommendations import rebuild_similar_artists, similar_artists
+
+# ----------------------------------------------------------------------------#
+# Similar artists.
+# ----------------------------------------------------------------------------#
+
+PLAYED = {1: [1, 2], 2: [1, 2], 3: [1], 4: [4]}  # artist -> venues
+
+
+@pytest.fixture
+def played(database):
+    ShowCard.query.delete()
+    Show.query.delete()
+    database.session.add_all(
+        Show(artist_id=artist_id, venue_id=venue_id,
+             start_time=datetime(2020, 1, venue_id, 20))
+        for artist_id, venues in PLAYED.items() for venue_id in venues)
+    database.session.commit()
+    rebuild_similar_artists()
+
+
+def similar(artist_id):
+    return [(row.id, round(row.score, 4))
+            for row in similar_artists(artist_id)]
+
+
+def test_cosine_of_shared_venues(played):
+    # shared venues / sqrt(venues of one * venues of the other)
+    assert similar(1) == [(2, 1.0), (3, 0.7071)]
+    assert similar(3) == [(1, 0.7071), (2, 0.7071)]
+    assert similar(4) == []
+
+
+def test_booking_refreshes_the_lists(played, client):
+    client.post('/shows/create', data={
+        "artist_id": '4', "venue_id": '2',
+        "start_time": '2031-01-01 20:00:00'})
+    assert similar(4) == [(1, 0.5), (2, 0.5)]
+    assert similar(1) == [(2, 1.0), (3, 0.7071), (4, 0.5)]
+    page = client.get('/artists/4').get_data(as_text=True)
+    assert 'Similar Artists' in page and 'Artist 0' in page
+
+
+def test_deleted_artists_are_not_recommended(played, client):
+    client.delete('/artists/2?soft=true')
+    assert similar(1) == [(3, 0.7071)]
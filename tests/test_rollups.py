@@ -0,0 +1,56 @@
+from datetime import datetime
+
+from models import Show, ShowRollup
+from rollups import add_shows, rebuild_rollups
+
+# ----------------------------------------------------------------------------#
+# Analytics rollups.
+# ----------------------------------------------------------------------------#
+
+
+def rollups():
+    return sorted((row.dimension, row.month, row.key, row.count)
+                  for row in ShowRollup.query)
+
+
+def test_writes_match_a_full_recount(database, client):
+    client.post('/shows/create', data={
+        "artist_id": '2', "venue_id": '3',
+        "start_time": '2031-01-01 20:00:00'})
+    client.post('/shows/batch', json={"artist_id": 1, "shows": [
+        {"venue_id": 1, "start_time": '2031-01-05 20:00:00'},
+        {"venue_id": 2, "start_time": '2031-02-05 20:00:00'}]})
+    client.delete('/venues/4')
+    client.delete('/artists/3?soft=true')
+    incremental = rollups()
+    assert all(count > 0 for *_, count in incremental)
+
+    rebuild_rollups()
+    assert incremental == rollups()
+
+
+def test_soft_deleted_rows_are_not_counted(database, client):
+    client.delete('/venues/2?soft=true')
+    client.delete('/artists/3?soft=true')
+    before = rollups()
+    add_shows([{"artist_id": 1, "venue_id": 2,
+                "start_time": datetime(2031, 1, 1, 20)},
+               {"artist_id": 3, "venue_id": 1,
+                "start_time": datetime(2031, 1, 2, 20)}])
+    assert rollups() == before
+
+
+def test_stats(database, client):
+    client.post('/shows/batch', json={"artist_id": 1, "shows": [
+        {"venue_id": 1, "start_time": '2031-01-05 20:00:00'},
+        {"venue_id": 1, "start_time": '2031-01-06 20:00:00'}]})
+    data = client.get('/stats?format=json').get_json()
+    assert data['shows']['2031-01'] == 2
+    assert sum(data['shows'].values()) == Show.query.filter(
+        Show.start_time >= datetime.strptime(data['since'], '%Y-%m')).count()
+    # months with shows booked ahead are included
+    assert data['months'][-1] == '2031-01'
+    assert data['cities'][0]['shows'] >= data['cities'][-1]['shows']
+    assert {"id": 1, "name": 'Venue 0'}.items() <= \
+        next(venue for venue in data['venues'] if venue['id'] == 1).items()
+    assert 'Venue 0' in client.get('/stats').get_data(as_text=True)
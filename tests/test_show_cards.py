@@ -0,0 +1,41 @@
+from models import Show, ShowCard
+
+# ----------------------------------------------------------------------------#
+# Show cards.
+# ----------------------------------------------------------------------------#
+
+ARTIST = {"name": 'Renamed Artist', "city": 'Oakland', "state": 'CA',
+          "phone": '123-456-7890', "genres": ['Jazz'],
+          "image_link": 'https://example.com/renamed.png', "version": '1'}
+
+
+def cards(*criteria):
+    return ShowCard.query.with_entities(
+        ShowCard.show_id, ShowCard.venue_name, ShowCard.artist_name,
+        ShowCard.artist_image_link).filter(*criteria). \
+        order_by(ShowCard.show_id).all()
+
+
+def test_cards_follow_the_writes(database, client):
+    assert len(cards()) == Show.query.count()
+    client.post('/shows/create', data={
+        "artist_id": '1', "venue_id": '2',
+        "start_time": '2031-01-01 20:00:00'})
+    show_id = Show.query.with_entities(Show.id). \
+        order_by(Show.id.desc()).limit(1).scalar()
+    assert cards(ShowCard.show_id == show_id) == [
+        (show_id, 'Venue 1', 'Artist 0', 'http://x.com/a.png')]
+
+    # a rename reaches every card of the artist, and the /shows page
+    assert client.post('/artists/1/edit', data=ARTIST).status_code == 302
+    assert {card.artist_name for card in cards(ShowCard.artist_id == 1)} \
+        == {'Renamed Artist'}
+    assert {card.artist_image_link
+            for card in cards(ShowCard.artist_id == 1)} == \
+        {'https://example.com/renamed.png'}
+    assert 'Renamed Artist' in client.get('/shows').get_data(as_text=True)
+
+    # deleting the venue removes its cards with its shows
+    client.delete('/venues/2')
+    assert cards(ShowCard.venue_id == 2) == []
+    assert len(cards()) == Show.query.count()
@@ -0,0 +1,55 @@
+import json
+from datetime import timedelta
+
+import pytest
+
+import snapshot
+from conftest import reseed
+from models import Venue, touch
+from snapshot import MANIFEST, take_snapshot
+
+# ----------------------------------------------------------------------------#
+# Static snapshot.
+# ----------------------------------------------------------------------------#
+
+
+@pytest.fixture
+def file_database(app, tmp_path, monkeypatch):
+    # the render workers are separate processes, they cannot share an
+    # in-memory database (sqlite+pysqlite: Flask-SQLAlchemy's SQLite path
+    # handling does not work with SQLAlchemy 1.4's immutable URLs)
+    monkeypatch.setitem(app.config, 'SQLALCHEMY_DATABASE_URI',
+                        f'sqlite+pysqlite:///{tmp_path / "fyyur.db"}')
+    reseed('small')
+    yield
+    monkeypatch.undo()
+    reseed('small')
+
+
+def pages(directory):
+    with open(directory / MANIFEST) as file:
+        return json.load(file)['pages']
+
+
+def test_renders_and_removes_pages(file_database, app, client, tmp_path,
+                                   monkeypatch):
+    directory = tmp_path / 'snapshot'
+    assert take_snapshot(str(directory), 1) == (3 + 4 + 4, 0)
+    assert pages(directory)['/venues/1']['file'] == 'venues/1.html'
+    assert 'Venue 0' in (directory / 'venues/1.html').read_text()
+    # nothing changed since
+    monkeypatch.setattr(snapshot, 'OVERLAP', timedelta(0))
+    assert take_snapshot(str(directory), 1) == (0, 0)
+
+    # a deleted venue, a page that now fails and a file nobody listed
+    client.delete('/venues/2')
+    touch(Venue, Venue.id == 3)
+    Venue.query.session.commit()
+    (directory / 'venues/999.html').write_text('stale')
+    monkeypatch.setitem(app.view_functions, 'show_venue',
+                        lambda venue_id: ('', 500))
+    assert take_snapshot(str(directory), 1)[1] == 3
+    assert '/venues/2' not in pages(directory)
+    assert '/venues/3' not in pages(directory)
+    assert sorted(path.name for path in (directory / 'venues').iterdir()) \
+        == ['1.html', '4.html']